@@ -0,0 +1,159 @@
+"""Cold-start benchmark for the onboarding Cloud Functions.
+
+For each function, a fresh interpreter imports main.py and serves one CORS
+preflight (the request every browser sends first), timing both. With
+--baseline the same is measured for the functions as of a git ref, and
+--target makes the run fail unless every function's cold start (import +
+first request) shrank by at least that fraction:
+
+    python cold_start_benchmark.py --baseline HEAD~1 --target 0.5
+
+Needs each function's requirements installed. The current tree needs no
+credentials, since a preflight must not create any client; baselines from
+before runtime.py create them at import and need application default
+credentials.
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+# Each function's directory and entry point share its name
+FUNCTIONS = [
+    "select_career", "upload_resume", "handle_resume",
+    "handle_github", "get_dynamic_quiz", "handle_quiz_results",
+]
+
+# Reported when they are fully imported after the preflight
+HEAVY_MODULES = [
+    "vertexai", "google.cloud.firestore", "google.cloud.storage", "google.cloud.pubsub_v1",
+    "firebase_admin", "numpy", "PIL.Image", "pypdf",
+]
+
+# Runs in the function's directory; prints one JSON line
+PROBE = """
+import json, sys, time
+from flask import Flask  # loaded by functions_framework before main.py in production
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+with Flask("probe").test_request_context(method="OPTIONS"):
+    from flask import request
+    result = getattr(main, sys.argv[1])(request)
+t2 = time.perf_counter()
+print(json.dumps({
+    "import": t1 - t0,
+    "first_request": t2 - t1,
+    "status": result[1],
+    "heavy": [m for m in sys.argv[2:] if m in sys.modules],
+}))
+"""
+
+# Keeps import-time side effects local and offline
+PROBE_ENV = {
+    "JOB_QUEUE": "none",
+    "QUIZ_PREFETCH": "0",
+    "QUIZ_TREE_MODE": "live",
+}
+
+
+def probe(function_dir, entry_point):
+    env = {**os.environ, **PROBE_ENV}
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE, entry_point, *HEAVY_MODULES],
+        cwd=function_dir, env=env, capture_output=True, text=True, timeout=300,
+    )
+    if out.returncode != 0:
+        raise RuntimeError(f"{entry_point} probe failed:\n{out.stderr.strip()}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(root, names, runs):
+    """Median import / first-request seconds per function over `runs` fresh processes."""
+    results = {}
+    for name in names:
+        samples = [probe(os.path.join(root, name), name) for _ in range(runs)]
+        results[name] = {
+            "import": statistics.median(s["import"] for s in samples),
+            "first_request": statistics.median(s["first_request"] for s in samples),
+            "status": samples[-1]["status"],
+            "heavy": samples[-1]["heavy"],
+        }
+        results[name]["total"] = results[name]["import"] + results[name]["first_request"]
+    return results
+
+
+def checkout(ref, dest):
+    """Extracts this directory as of git `ref` into `dest`."""
+    # Run from a subdirectory, git archive only includes that subdirectory, with relative paths
+    archive = subprocess.run(
+        ["git", "archive", "--format=tar", ref],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, check=True,
+    ).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(dest)
+    return dest
+
+
+def report(current, baseline=None):
+    header = f"{'function':<22}{'import':>10}{'request':>10}{'total':>10}"
+    if baseline:
+        header += f"{'baseline':>10}{'reduction':>11}"
+    print(header)
+    for name, row in current.items():
+        line = f"{name:<22}{row['import'] * 1000:>8.0f}ms{row['first_request'] * 1000:>8.0f}ms{row['total'] * 1000:>8.0f}ms"
+        if baseline:
+            base = baseline[name]["total"]
+            line += f"{base * 1000:>8.0f}ms{reduction(base, row['total']):>10.0%}"
+        print(line)
+        if row["status"] != 204:
+            print(f"  ! preflight returned {row['status']}")
+        if row["heavy"]:
+            print(f"  ! preflight loaded {', '.join(row['heavy'])}")
+
+
+def reduction(before, after):
+    return 1 - after / before if before else 0.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the onboarding functions.")
+    parser.add_argument("functions", nargs="*", metavar="FUNCTION",
+                        help=f"functions to measure (default: all of {', '.join(FUNCTIONS)})")
+    parser.add_argument("--runs", type=int, default=5,
+                        help="fresh processes per function; the median is reported (default: 5)")
+    parser.add_argument("--baseline", metavar="GIT_REF",
+                        help="also measure the functions as of this git ref and report the reduction")
+    parser.add_argument("--target", type=float,
+                        help="exit non-zero unless every function's total shrank by this fraction (needs --baseline)")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+    if args.target is not None and not args.baseline:
+        parser.error("--target needs --baseline")
+    unknown = [name for name in args.functions if name not in FUNCTIONS]
+    if unknown:
+        parser.error(f"unknown functions: {', '.join(unknown)}")
+
+    names = args.functions or list(FUNCTIONS)
+    current = measure(os.path.dirname(os.path.abspath(__file__)), names, args.runs)
+    baseline = None
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = measure(checkout(args.baseline, tmp), names, args.runs)
+
+    if args.json:
+        print(json.dumps({"current": current, "baseline": baseline}, indent=2))
+    else:
+        report(current, baseline)
+
+    if args.target is not None:
+        missed = [name for name in names if reduction(baseline[name]["total"], current[name]["total"]) < args.target]
+        if missed:
+            print(f"Target reduction of {args.target:.0%} missed by: {', '.join(missed)}")
+            sys.exit(1)
+        print(f"All functions met the {args.target:.0%} reduction target.")
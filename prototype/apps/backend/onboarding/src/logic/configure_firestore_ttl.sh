@@ -0,0 +1,26 @@
+#!/bin/bash
+# Enables Firestore TTL deletion on `expires_at` for every collection the
+# onboarding functions use as a FirestoreStore (see cache.py). Without it
+# expired cache entries and quiz sessions are skipped on read but never deleted.
+# Run once per project; re-running for an enabled collection is harmless.
+
+set -e
+
+PROJECT_ID="${PROJECT_ID:-rock-idiom-475618-q4}"
+COLLECTIONS=(
+  roadmap_cache
+  quiz_result_cache
+  quiz_step_cache
+  quiz_sessions
+  github_cache
+  resume_text_cache
+)
+
+for collection in "${COLLECTIONS[@]}"; do
+  echo "⏳ TTL policy on ${collection}.expires_at"
+  gcloud firestore fields ttls update expires_at \
+    --collection-group="$collection" \
+    --enable-ttl \
+    --project="$PROJECT_ID" \
+    --async
+done
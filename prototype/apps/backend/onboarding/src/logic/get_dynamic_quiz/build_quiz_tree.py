@@ -0,0 +1,67 @@
+"""Precomputes the quiz decision tree for QUIZ_TREE_MODE=frozen.
+
+Walks every option from FIRST_QUESTION, asking Gemini for each next step
+until it returns final skills (or --max-depth is reached), and writes the
+nested tree to quiz_tree.json next to main.py. Deploy the file with the
+function to serve every path in the tree without an LLM call.
+"""
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from main import FIRST_QUESTION, QUIZ_TREE_PATH, _generate_next_step, _valid_step
+
+
+def _generate(history):
+    try:
+        return _generate_next_step(history)
+    except Exception as e:
+        print(f"Failed to generate step for {history}: {e}")
+        return None
+
+
+def build_tree(max_depth, workers):
+    root = {"step": FIRST_QUESTION, "children": {}}
+    frontier = [([], root)]
+    depth = 0
+    generated = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while frontier and depth < max_depth:
+            depth += 1
+            jobs = []
+            for history, node in frontier:
+                question = node["step"]["next_question"]
+                for option in question["options"]:
+                    path = history + [{"question": question["text"], "answer": option}]
+                    jobs.append((path, node, option))
+
+            steps = executor.map(lambda job: _generate(job[0]), jobs)
+            frontier = []
+            for (path, node, option), step in zip(jobs, steps):
+                if not _valid_step(step):
+                    failed += 1
+                    continue
+                generated += 1
+                child = node["children"][option] = {"step": step, "children": {}}
+                if "next_question" in step:
+                    frontier.append((path, child))
+            print(f"Depth {depth}: {len(jobs)} paths, {len(frontier)} still asking questions")
+
+    print(f"Generated {generated} steps ({failed} failed).")
+    return root
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the dynamic quiz decision tree.")
+    parser.add_argument("--max-depth", type=int, default=5,
+                        help="answers deep to expand before stopping (default: 5)")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="concurrent Gemini calls (default: 8)")
+    parser.add_argument("--out", default=QUIZ_TREE_PATH,
+                        help=f"output file (default: {QUIZ_TREE_PATH})")
+    args = parser.parse_args()
+
+    tree = build_tree(args.max_depth, args.workers)
+    with open(args.out, "w") as f:
+        json.dump(tree, f, indent=2)
+    print(f"Wrote quiz tree to {args.out}")
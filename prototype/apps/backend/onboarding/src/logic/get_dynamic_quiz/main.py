@@ -1,30 +1,39 @@
 import functions_framework
-import firebase_admin
-from firebase_admin import auth
-import vertexai
-from vertexai.generative_models import GenerativeModel, Part, HarmCategory, HarmBlockThreshold
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+import runtime
+from cache import fingerprint, make_store
+from prefetch import Prefetcher
+from quiz_sessions import QuizSessions, format_history
+from quiz_tree import QuizStepCache, QuizTrie
 
 # --- INITIALIZATION ---
-PROJECT_ID = "rock-idiom-475618-q4"
-LOCATION = "asia-south1"
+PROJECT_ID = runtime.PROJECT_ID
+LOCATION = runtime.LOCATION
 GEMINI_MODEL = "gemini-2.5-flash"
+# Persistent tier for generated quiz steps: "firestore", "sqlite" (local stand-in) or "none"
+QUIZ_CACHE_STORE = os.environ.get("QUIZ_CACHE_STORE", "firestore")
+QUIZ_CACHE_TTL = int(os.environ.get("QUIZ_CACHE_TTL", str(30 * 24 * 3600)))
+# "frozen" also serves the precomputed decision tree in QUIZ_TREE_PATH (see build_quiz_tree.py);
+# paths outside the tree still go to Gemini
+QUIZ_TREE_MODE = os.environ.get("QUIZ_TREE_MODE", "live")
+QUIZ_TREE_PATH = os.environ.get("QUIZ_TREE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "quiz_tree.json"))
+# Generate the follow-up step for every option in the background while the user decides
+QUIZ_PREFETCH = os.environ.get("QUIZ_PREFETCH", "1").lower() in ("1", "true")
+# Session mode keeps the history server-side: "firestore", "sqlite" (local stand-in) or "none" (memory only)
+QUIZ_SESSION_STORE = os.environ.get("QUIZ_SESSION_STORE", "firestore")
+# handle_quiz_results endpoint; when set, a finished session's skills go straight to it
+QUIZ_RESULTS_URL = os.environ.get("QUIZ_RESULTS_URL")
 
-try:
-    firebase_admin.initialize_app()
-except ValueError:
-    pass # App already initialized
-
-vertexai.init(project=PROJECT_ID, location=LOCATION)
-
-safety_settings = {
-    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-}
-gemini_model = GenerativeModel(GEMINI_MODEL, safety_settings=safety_settings)
+# The Gemini model (and Vertex AI itself) is created on the first generation, see runtime.py
+gemini_model = runtime.lazy_gemini(GEMINI_MODEL)
+# Only needed to forward finished sessions to QUIZ_RESULTS_URL
+requests = runtime.lazy_import("requests")
+# Forwards finished sessions after the response is sent; like prefetching, on
+# Cloud Functions this needs CPU allocated outside requests
+RESULTS_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="quiz-results")
 
 # --- This is the hard-coded first question ---
 FIRST_QUESTION = {
@@ -35,6 +44,175 @@ FIRST_QUESTION = {
     }
 }
 
+NEXT_STEP_PROMPT = """
+        You are a friendly career counselor. Your goal is to help a user discover
+        their technical skills by asking a series of multiple-choice questions.
+
+        You will be given the conversation history so far. 
+        Your job is to generate the *next single question* based on their previous answers
+        to narrow down their specific skills.
+
+        - If they choose "Web Development", ask about "Frontend vs Backend".
+        - If they choose "AI Engineering", ask about "Data Science vs MLOps".
+        - Keep asking 2-3 follow-up questions to find specific skills.
+        - After 3-4 questions, when you have enough information to identify 
+          a list of 5-10 specific skills (e.g., "Python", "React", "Network Security"), 
+          STOP asking questions and return the final skill list.
+
+        When you have enough skills, respond with this *exact* JSON:
+        {{"final_skills": ["Skill 1", "Skill 2"]}}
+
+        If you need to ask another question, respond with this *exact* JSON:
+        {{"next_question": {{
+            "id": "q2", 
+            "text": "What's the next question?",
+            "options": ["Option A", "Option B", "Option C"]
+        }}}}
+
+        This is the history, one Q/A pair per turn (the user's last answer was the most recent):
+        {history}
+        """
+
+# --- Cache of generated steps, keyed by the normalized conversation path ---
+frozen_tree = None
+if QUIZ_TREE_MODE == "frozen":
+    try:
+        with open(QUIZ_TREE_PATH, 'r') as f:
+            frozen_tree = QuizTrie.from_tree(json.load(f))
+        print(f"--- DEBUG: Loaded frozen quiz tree with {len(frozen_tree)} nodes.")
+    except Exception as e:
+        print(f"--- DEBUG (ERROR): Failed to load {QUIZ_TREE_PATH}, serving live: {e}")
+
+db = runtime.lazy_firestore() if "firestore" in (QUIZ_CACHE_STORE, QUIZ_SESSION_STORE) else None
+QUIZ_CACHE = QuizStepCache(
+    fingerprint(GEMINI_MODEL, NEXT_STEP_PROMPT)[:16],
+    store=make_store(QUIZ_CACHE_STORE, db, "quiz_step_cache"),
+    ttl=QUIZ_CACHE_TTL,
+    frozen=frozen_tree,
+)
+QUIZ_SESSIONS = QuizSessions(QUIZ_SESSION_STORE, db)
+
+def _valid_step(step):
+    """Only well-formed steps are cached."""
+    if not isinstance(step, dict):
+        return False
+    if isinstance(step.get("final_skills"), list):
+        return bool(step["final_skills"])
+    question = step.get("next_question")
+    return isinstance(question, dict) and bool(question.get("text")) and isinstance(question.get("options"), list)
+
+def _generate_next_step(conversation_history, usage=None, transcript=None):
+    """Asks Gemini for the next question or the final skills; None if blocked or unparseable.
+
+    `transcript` is the session's prebuilt format_history() text, if any.
+    If `usage` is a dict, the call's token count is stored in usage["tokens"].
+    """
+    prompt = NEXT_STEP_PROMPT.format(history=transcript or format_history(conversation_history))
+    response = gemini_model.generate_content(prompt)
+    if usage is not None:
+        metadata = response.usage_metadata
+        usage["tokens"] = metadata.prompt_token_count + metadata.candidates_token_count
+
+    if not response.text:
+        print(f"--- DEBUG (ERROR): Gemini response was blocked. Feedback: {response.prompt_feedback}")
+        return None
+
+    print(f"--- DEBUG: Raw Gemini response: {response.text}")
+    clean_response = response.text.strip().replace("`", "").replace("json", "")
+    try:
+        return json.loads(clean_response)
+    except json.JSONDecodeError as e:
+        print(f"--- DEBUG (ERROR): Failed to parse next step JSON: {e}")
+        return None
+
+PREFETCHER = Prefetcher(QUIZ_CACHE, _generate_next_step, _valid_step) if QUIZ_PREFETCH else None
+
+def _next_step(conversation_history, transcript=None):
+    """Serves the next step from the cache or Gemini and prefetches the ones after it."""
+    next_step_data, source = QUIZ_CACHE.get_or_generate(
+        conversation_history,
+        lambda: _generate_next_step(conversation_history, transcript=transcript),
+        _valid_step,
+    )
+    if next_step_data is not None and PREFETCHER:
+        PREFETCHER.record_use(conversation_history)
+        # The answer to this question is likely generated before the user clicks
+        PREFETCHER.schedule(conversation_history, next_step_data)
+        print(f"--- DEBUG: Quiz prefetch: {PREFETCHER.stats()}")
+    print(f"--- DEBUG: Quiz cache: {QUIZ_CACHE.stats()}")
+    return next_step_data, source
+
+def _post_quiz_results(session_id, auth_header):
+    try:
+        response = requests.post(
+            QUIZ_RESULTS_URL,
+            json={"session_id": session_id},
+            headers={"Authorization": auth_header},
+            timeout=120,
+        )
+        response.raise_for_status()
+        print(f"--- DEBUG (SUCCESS): Quiz results for session {session_id} saved.")
+    except Exception as e:
+        print(f"--- DEBUG (ERROR): Submitting quiz results failed: {e}")
+
+def _submit_quiz_results(session_id, auth_header):
+    """Starts handle_quiz_results for a finished session in the background.
+
+    Returns False if QUIZ_RESULTS_URL is not set. The recommendations land
+    on the user's document, where the client reads them.
+    """
+    if not QUIZ_RESULTS_URL:
+        return False
+    RESULTS_EXECUTOR.submit(_post_quiz_results, session_id, auth_header)
+    return True
+
+def _handle_session(user_id, data, auth_header, headers):
+    """Session mode: the server keeps the history and the client sends only its latest answer.
+
+    Start with {"session": true}; then send {"session_id", "answer", "turn"},
+    echoing the turn from the previous response.
+    """
+    session_id = data.get('session_id')
+    if not session_id:
+        session_id, _ = QUIZ_SESSIONS.create(user_id, FIRST_QUESTION["next_question"])
+        if PREFETCHER:
+            PREFETCHER.schedule([], FIRST_QUESTION)
+        return {**FIRST_QUESTION, "session_id": session_id, "turn": 0}, 200, headers
+
+    turn = data.get('turn')
+    if turn is None:
+        return "Bad Request: Missing 'turn'", 400, headers
+    session = QUIZ_SESSIONS.load(session_id, user_id, turn)
+    if session is None:
+        return "Quiz session not found or expired.", 404, headers
+    if session["turn"] != turn:
+        # A retried or out-of-order request would answer the wrong question
+        return f"Quiz session is at turn {session['turn']}, not {turn}.", 409, headers
+    if session.get("pending") is None:
+        return "Quiz session is already finished.", 409, headers
+    answer = data.get('answer')
+    if not answer:
+        return "Bad Request: Missing 'answer'", 400, headers
+
+    # The session is only saved once the next step exists, so a failed turn can be retried
+    session = QUIZ_SESSIONS.answer(session, answer)
+    next_step_data, source = _next_step(session["history"], session["transcript"])
+    if next_step_data is None:
+        return "Analysis failed: Could not generate the next question.", 500, headers
+
+    if "next_question" in next_step_data:
+        session["pending"] = next_step_data["next_question"]
+    else:
+        session["final_skills"] = next_step_data.get("final_skills", [])
+    QUIZ_SESSIONS.save(session_id, session)
+    print(f"--- DEBUG (SUCCESS): Session {session_id} turn {session['turn']} ({source}): {next_step_data}")
+
+    response = {**next_step_data, "session_id": session_id, "turn": session["turn"]}
+    if "final_skills" in next_step_data:
+        # Recommendations without another client round trip
+        response["results"] = "pending" if _submit_quiz_results(session_id, auth_header) else None
+    return response, 200, headers
+
 # --- MAIN FUNCTION ---
 @functions_framework.http
 def get_dynamic_quiz(request):
@@ -54,7 +232,8 @@ def get_dynamic_quiz(request):
     try:
         auth_header = request.headers.get('Authorization')
         id_token = auth_header.split('Bearer ')[1]
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = runtime.verify_id_token(id_token)
+        user_id = decoded_token['uid']
     except Exception as e:
         return f"Authentication error: {e}", 403
 
@@ -68,55 +247,24 @@ def get_dynamic_quiz(request):
         return f"Bad Request: Invalid JSON: {e}", 400
 
     try:
+        if data.get('session') or data.get('session_id'):
+            return _handle_session(user_id, data, auth_header, headers)
+
         # --- If history is empty, return the first question ---
         if not conversation_history:
             print("--- DEBUG: Sending first question.")
+            if PREFETCHER:
+                PREFETCHER.schedule([], FIRST_QUESTION)
             return FIRST_QUESTION, 200, headers
 
         print(f"--- DEBUG: Getting next question based on history: {conversation_history}")
 
-        # --- If history exists, ask Gemini for the next step ---
-        prompt = f"""
-        You are a friendly career counselor. Your goal is to help a user discover
-        their technical skills by asking a series of multiple-choice questions.
-
-        You will be given the conversation history so far. 
-        Your job is to generate the *next single question* based on their previous answers
-        to narrow down their specific skills.
-
-        - If they choose "Web Development", ask about "Frontend vs Backend".
-        - If they choose "AI Engineering", ask about "Data Science vs MLOps".
-        - Keep asking 2-3 follow-up questions to find specific skills.
-        - After 3-4 questions, when you have enough information to identify 
-          a list of 5-10 specific skills (e.g., "Python", "React", "Network Security"), 
-          STOP asking questions and return the final skill list.
-
-        When you have enough skills, respond with this *exact* JSON:
-        {{"final_skills": ["Skill 1", "Skill 2"]}}
-
-        If you need to ask another question, respond with this *exact* JSON:
-        {{"next_question": {{
-            "id": "q2", 
-            "text": "What's the next question?",
-            "options": ["Option A", "Option B", "Option C"]
-        }}}}
-
-        This is the history (the user's last answer was the most recent):
-        {json.dumps(conversation_history)}
-        """
-
-        response = gemini_model.generate_content(prompt)
-
-        if not response.text:
-            print(f"--- DEBUG (ERROR): Gemini response was blocked. Feedback: {response.prompt_feedback}")
-            return "Analysis failed: Gemini response was blocked.", 500, headers
-
-
-        print(f"--- DEBUG: Raw Gemini response: {response.text}")
-        clean_response = response.text.strip().replace("`", "").replace("json", "")
+        # --- If history exists, serve the next step from the cache or ask Gemini ---
+        next_step_data, source = _next_step(conversation_history)
+        if next_step_data is None:
+            return "Analysis failed: Could not generate the next question.", 500, headers
 
-        next_step_data = json.loads(clean_response)
-        print(f"--- DEBUG (SUCCESS): Returning next step: {next_step_data}")
+        print(f"--- DEBUG (SUCCESS): Returning next step ({source}): {next_step_data}")
         return next_step_data, 200, headers
 
     except Exception as e:
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from quiz_tree import path_key
+
+QUIZ_PREFETCH_WORKERS = int(os.environ.get("QUIZ_PREFETCH_WORKERS", "4"))
+# Speculative generations allowed per minute per instance
+QUIZ_PREFETCH_BUDGET = int(os.environ.get("QUIZ_PREFETCH_BUDGET", "60"))
+# A prefetched step not used within this many seconds counts as wasted
+QUIZ_PREFETCH_WINDOW = float(os.environ.get("QUIZ_PREFETCH_WINDOW", "600"))
+
+
+class Prefetcher:
+    """Generates the follow-up step for every option of a returned question in the background.
+
+    Results go into the QuizStepCache, so the option the user picks is
+    usually served from memory (or joins the in-flight generation). Runs
+    on a small pool under a per-minute budget, and tracks which prefetched
+    steps were used so the budget can be tuned. On Cloud Functions this
+    needs CPU allocated outside requests to make progress after the
+    response is sent.
+
+    `generate(history, usage)` returns a step and may put the call's token
+    count in usage["tokens"].
+    """
+
+    def __init__(self, cache, generate, is_valid, workers=QUIZ_PREFETCH_WORKERS,
+                 budget=QUIZ_PREFETCH_BUDGET, window=QUIZ_PREFETCH_WINDOW):
+        self.cache = cache
+        self.generate = generate
+        self.is_valid = is_valid
+        self.budget = budget
+        self.window = window
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quiz-prefetch")
+        self._lock = threading.Lock()
+        self._recent = deque()  # start times of prefetches in the last minute
+        self._pending = {}  # path key -> (finished_at, tokens), waiting to be used
+        self.issued = 0
+        self.hits = 0
+        self.wasted = 0
+        self.over_budget = 0
+        self.tokens = 0
+        self.wasted_tokens = 0
+
+    def _take_budget(self, now):
+        while self._recent and self._recent[0] <= now - 60:
+            self._recent.popleft()
+        if len(self._recent) >= self.budget:
+            return False
+        self._recent.append(now)
+        return True
+
+    def _expire(self, now):
+        for key, (finished_at, tokens) in list(self._pending.items()):
+            if finished_at is not None and finished_at < now - self.window:
+                del self._pending[key]
+                self.wasted += 1
+                self.wasted_tokens += tokens
+
+    def schedule(self, history, step):
+        """Starts prefetching the step after each option of `step`'s next_question."""
+        question = (step or {}).get("next_question")
+        if not isinstance(question, dict):
+            return
+        now = time.time()
+        for option in question.get("options") or []:
+            path = history + [{"question": question.get("text"), "answer": option}]
+            key = path_key(path, self.cache.version)
+            with self._lock:
+                self._expire(now)
+                if key in self._pending:
+                    continue
+                if not self._take_budget(now):
+                    self.over_budget += 1
+                    continue
+                self._pending[key] = (None, 0)
+                self.issued += 1
+            self._executor.submit(self._run, path, key, now)
+
+    def _run(self, path, key, started):
+        # Checked here rather than in schedule(): a store lookup is a network
+        # round trip per option, which the request thread should not wait on
+        if self.cache.lookup(path)[0] is not None:
+            with self._lock:
+                if self._pending.pop(key, None) is not None:
+                    self.issued -= 1
+                if started in self._recent:
+                    self._recent.remove(started)  # Nothing was generated
+            return
+        usage = {}
+        try:
+            self.cache.get_or_generate(path, lambda: self.generate(path, usage), self.is_valid)
+        except Exception as e:
+            print(f"--- DEBUG (ERROR): Quiz prefetch failed: {e}")
+        tokens = usage.get("tokens", 0)
+        with self._lock:
+            self.tokens += tokens
+            if key in self._pending:
+                self._pending[key] = (time.time(), tokens)
+
+    def record_use(self, history):
+        """Call for every served step; counts it as a hit if it was prefetched."""
+        key = path_key(history, self.cache.version)
+        with self._lock:
+            if self._pending.pop(key, None) is not None:
+                self.hits += 1
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.time())
+            settled = self.hits + self.wasted
+            return {
+                "issued": self.issued,
+                "hits": self.hits,
+                "wasted": self.wasted,
+                "pending": len(self._pending),
+                "over_budget": self.over_budget,
+                "hit_rate": round(self.hits / settled, 4) if settled else 0.0,
+                "tokens": self.tokens,
+                "wasted_tokens": self.wasted_tokens,
+            }
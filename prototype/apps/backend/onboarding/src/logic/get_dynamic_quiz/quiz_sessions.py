@@ -0,0 +1,81 @@
+import os
+import uuid
+
+from cache import TieredCache, TTLCache, make_store
+
+QUIZ_SESSION_TTL = int(os.environ.get("QUIZ_SESSION_TTL", str(24 * 3600)))
+# Firestore collection (or SQLite table) holding sessions; handle_quiz_results reads it too
+QUIZ_SESSION_COLLECTION = "quiz_sessions"
+
+
+def transcript_line(turn_number, question, answer):
+    return f"Q{turn_number}: {question}\nA{turn_number}: {answer}\n"
+
+
+def format_history(history):
+    """Compact prompt form of a conversation: one Q/A line pair per turn."""
+    return "".join(
+        transcript_line(i, turn.get("question"), turn.get("answer")) for i, turn in enumerate(history, 1)
+    )
+
+
+class QuizSessions:
+    """Server-side quiz state, so clients send only their latest answer.
+
+    A session is {"user_id", "history", "transcript", "pending", "turn"}:
+    the transcript grows by one line pair per answer instead of being
+    re-serialized, and `pending` is the question awaiting an answer.
+    Sessions live in an in-process TTL cache in front of a persistent store.
+    """
+
+    def __init__(self, store_kind, db=None, ttl=QUIZ_SESSION_TTL):
+        self.cache = TieredCache(
+            QUIZ_SESSION_COLLECTION,
+            memory=TTLCache(max_size=10000, ttl=ttl),
+            store=make_store(store_kind, db, QUIZ_SESSION_COLLECTION),
+            ttl=ttl,
+        )
+
+    def create(self, user_id, first_question):
+        session_id = uuid.uuid4().hex
+        session = {
+            "user_id": user_id,
+            "history": [],
+            "transcript": "",
+            "pending": first_question,
+            "turn": 0,
+        }
+        self.cache.set(session_id, session)
+        return session_id, session
+
+    def load(self, session_id, user_id, turn=None):
+        """Returns the caller's session, or None if it is unknown, expired or someone else's.
+
+        `turn` is the counter the client last saw; if the in-process copy is
+        behind it (another instance handled a turn), the store is read. The
+        returned session's turn can still differ from `turn`.
+        """
+        session = self.cache.memory.get(session_id)
+        if (session is None or (turn is not None and session["turn"] != turn)) and self.cache.store is not None:
+            stored = self.cache.store.get(session_id)
+            if stored is not None:
+                session = stored
+                self.cache.memory.set(session_id, session)
+        if session is None or session.get("user_id") != user_id:
+            return None
+        return session
+
+    def answer(self, session, answer):
+        """Records `answer` to the pending question and returns the updated session."""
+        question = (session.get("pending") or {}).get("text")
+        turn = session["turn"] + 1
+        return {
+            **session,
+            "history": session["history"] + [{"question": question, "answer": answer}],
+            "transcript": session["transcript"] + transcript_line(turn, question, answer),
+            "pending": None,
+            "turn": turn,
+        }
+
+    def save(self, session_id, session):
+        self.cache.set(session_id, session)
@@ -0,0 +1,175 @@
+import os
+import re
+import threading
+
+from cache import fingerprint
+
+# In-memory trie size; the trie is reset when it grows past this
+QUIZ_TRIE_MAX_NODES = int(os.environ.get("QUIZ_TRIE_MAX_NODES", "5000"))
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Case and whitespace folding so equivalent turns share a trie path."""
+    return _SPACE_RE.sub(" ", str(text or "")).strip().casefold()
+
+
+def turn_key(turn):
+    return f"{normalize(turn.get('question'))}\x1f{normalize(turn.get('answer'))}"
+
+
+def path_key(history, version):
+    """Persistent-store key for a conversation path under one prompt version."""
+    return fingerprint("quiz_step", version, [turn_key(turn) for turn in history])
+
+
+class QuizTrie:
+    """Trie over normalized (question, answer) turns.
+
+    A node holds the step generated after the conversation that leads to
+    it, so every prefix of a popular path is cached along the way.
+    """
+
+    def __init__(self, max_nodes=QUIZ_TRIE_MAX_NODES):
+        self.max_nodes = max_nodes
+        self._root = {"step": None, "children": {}}
+        self._nodes = 1
+        self._lock = threading.Lock()
+
+    def get(self, history):
+        node = self._root
+        for turn in history:
+            node = node["children"].get(turn_key(turn))
+            if node is None:
+                return None
+        return node["step"]
+
+    def put(self, history, step):
+        with self._lock:
+            if self.max_nodes and self._nodes + len(history) > self.max_nodes:
+                self._root = {"step": None, "children": {}}
+                self._nodes = 1
+            node = self._root
+            for turn in history:
+                key = turn_key(turn)
+                child = node["children"].get(key)
+                if child is None:
+                    child = node["children"][key] = {"step": None, "children": {}}
+                    self._nodes += 1
+                node = child
+            node["step"] = step
+
+    def __len__(self):
+        return self._nodes
+
+    @classmethod
+    def from_tree(cls, tree):
+        """Loads a frozen decision tree as written by build_quiz_tree.py.
+
+        The tree is nested {"step": ..., "children": {answer: subtree}}, where
+        each child answers the parent step's next_question.
+        """
+        trie = cls(max_nodes=0)
+        stack = [([], tree)]
+        while stack:
+            history, node = stack.pop()
+            step = node.get("step")
+            if history:
+                trie.put(history, step)
+            question = (step or {}).get("next_question", {}).get("text")
+            for answer, child in node.get("children", {}).items():
+                stack.append((history + [{"question": question, "answer": answer}], child))
+        return trie
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+class QuizStepCache:
+    """Next quiz steps by conversation path: frozen tree, memory trie, persistent store, then Gemini.
+
+    `version` (a fingerprint of the prompt) keeps steps from an older prompt
+    out of the persistent store. Generation is single-flight per path.
+    """
+
+    def __init__(self, version, store=None, ttl=30 * 24 * 3600, frozen=None, max_nodes=QUIZ_TRIE_MAX_NODES):
+        self.version = version
+        self.store = store
+        self.ttl = ttl
+        self.frozen = frozen
+        self.trie = QuizTrie(max_nodes)
+        self.counts = {"frozen": 0, "memory": 0, "store": 0, "coalesced": 0, "generated": 0}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _count(self, source):
+        with self._lock:
+            self.counts[source] += 1
+
+    def lookup(self, history):
+        """Returns (step, source) from the cache tiers, or (None, None)."""
+        if self.frozen is not None:
+            step = self.frozen.get(history)
+            if step is not None:
+                return step, "frozen"
+        step = self.trie.get(history)
+        if step is not None:
+            return step, "memory"
+        if self.store is not None:
+            step = self.store.get(path_key(history, self.version))
+            if step is not None:
+                self.trie.put(history, step)
+                return step, "store"
+        return None, None
+
+    def put(self, history, step):
+        self.trie.put(history, step)
+        if self.store is not None:
+            self.store.set(path_key(history, self.version), step, self.ttl)
+
+    def get_or_generate(self, history, generate, is_valid=bool):
+        """Returns (step, source); `generate()` runs only when no tier has the path.
+
+        Steps for which `is_valid(step)` is false are returned but not cached.
+        """
+        step, source = self.lookup(history)
+        if step is not None:
+            self._count(source)
+            return step, source
+
+        key = path_key(history, self.version)
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            self._count("coalesced")
+            return flight.value, "coalesced"
+
+        try:
+            step = generate()
+            if is_valid(step):
+                self.put(history, step)
+            flight.value = step
+            self._count("generated")
+            return step, "generated"
+        finally:
+            flight.done.set()
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        lookups = sum(self.counts.values())
+        hits = lookups - self.counts["generated"]
+        return {
+            **self.counts,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "trie_nodes": len(self.trie),
+        }
@@ -0,0 +1,104 @@
+import json
+import os
+from dataclasses import dataclass
+
+from cache import fingerprint
+from runtime import cached, lazy_import
+from skills import SkillIndex
+
+# numpy is only loaded once a catalog is compiled
+np = lazy_import("numpy")
+
+# careers.json ships next to this module in every function that compiles it
+CAREERS_PATH = os.environ.get("CAREERS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'careers.json'))
+
+
+class CareerMatcher:
+    """Career x skill incidence matrix compiled from careers.json.
+
+    The matrix is kept in CSR form (`indptr`/`indices`, one row per career,
+    columns in catalog order), so scoring a user against every career is a
+    single sparse matrix-vector product and skill gaps are exact set
+    differences, with no LLM call involved. User skills are mapped onto
+    catalog columns through `skill_index` (aliases, folding, fuzzy lookup).
+    """
+
+    def __init__(self, careers):
+        self.careers = [career['displayName'] for career in careers]
+        self.skill_index = SkillIndex(skill for career in careers for skill in career['skills'])
+        self.skills = self.skill_index.skills  # column -> catalog spelling
+        self.columns = {skill: column for column, skill in enumerate(self.skills)}
+        indices, indptr = [], [0]
+        for career in careers:
+            for skill in career['skills']:
+                indices.append(self.columns[self.skill_index.canonical(skill)])
+            indptr.append(len(indices))
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.indptr = np.asarray(indptr, dtype=np.int32)
+        self.required = np.diff(self.indptr).astype(np.float32)
+        # Career row of every entry in `indices`; careers with no skills have none
+        self.rows = np.repeat(np.arange(len(self.careers), dtype=np.int32), np.diff(self.indptr))
+
+    @classmethod
+    def from_file(cls, path='careers.json'):
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def skill_vector(self, skills_list):
+        """0/1 vector over catalog skills; unknown skills are ignored."""
+        vector = np.zeros(len(self.skills), dtype=np.float32)
+        for skill in skills_list:
+            column = self.columns.get(self.skill_index.canonical(skill))
+            if column is not None:
+                vector[column] = 1.0
+        return vector
+
+    def scores(self, vector):
+        """Returns (overlap, coverage) for every career in one pass."""
+        overlap = np.bincount(self.rows, weights=vector[self.indices], minlength=len(self.careers))
+        coverage = overlap / np.maximum(self.required, 1)
+        return overlap, coverage
+
+    def match(self, skills_list, top_n=3, max_gaps=5):
+        """Ranks careers by coverage of their required skills (ties: raw overlap).
+
+        Returns [{"career", "score", "matched_skills", "skill_gaps"}], best
+        first. Gaps keep catalog order, which lists core skills first.
+        Careers sharing no skill with the user are left out, so the result is
+        empty when nothing in the catalog matches (e.g. only soft skills).
+        """
+        vector = self.skill_vector(skills_list)
+        overlap, coverage = self.scores(vector)
+        ranked = [row for row in np.lexsort((-overlap, -coverage)) if overlap[row] > 0][:top_n]
+
+        results = []
+        for row in ranked:
+            columns = self.indices[self.indptr[row]:self.indptr[row + 1]]
+            have = vector[columns] > 0
+            results.append({
+                "career": self.careers[row],
+                "score": round(float(coverage[row]), 4),
+                "matched_skills": [self.skills[c] for c in columns[have]],
+                "skill_gaps": [self.skills[c] for c in columns[~have]][:max_gaps],
+            })
+        return results
+
+
+@dataclass
+class Catalog:
+    careers: dict  # {CareerName: [skills]}, the form used in prompts
+    matcher: CareerMatcher
+    version: str  # changes with any edit to careers.json
+
+
+def load_catalog(path=CAREERS_PATH):
+    """Parses and compiles careers.json once per process; later calls share the result."""
+    def build():
+        with open(path, 'r') as f:
+            careers_list = json.load(f)
+        return Catalog(
+            careers={career['displayName']: career['skills'] for career in careers_list},
+            matcher=CareerMatcher(careers_list),
+            version=fingerprint(careers_list),
+        )
+    return cached(f"catalog:{os.path.abspath(path)}", build)
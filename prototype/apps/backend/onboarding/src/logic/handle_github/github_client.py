@@ -0,0 +1,135 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from cache import TieredCache, TTLCache
+from github_quota import HIGH, LOW, GitHubRateLimited, TokenPool
+
+# Override to point the client at a local mock server
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+# Most recently pushed repos considered per user (fetched 100 per page)
+GITHUB_MAX_REPOS = int(os.environ.get("GITHUB_MAX_REPOS", "200"))
+GITHUB_WORKERS = int(os.environ.get("GITHUB_WORKERS", "8"))
+GITHUB_TIMEOUT = float(os.environ.get("GITHUB_TIMEOUT", "10"))
+PER_PAGE = 100
+
+
+class GitHubNotFound(Exception):
+    """The requested GitHub user or repository does not exist."""
+
+
+def _last_page(response):
+    last = response.links.get("last", {}).get("url")
+    if not last:
+        return 1
+    return int(parse_qs(urlparse(last).query).get("page", ["1"])[0])
+
+
+class GitHubClient:
+    """GitHub REST client over a pooled session with conditional requests.
+
+    Every 200 response with an ETag is cached; later requests for the same
+    URL send If-None-Match and a 304 (which GitHub does not count against the
+    rate limit) is answered from the cache. Repo pages and per-repo language
+    breakdowns are fetched concurrently, spread over `tokens` by a TokenPool.
+    """
+
+    def __init__(self, tokens, base_url=GITHUB_API_URL, cache=None, workers=GITHUB_WORKERS, timeout=GITHUB_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cache = cache or TieredCache("github_cache", memory=TTLCache(max_size=2048, ttl=24 * 3600), ttl=24 * 3600)
+        self.pool = TokenPool(tokens)
+        self.session = requests.Session()
+        self.session.headers.update({"Accept": "application/vnd.github.v3+json"})
+        retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="github")
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+
+    def _send(self, url, params, headers, priority, wait):
+        """Sends one GET on a pooled token, moving to another token if this one is throttled."""
+        for _ in range(len(self.pool) + 1):
+            token = self.pool.acquire(priority, wait)
+            response = None
+            try:
+                response = self.session.get(
+                    url, params=params, timeout=self.timeout,
+                    headers={**headers, "Authorization": f"token {token.token}"},
+                )
+            finally:
+                throttled = self.pool.release(token, response)
+            if not throttled:
+                return response
+        raise GitHubRateLimited(60.0)
+
+    def get(self, path, params=None, priority=HIGH, wait=None):
+        """GETs an API path and returns (json, last_page), revalidating cached responses."""
+        url = f"{self.base_url}{path}"
+        key = url + "?" + "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+        cached = self.cache.get(key)
+        headers = {"If-None-Match": cached["etag"]} if cached else {}
+
+        response = self._send(url, params, headers, priority, wait)
+        with self._lock:
+            self.requests += 1
+            if response.status_code == 304:
+                self.not_modified += 1
+        if response.status_code == 304 and cached:
+            return cached["data"], cached["last_page"]
+        if response.status_code == 404:
+            raise GitHubNotFound(path)
+        response.raise_for_status()
+
+        data = response.json()
+        last_page = _last_page(response)
+        etag = response.headers.get("ETag")
+        if etag:
+            self.cache.set(key, {"etag": etag, "data": data, "last_page": last_page})
+        return data, last_page
+
+    def get_repos(self, username, max_repos=GITHUB_MAX_REPOS):
+        """The user's most recently pushed repos; pages after the first are fetched in parallel."""
+        path = f"/users/{username}/repos"
+
+        def page(number):
+            return self.get(path, {"sort": "pushed", "per_page": PER_PAGE, "page": number})
+
+        first, last_page = page(1)
+        repos = list(first)  # the first page may be the cached list itself
+        pages = min(last_page, -(-max_repos // PER_PAGE))
+        for data, _ in self._executor.map(page, range(2, pages + 1)):
+            repos.extend(data)
+        return repos[:max_repos]
+
+    def get_languages(self, repos):
+        """Language breakdowns ({language: bytes}) keyed by repo name, fetched in parallel.
+
+        These are optional enrichment, so they run at LOW priority and are
+        skipped rather than waited for when quota is short.
+        """
+        def languages(repo):
+            try:
+                data, _ = self.get(f"/repos/{repo['full_name']}/languages", priority=LOW, wait=1.0)
+                return data
+            except Exception as e:
+                print(f"--- DEBUG (ERROR): Languages for {repo.get('full_name')} failed: {e}")
+                return {}
+
+        return dict(zip((repo["name"] for repo in repos), self._executor.map(languages, repos)))
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "cached": len(self.cache.memory),
+            "quota": self.pool.metrics(),
+        }
@@ -0,0 +1,185 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+
+# Requests each token keeps in hand; a token at its reserve is paused until its reset
+GITHUB_QUOTA_RESERVE = int(os.environ.get("GITHUB_QUOTA_RESERVE", "50"))
+# Low-priority requests (e.g. language breakdowns) stop once a token is below this share of its limit
+GITHUB_LOW_PRIORITY_SHARE = float(os.environ.get("GITHUB_LOW_PRIORITY_SHARE", "0.2"))
+GITHUB_MAX_IN_FLIGHT = int(os.environ.get("GITHUB_MAX_IN_FLIGHT", "8"))
+# Longest a request waits for quota before it is rejected with a retry-after
+GITHUB_QUEUE_TIMEOUT = float(os.environ.get("GITHUB_QUEUE_TIMEOUT", "10"))
+
+HIGH = 0
+LOW = 1
+
+
+class GitHubRateLimited(Exception):
+    """No token has quota left within the wait budget; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"GitHub rate limit reached, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class _Token:
+    def __init__(self, token):
+        self.token = token
+        self.limit = None
+        self.remaining = None  # unknown until the first response
+        self.reset_at = 0.0
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self.used = 0
+
+
+class TokenPool:
+    """Spreads GitHub requests over several tokens using their rate-limit headers.
+
+    Each request acquires the token with the most remaining quota. Tokens at
+    their reserve, or throttled by a 403/429, are paused until they reset.
+    Waiting requests are served in priority order (HIGH before LOW), and a
+    request that cannot be served within its wait budget fails fast with
+    GitHubRateLimited instead of hanging.
+    """
+
+    def __init__(self, tokens, reserve=GITHUB_QUOTA_RESERVE, low_priority_share=GITHUB_LOW_PRIORITY_SHARE,
+                 max_in_flight=GITHUB_MAX_IN_FLIGHT, queue_timeout=GITHUB_QUEUE_TIMEOUT):
+        if not tokens:
+            raise ValueError("TokenPool needs at least one token")
+        self._tokens = [_Token(token) for token in tokens]
+        self.reserve = reserve
+        self.low_priority_share = low_priority_share
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self.acquired = 0
+        self.queued = 0
+        self.wait_seconds = 0.0
+        self.throttled = 0
+        self.rejected = 0
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def _floor(self, token, priority):
+        if priority == LOW and token.limit:
+            return max(self.reserve, int(token.limit * self.low_priority_share))
+        return self.reserve
+
+    def _quota_low(self, token, priority, now):
+        if token.remaining is None or token.reset_at <= now:
+            return False
+        return token.remaining - token.in_flight <= self._floor(token, priority)
+
+    def _available(self, priority, now):
+        best, best_left = None, -1
+        for token in self._tokens:
+            if token.paused_until > now or token.in_flight >= self.max_in_flight:
+                continue
+            if self._quota_low(token, priority, now):
+                continue
+            if token.remaining is None or token.reset_at <= now:
+                left = float("inf")
+            else:
+                left = token.remaining - token.in_flight
+            if left > best_left:
+                best, best_left = token, left
+        return best
+
+    def _next_free_at(self, priority, now):
+        """Earliest time some token could serve a request of this priority."""
+        free_at = []
+        for token in self._tokens:
+            if token.paused_until > now:
+                free_at.append(token.paused_until)
+            elif self._quota_low(token, priority, now):
+                free_at.append(token.reset_at)
+            else:
+                free_at.append(now)  # only busy; a release will wake us
+        return min(free_at)
+
+    def acquire(self, priority=HIGH, timeout=None):
+        """Blocks until a token with quota is free; returns it (pass it to release())."""
+        start = time.time()
+        deadline = start + (self.queue_timeout if timeout is None else timeout)
+        entry = (priority, next(self._seq))
+        waited = False
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.time()
+                    if self._waiters[0] == entry:
+                        token = self._available(priority, now)
+                        if token is not None:
+                            token.in_flight += 1
+                            self.acquired += 1
+                            if waited:
+                                self.queued += 1
+                                self.wait_seconds += now - start
+                            return token
+                    free_at = self._next_free_at(priority, now)
+                    if free_at > deadline or now >= deadline:
+                        self.rejected += 1
+                        raise GitHubRateLimited(max(free_at - now, 1.0))
+                    self._cond.wait(max(min(free_at, deadline) - now, 0.05))
+                    waited = True
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def release(self, token, response=None):
+        """Records a response's rate-limit headers; returns True if the token was throttled."""
+        throttled = False
+        with self._cond:
+            token.in_flight -= 1
+            if response is not None:
+                headers = response.headers
+                if "X-RateLimit-Remaining" in headers:
+                    remaining = int(headers["X-RateLimit-Remaining"])
+                    reset_at = float(headers.get("X-RateLimit-Reset", 0))
+                    # Concurrent responses arrive out of order; within a window the lowest count is newest
+                    if reset_at == token.reset_at and token.remaining is not None:
+                        remaining = min(remaining, token.remaining)
+                    token.remaining = remaining
+                    token.reset_at = reset_at
+                    token.limit = int(headers.get("X-RateLimit-Limit", token.limit or 0)) or None
+                if response.status_code != 304:
+                    token.used += 1
+                if response.status_code in (403, 429) and (token.remaining == 0 or "Retry-After" in headers):
+                    retry_after = headers.get("Retry-After")
+                    token.paused_until = time.time() + float(retry_after) if retry_after else token.reset_at
+                    self.throttled += 1
+                    throttled = True
+            self._cond.notify_all()
+        return throttled
+
+    def metrics(self):
+        now = time.time()
+        with self._cond:
+            tokens = [{
+                "token": f"...{token.token[-4:]}",
+                "remaining": token.remaining,
+                "limit": token.limit,
+                "reset_in": max(0, round(token.reset_at - now)),
+                "in_flight": token.in_flight,
+                "paused": token.paused_until > now,
+                "used": token.used,
+            } for token in self._tokens]
+            known = [t for t in tokens if t["limit"]]
+            limit = sum(t["limit"] for t in known)
+            return {
+                "tokens": tokens,
+                "utilization": round(1 - sum(t["remaining"] for t in known) / limit, 4) if limit else 0.0,
+                "acquired": self.acquired,
+                "queued": self.queued,
+                "avg_wait": round(self.wait_seconds / self.queued, 3) if self.queued else 0.0,
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+            }
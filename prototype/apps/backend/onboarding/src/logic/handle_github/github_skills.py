@@ -0,0 +1,167 @@
+import os
+import re
+import threading
+from collections import Counter
+
+from skills import fold
+
+# A profile is handled locally when at least this many skills are found...
+GITHUB_RULES_MIN_SKILLS = int(os.environ.get("GITHUB_RULES_MIN_SKILLS", "3"))
+# ...and at least this share of its repos produced a skill
+GITHUB_RULES_MIN_COVERAGE = float(os.environ.get("GITHUB_RULES_MIN_COVERAGE", "0.5"))
+# Languages below this share of a repo's code are ignored
+MIN_LANGUAGE_SHARE = 0.1
+
+# GitHub languages and topics that imply catalog skills beyond their literal
+# name. Names that match a catalog skill or alias directly need no entry.
+SIGNALS = {
+    "Jupyter Notebook": ["Python"],
+    "Dockerfile": ["Docker"],
+    "docker-compose": ["Docker"],
+    "HCL": ["Terraform"],
+    "Vue": ["JavaScript"],
+    "Svelte": ["JavaScript"],
+    "SCSS": ["CSS"],
+    "Sass": ["CSS"],
+    "Dart": ["Flutter"],
+    "ShaderLab": ["Shader Programming", "Unity"],
+    "GLSL": ["Shader Programming"],
+    "HLSL": ["Shader Programming"],
+    "PLpgSQL": ["PostgreSQL", "SQL"],
+    "TSQL": ["SQL"],
+    "nextjs": ["Next.js", "React"],
+    "reactjs": ["React"],
+    "react-native": ["React Native"],
+    "nodejs": ["Node.js"],
+    "expressjs": ["Express.js"],
+    "deep-learning": ["Machine Learning"],
+    "neural-network": ["Machine Learning"],
+    "computer-vision": ["OpenCV", "Image Processing"],
+    "nlp": ["NLP Preprocessing"],
+    "natural-language-processing": ["NLP Preprocessing"],
+    "openai": ["OpenAI API"],
+    "chatgpt": ["OpenAI API", "LLMs"],
+    "gpt": ["LLMs"],
+    "rag": ["Retrieval-Augmented Generation (RAG)"],
+    "github-actions": ["CI/CD"],
+    "mlops": ["MLOps"],
+    "arduino": ["Microcontrollers"],
+    "esp32": ["Microcontrollers", "IoT Protocols"],
+    "stm32": ["Microcontrollers"],
+    "mqtt": ["IoT Protocols"],
+    "iot": ["IoT Protocols"],
+    "raspberry-pi": ["Embedded Linux"],
+    "freertos": ["RTOS"],
+    "web3": ["Web3.js"],
+    "blockchain": ["Blockchain Architecture"],
+    "dapp": ["Smart Contracts"],
+    "hardhat": ["Solidity", "Smart Contracts"],
+    "unity3d": ["Unity"],
+    "unreal": ["Unreal Engine"],
+    "dashboard": ["Data Visualization"],
+    "seaborn": ["Data Visualization"],
+    "plotly": ["Data Visualization"],
+    "streamlit": ["Python", "Data Visualization"],
+    "django": ["Python", "REST APIs"],
+    "flask": ["Python", "REST APIs"],
+    "fastapi": ["Python", "REST APIs"],
+    "spring-boot": ["Java", "REST APIs"],
+    "api": ["APIs"],
+    "pentest": ["Penetration Testing"],
+    "ctf": ["Penetration Testing"],
+    "selenium-webdriver": ["Selenium"],
+    "pytest": ["Python", "Regression Testing"],
+    "jest": ["JavaScript", "Regression Testing"],
+}
+
+# Short or everyday words that only count as skills in trusted fields
+# (language, topics), not in free-text names and descriptions
+AMBIGUOUS = {fold(word) for word in (
+    "Go", "R", "C", "Next", "Node", "Express", "Swift", "Spark", "Unity", "Excel",
+    "Rust", "REST", "Git", "APIs", "Monitoring", "Networking", "Analytics",
+)}
+
+_WORD_RE = re.compile(r"[A-Za-z0-9+#.]+")
+_MAX_WORDS = 3
+
+
+class RuleSkillExtractor:
+    """Deterministic GitHub skill extraction through a precompiled lookup table.
+
+    Repo languages, topics and language breakdowns are trusted signals;
+    names and descriptions are scanned as 1-3 word phrases against the same
+    table (minus ambiguous words). Catalog skills and aliases come from the
+    matcher's SkillIndex, so results are already canonical.
+    """
+
+    def __init__(self, skill_index, signals=SIGNALS):
+        self.skill_index = skill_index
+        known = set(skill_index.skills)
+        # folded phrase -> catalog skills
+        self.table = {}
+        for phrase, skills in signals.items():
+            skills = tuple(skill for skill in skills if skill in known)
+            if skills:
+                self.table[fold(phrase)] = skills
+        self.fast_path = 0
+        self.fallback = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, phrase, trusted):
+        key = fold(phrase)
+        if not key:
+            return ()
+        if key in self.table:
+            return self.table[key]
+        if not trusted and (len(key) < 3 or key in AMBIGUOUS):
+            return ()
+        skill = self.skill_index.exact(key)
+        return (skill,) if skill else ()
+
+    def _repo_skills(self, repo):
+        found = set()
+        languages = repo.get("languages") or {}
+        total = sum(languages.values())
+        trusted = [repo.get("language")] + list(repo.get("topics") or [])
+        trusted += [name for name, size in languages.items() if total and size / total >= MIN_LANGUAGE_SHARE]
+        for phrase in trusted:
+            if phrase:
+                found.update(self._lookup(phrase, trusted=True))
+
+        text = f"{(repo.get('name') or '').replace('-', ' ').replace('_', ' ')} {repo.get('description') or ''}"
+        words = _WORD_RE.findall(text)
+        for size in range(1, _MAX_WORDS + 1):
+            for i in range(len(words) - size + 1):
+                found.update(self._lookup(" ".join(words[i:i + size]), trusted=False))
+        return found
+
+    def extract(self, repos):
+        """Returns (skills, confident): skills ordered by how many repos show them.
+
+        `confident` is False when the profile has too little signal for the
+        rules alone; the caller should fall back to Gemini then.
+        """
+        counts = Counter()
+        covered = 0
+        for repo in repos:
+            found = self._repo_skills(repo)
+            if found:
+                covered += 1
+                counts.update(found)
+        skills = [skill for skill, _ in counts.most_common()]
+        coverage = covered / len(repos) if repos else 0.0
+        confident = len(skills) >= GITHUB_RULES_MIN_SKILLS and coverage >= GITHUB_RULES_MIN_COVERAGE
+        with self._lock:
+            if confident:
+                self.fast_path += 1
+            else:
+                self.fallback += 1
+        return skills, confident
+
+    def stats(self):
+        total = self.fast_path + self.fallback
+        return {
+            "fast_path": self.fast_path,
+            "fallback": self.fallback,
+            "hit_rate": round(self.fast_path / total, 4) if total else 0.0,
+        }
@@ -1,53 +1,93 @@
 import functions_framework
-import firebase_admin
-from firebase_admin import auth
-from google.cloud import firestore
-import google.cloud.firestore
-import vertexai
-from vertexai.generative_models import GenerativeModel, Part, HarmCategory, HarmBlockThreshold
 import json
 import os
-import requests 
+import time
+import requests
+
+import runtime
+from catalog import load_catalog
+from github_client import GitHubClient, GitHubNotFound
+from github_skills import RuleSkillExtractor
+from github_quota import GitHubRateLimited
+from fused import STRUCTURED_STEPS, generate_fused
+from cache import TTLCache, TieredCache, make_store
+from roadmaps import iter_roadmaps, roadmap_key
+from streaming import ndjson_response, wants_stream
 
 # --- INITIALIZATION ---
-PROJECT_ID = "rock-idiom-475618-q4"
-LOCATION = "asia-south1"
+PROJECT_ID = runtime.PROJECT_ID
+LOCATION = runtime.LOCATION
 GEMINI_MODEL = "gemini-2.5-flash"
+# "local" ranks careers with the compiled catalog only; "gemini" also asks Gemini to re-rank
+RECOMMENDATION_MODE = os.environ.get("RECOMMENDATION_MODE", "local")
+# Number of locally shortlisted careers sent to Gemini in "gemini" mode
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", "8"))
+# "multi": recommendations then one call per roadmap; "fused": one structured call for everything.
+# Can be overridden per request with ?pipeline=fused|multi to compare the two.
+PIPELINE_MODE = os.environ.get("PIPELINE_MODE", "multi")
+# Persistent roadmap cache tier: "firestore", "sqlite" (local stand-in) or "none"
+ROADMAP_CACHE_STORE = os.environ.get("ROADMAP_CACHE_STORE", "firestore")
+ROADMAP_CACHE_TTL = int(os.environ.get("ROADMAP_CACHE_TTL", str(7 * 24 * 3600)))
 
 # --- !! CORRECT & SECURE !! ---
 # Read the token from an environment variable
 GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN")
+# Optional comma-separated pool of tokens; requests are spread over them by remaining quota
+GITHUB_TOKENS = [t.strip() for t in os.environ.get("GITHUB_TOKENS", GITHUB_TOKEN or "").split(",") if t.strip()]
 # --- !! CORRECT & SECURE !! ---
+# Also fetch each repo's language breakdown (one extra request per repo, in parallel)
+GITHUB_FETCH_LANGUAGES = os.environ.get("GITHUB_FETCH_LANGUAGES", "0").lower() in ("1", "true")
+# Persistent tier for cached GitHub responses (ETags): "firestore", "sqlite" or "none" (memory only)
+GITHUB_CACHE_STORE = os.environ.get("GITHUB_CACHE_STORE", "none")
+# "rules": local rule-based skill extraction, Gemini only for low-confidence profiles; "gemini": always Gemini
+GITHUB_SKILLS_MODE = os.environ.get("GITHUB_SKILLS_MODE", "rules")
 
-try:
-    firebase_admin.initialize_app()
-except ValueError:
-    pass # App already initialized
+# Clients, the Gemini model and heavy SDK modules are created on first use (see runtime.py)
+firestore = runtime.lazy_import("google.cloud.firestore")
+db = runtime.lazy_firestore()
+gemini_model = runtime.lazy_gemini(GEMINI_MODEL)
 
+# Career catalog, compiled on the first request (see _load_catalog)
 CAREERS_CATALOG = {}
-try:
-    with open('careers.json', 'r') as f:
-        careers_list = json.load(f)
-        # Create a simple {CareerName: [skills]} dictionary for the prompt
-        CAREERS_CATALOG = {career['displayName']: career['skills'] for career in careers_list}
-    print(f"--- DEBUG: Successfully loaded {len(CAREERS_CATALOG)} careers from catalog.")
-except Exception as e:
-    print(f"--- DEBUG (CRITICAL ERROR): Failed to load careers.json: {e}")
-# --- END NEW ---
-
-vertexai.init(project=PROJECT_ID, location=LOCATION)
-db = firestore.Client() # <-- Fixed with capital 'C'
-
-# --- Define safety settings to block nothing ---
-safety_settings = {
-    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-}
-gemini_model = GenerativeModel(GEMINI_MODEL, safety_settings=safety_settings)
+CAREER_MATCHER = None
+SKILL_EXTRACTOR = None
+
+# Roadmaps shared by every user with the same (career, skill gaps), and by every
+# handler in the process when they are served together (see onboarding_service)
+ROADMAP_CACHE = runtime.cached("roadmap_cache", lambda: TieredCache(
+    "roadmap_cache",
+    memory=TTLCache(max_size=512, ttl=ROADMAP_CACHE_TTL),
+    store=make_store(ROADMAP_CACHE_STORE, db, "roadmap_cache"),
+    ttl=ROADMAP_CACHE_TTL,
+))
+
+# Pooled GitHub client; its response cache turns repeat fetches into free 304s
+GITHUB_CLIENT = None
+if GITHUB_TOKENS:
+    GITHUB_CLIENT = GitHubClient(GITHUB_TOKENS, cache=TieredCache(
+        "github_cache",
+        memory=TTLCache(max_size=2048, ttl=24 * 3600),
+        store=make_store(GITHUB_CACHE_STORE, db, "github_cache"),
+        ttl=24 * 3600,
+    ))
 
 # --- SHARED HELPER FUNCTIONS ---
+
+def _load_catalog():
+    """Fills the catalog globals from careers.json on first use; CORS preflights never load it."""
+    global CAREERS_CATALOG, CAREER_MATCHER, SKILL_EXTRACTOR
+    if CAREER_MATCHER is not None:
+        return
+    try:
+        catalog = load_catalog()
+        CAREERS_CATALOG = catalog.careers
+        # Compiled career x skill matrix for local matching
+        CAREER_MATCHER = catalog.matcher
+        # Maps repo languages/topics/keywords onto catalog skills without Gemini
+        SKILL_EXTRACTOR = RuleSkillExtractor(CAREER_MATCHER.skill_index)
+        print(f"--- DEBUG: Successfully loaded {len(CAREERS_CATALOG)} careers from catalog.")
+    except Exception as e:
+        print(f"--- DEBUG (CRITICAL ERROR): Failed to load careers.json: {e}")
     
 def _call_gemini(prompt, file_part=None):
     """Helper to call Gemini, with safety checks."""
@@ -61,6 +101,9 @@ def _call_gemini(prompt, file_part=None):
         if not response.text:
             print(f"--- DEBUG (ERROR): Gemini response was blocked or empty. Feedback: {response.prompt_feedback}")
             return None
+
+        usage = response.usage_metadata
+        print(f"--- DEBUG: Gemini tokens: {usage.prompt_token_count} prompt, {usage.candidates_token_count} output")
         
         # Clean up markdown fences
         clean_response = response.text.strip().replace("`", "").replace("json", "")
@@ -69,17 +112,47 @@ def _call_gemini(prompt, file_part=None):
         print(f"--- DEBUG (ERROR): Error calling Gemini: {e}")
         return None
 
+def _canonical_skills(skills_list):
+    """Maps skill names onto canonical catalog spellings and drops duplicates."""
+    if CAREER_MATCHER is None:
+        return skills_list
+    return CAREER_MATCHER.skill_index.canonicalize(skills_list)
+
 def _get_recommendations(skills_list):
-    """Generates recommendations and gaps from a list of skills using a fixed catalog."""
+    """Ranks catalog careers against a list of skills and computes exact skill gaps."""
     print(f"--- DEBUG: Getting recommendations for skills: {skills_list}")
 
     # If the catalog failed to load, return an error
-    if not CAREERS_CATALOG:
+    if not CAREERS_CATALOG or CAREER_MATCHER is None:
         print("--- DEBUG (CRITICAL ERROR): Career catalog is empty. Aborting analysis.")
         return None
 
-    # Convert the catalog to a JSON string to pass to the prompt
-    catalog_json = json.dumps(CAREERS_CATALOG, indent=2)
+    top_n = max(RERANK_CANDIDATES, 3) if RECOMMENDATION_MODE == "gemini" else 3
+    matches = CAREER_MATCHER.match(skills_list, top_n=top_n)
+    if not matches:
+        # An explicit "no match" rather than arbitrary careers at score 0
+        print("--- DEBUG: No catalog career shares a skill with the user.")
+        return {"recommendations": []}
+
+    if RECOMMENDATION_MODE == "gemini":
+        reranked = _get_gemini_recommendations(skills_list, matches)
+        if reranked and reranked.get("recommendations"):
+            return reranked
+        print("--- DEBUG: Gemini re-rank failed, falling back to local ranking.")
+
+    return {"recommendations": [
+        {"career": match["career"], "skill_gaps": match["skill_gaps"]} for match in matches[:3]
+    ]}
+
+def _get_gemini_recommendations(skills_list, candidates):
+    """Optional Gemini re-rank over a local shortlist of candidate careers."""
+    # Only the shortlisted careers go into the prompt, in compact form, so the
+    # prompt size stays flat as careers.json grows.
+    shortlist = {match["career"]: CAREERS_CATALOG[match["career"]] for match in candidates}
+    catalog_json = json.dumps(shortlist, separators=(",", ":"))
+    full_tokens = len(json.dumps(CAREERS_CATALOG, indent=2)) // 4
+    print(f"--- DEBUG: Catalog prompt ~{full_tokens} tokens in full, ~{len(catalog_json) // 4} tokens "
+          f"for {len(shortlist)}/{len(CAREERS_CATALOG)} shortlisted careers.")
 
     prompt = f"""
     You are an expert career and HR analyst. You MUST follow these instructions.
@@ -87,7 +160,7 @@ def _get_recommendations(skills_list):
     A user has this list of skills:
     {json.dumps(skills_list)}
 
-    Here is your complete "Career Catalog". You MUST use this catalog exclusively. Do not invent new careers or skills.
+    Here is your "Career Catalog", shortlisted to the careers closest to the user's skills and ordered by skill coverage. You MUST use this catalog exclusively. Do not invent new careers or skills.
     The catalog is a JSON object where the key is the "Career Name" and the value is the "List of Required Skills".
 
     --- CATALOG START ---
@@ -144,48 +217,171 @@ def _get_roadmap(career_name, skill_gaps):
         print(f"--- DEBUG (ERROR): Failed to parse roadmap JSON: {e}")
         return []
 
+def _get_cached_roadmap(career_name, skill_gaps):
+    """Serves a roadmap from the two-tier cache, generating it once on a miss."""
+    key = roadmap_key(career_name, _canonical_skills(skill_gaps or []), "steps")
+    return ROADMAP_CACHE.get_or_compute(key, lambda: _get_roadmap(career_name, skill_gaps))
+
+def _get_fused_recommendations(skills_list):
+    """One structured Gemini call for recommendations, skill gaps and roadmaps."""
+    if CAREER_MATCHER is None:
+        return None
+    candidates = CAREER_MATCHER.match(skills_list, top_n=max(RERANK_CANDIDATES, 3), max_gaps=10)
+    if not candidates:
+        print("--- DEBUG: No catalog career shares a skill with the user.")
+        return []
+    recommendations = generate_fused(gemini_model, skills_list, candidates, CAREERS_CATALOG, STRUCTURED_STEPS)
+    if recommendations is None:
+        return None
+    return [rec.to_dict() for rec in recommendations]
+
+def _iter_pipeline(skills_list, pipeline=PIPELINE_MODE):
+    """Runs recommendations + roadmaps, yielding each stage as soon as it is ready.
+
+    Yields ("recommendations", recs) once (recs is None on failure), then
+    ("roadmap", rec) per career. The "fused" pipeline falls back to the
+    multi-call one if its single call fails.
+    """
+    started = time.monotonic()
+    if pipeline == "fused":
+        recommendations = _get_fused_recommendations(skills_list)
+        if recommendations is not None:
+            yield "recommendations", recommendations
+            for rec in recommendations:
+                yield "roadmap", rec
+            print(f"--- DEBUG: fused pipeline took {time.monotonic() - started:.2f}s")
+            return
+        print("--- DEBUG: fused pipeline failed, falling back to multi-call")
+
+    analysis_data = _get_recommendations(skills_list)
+    if not analysis_data:
+        yield "recommendations", None
+        return
+    recommendations = analysis_data.get("recommendations", [])
+    yield "recommendations", recommendations
+    # Roadmaps are generated concurrently, a timed-out one comes back empty
+    for rec in iter_roadmaps(_get_cached_roadmap, recommendations):
+        yield "roadmap", rec
+    print(f"--- DEBUG: Roadmap cache: {ROADMAP_CACHE.stats()}")
+    print(f"--- DEBUG: multi pipeline took {time.monotonic() - started:.2f}s")
+
+def _build_recommendations(skills_list, pipeline=PIPELINE_MODE):
+    """Runs the whole pipeline and returns the recommendations with roadmaps."""
+    recommendations = None
+    for stage, value in _iter_pipeline(skills_list, pipeline):
+        if stage == "recommendations":
+            recommendations = value
+    return recommendations
+
+def _save_results(user_id, skills_list, recommendations):
+    save_data = {
+        "skills": skills_list,
+        "recommendations": recommendations,
+        "last_updated_from": "github",
+        "last_updated": firestore.SERVER_TIMESTAMP
+    }
+    db.collection("users").document(user_id).set(save_data, merge=True)
+
+def _stream_results(user_id, skills_list, pipeline=PIPELINE_MODE):
+    """NDJSON events: skills, recommendations, one per roadmap, then done (after the Firestore write)."""
+    yield {"stage": "skills", "skills": skills_list}
+    try:
+        recommendations = None
+        for stage, value in _iter_pipeline(skills_list, pipeline):
+            if stage == "recommendations":
+                if value is None:
+                    yield {"stage": "error", "message": "Failed to generate career recommendations."}
+                    return
+                recommendations = value
+                yield {"stage": "recommendations", "recommendations": [
+                    {"career": rec.get("career"), "skill_gaps": rec.get("skill_gaps", [])} for rec in value
+                ]}
+            else:
+                yield {"stage": "roadmap", "career": value.get("career"), "roadmap": value.get("roadmap", [])}
+
+        _save_results(user_id, skills_list, recommendations)
+        yield {"stage": "done", "skills": skills_list, "recommendations": recommendations}
+    except Exception as e:
+        print(f"--- DEBUG (CRASH): Streaming pipeline error: {e}")
+        yield {"stage": "error", "message": str(e)}
+
 # --- NEW GITHUB FETCHER ---
+def _format_languages(languages):
+    total = sum(languages.values())
+    if not total:
+        return ""
+    top = sorted(languages.items(), key=lambda item: item[1], reverse=True)[:5]
+    return ", ".join(f"{name} {size * 100 // total}%" for name, size in top)
+
 def _get_github_data(username):
-    """Fetches repository data from the GitHub API."""
-    if not GITHUB_TOKEN:
+    """Fetches the user's repositories (with language breakdowns if enabled) from the GitHub API."""
+    if not GITHUB_CLIENT:
         print("--- DEBUG (CRASH): GITHUB_TOKEN environment variable is not set.")
         # Raise an exception to stop the function
         raise ValueError("GITHUB_TOKEN is not configured.")
 
     print(f"--- DEBUG: Fetching GitHub data for {username}")
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    # Get the user's 30 most recently pushed repos
-    url = f"https://api.github.com/users/{username}/repos?sort=pushed&per_page=30"
-    
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status() # Raises an error for bad responses (4xx, 5xx)
-        repos = response.json()
-        
-        # Combine the most important text data
-        data_for_analysis = []
-        for repo in repos:
-            repo_text = f"Repo: {repo.get('name')}, Description: {repo.get('description')}, Language: {repo.get('language')}"
-            data_for_analysis.append(repo_text)
-            
-        print(f"--- DEBUG: Found {len(data_for_analysis)} repos.")
-        if not data_for_analysis:
+        repos = GITHUB_CLIENT.get_repos(username)
+        if GITHUB_FETCH_LANGUAGES:
+            languages = GITHUB_CLIENT.get_languages(repos)
+            repos = [{**repo, "languages": languages.get(repo.get("name"), {})} for repo in repos]
+
+        print(f"--- DEBUG: Found {len(repos)} repos. GitHub client: {GITHUB_CLIENT.stats()}")
+        if not repos:
             return None # User exists but has no public repos
-            
-        return "\n".join(data_for_analysis)
-        
-    except requests.exceptions.HTTPError as http_err:
-        if response.status_code == 404:
-            print(f"--- DEBUG (ERROR): GitHub user not found: {username}")
-            return None # User not found
-        print(f"--- DEBUG (ERROR): HTTP error fetching GitHub data: {http_err}")
-        return None
+
+        return repos
+
+    except GitHubNotFound:
+        print(f"--- DEBUG (ERROR): GitHub user not found: {username}")
+        return None # User not found
     except Exception as e:
-        print(f"--- DEBUG (ERROR): Other error fetching GitHub data: {e}")
+        # Rate limits and outages are not "user not found"; let the handler report them
+        print(f"--- DEBUG (ERROR): Error fetching GitHub data: {e}")
+        raise
+
+def _github_text(repos):
+    """Combines the most important repo fields into text for Gemini."""
+    data_for_analysis = []
+    for repo in repos:
+        repo_text = f"Repo: {repo.get('name')}, Description: {repo.get('description')}, Language: {repo.get('language')}"
+        breakdown = _format_languages(repo.get("languages") or {})
+        if breakdown:
+            repo_text += f", Languages: {breakdown}"
+        data_for_analysis.append(repo_text)
+    return "\n".join(data_for_analysis)
+
+def _extract_github_skills(repos):
+    """Rule-based skills when the profile is clear enough, otherwise Gemini (merged with the rule hits).
+
+    Returns None if Gemini was needed and failed.
+    """
+    rule_skills = []
+    if GITHUB_SKILLS_MODE == "rules" and SKILL_EXTRACTOR is not None:
+        started = time.perf_counter()
+        rule_skills, confident = SKILL_EXTRACTOR.extract(repos)
+        print(f"--- DEBUG: Rule-based extraction took {(time.perf_counter() - started) * 1e6:.0f}us, "
+              f"{len(rule_skills)} skills, confident={confident}. Fast path: {SKILL_EXTRACTOR.stats()}")
+        if confident:
+            return rule_skills
+
+    skill_prompt = f"""
+    You are an expert tech recruiter. Analyze the following text, which contains
+    a user's GitHub repository names, descriptions, and languages.
+    Extract a list of their most likely technical skills.
+    
+    Data:
+    {_github_text(repos)}
+    
+    Respond *only* in this exact JSON format: 
+    {{"skills": ["Skill 1", "Skill 2"]}}
+    """
+    skills_json = _call_gemini(skill_prompt)
+    if not skills_json:
         return None
+    skills_data = json.loads(skills_json)
+    return skills_data.get("skills", []) + rule_skills
 
 # --- MAIN FUNCTION ---
 @functions_framework.http
@@ -206,7 +402,7 @@ def handle_github(request):
     try:
         auth_header = request.headers.get('Authorization')
         id_token = auth_header.split('Bearer ')[1]
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = runtime.verify_id_token(id_token)
         user_id = decoded_token['uid']
     except Exception as e:
         return f"Authentication error: {e}", 403, headers
@@ -221,57 +417,47 @@ def handle_github(request):
         return f"Bad Request: Invalid JSON: {e}", 400, headers
 
     try:
+        _load_catalog()
+
         # 3. STEP 1A: Fetch real GitHub data
-        github_text = _get_github_data(github_username)
-        if not github_text:
+        try:
+            repos = _get_github_data(github_username)
+        except GitHubRateLimited as e:
+            retry_after = str(int(e.retry_after) + 1)
+            return f"GitHub rate limit reached, try again in {retry_after}s.", 503, {**headers, "Retry-After": retry_after}
+        except requests.exceptions.RequestException as e:
+            return f"Analysis failed: GitHub request failed: {e}", 502, headers
+        if not repos:
             return f"Analysis failed: Could not find GitHub user '{github_username}' or user has no public repos.", 404, headers
 
-        # 3. STEP 1B: Extract Skills from the fetched text
-        skill_prompt = f"""
-        You are an expert tech recruiter. Analyze the following text, which contains
-        a user's GitHub repository names, descriptions, and languages.
-        Extract a list of their most likely technical skills.
-        
-        Data:
-        {github_text}
-        
-        Respond *only* in this exact JSON format: 
-        {{"skills": ["Skill 1", "Skill 2"]}}
-        """
-        
-        skills_json = _call_gemini(skill_prompt)
-        if not skills_json:
+        # 3. STEP 1B: Extract Skills (rule-based fast path, Gemini fallback)
+        skills_list = _extract_github_skills(repos)
+        if skills_list is None:
             return "Analysis failed: Could not extract skills.", 500, headers
-        
-        skills_data = json.loads(skills_json)
-        skills_list = skills_data.get("skills", [])
         if not skills_list:
             return "Analysis complete: No specific skills were identified from the profile.", 200, headers
+        skills_list = _canonical_skills(skills_list)
 
-        # 4. STEP 2: Get Recommendations
-        analysis_data = _get_recommendations(skills_list)
-        if not analysis_data:
-            return "Analysis failed: Could not get recommendations.", 500, headers
+        # 4-5. STEP 2 + 3: Get Recommendations and Roadmaps
+        pipeline = request.args.get("pipeline", PIPELINE_MODE)
+        if wants_stream(request):
+            # Skills go out now; recommendations and roadmaps follow as they finish
+            return ndjson_response(_stream_results(user_id, skills_list, pipeline), headers)
 
-        # 5. STEP 3: Get Roadmaps (in a loop)
-        for rec in analysis_data.get("recommendations", []):
-            roadmap = _get_roadmap(rec.get("career"), rec.get("skill_gaps"))
-            rec["roadmap"] = roadmap
+        recommendations = _build_recommendations(skills_list, pipeline)
+        if recommendations is None:
+            return "Analysis failed: Could not get recommendations.", 500, headers
 
         # 6. STEP 4: Save EVERYTHING to Firestore
-        final_data_to_save = {
-            "skills": skills_list,
-            "recommendations": analysis_data.get("recommendations"),
-            "last_updated_from": "github",
-            "last_updated": firestore.SERVER_TIMESTAMP
-        }
-        
-        db.collection('users').document(user_id).set(final_data_to_save, merge=True)
+        _save_results(user_id, skills_list, recommendations)
         print(f"--- DEBUG (SUCCESS): Full GitHub pipeline complete for {user_id}")
         
         # 7. Return the final result
-        del final_data_to_save["last_updated"] # <-- Fix for JSON serializable error
-        return final_data_to_save, 200, headers
+        return {
+            "skills": skills_list,
+            "recommendations": recommendations,
+            "last_updated_from": "github",
+        }, 200, headers
 
     except Exception as e:
         print(f"--- DEBUG (CRASH): Full pipeline error: {e}")
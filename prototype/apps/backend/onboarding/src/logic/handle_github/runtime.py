@@ -0,0 +1,146 @@
+import importlib
+import sys
+import threading
+
+# Shared by every onboarding function; copy changes to all of them.
+PROJECT_ID = "rock-idiom-475618-q4"
+LOCATION = "asia-south1"
+
+_instances = {}
+# Re-entrant: one factory may need another client (Gemini needs vertexai.init)
+_lock = threading.RLock()
+
+
+def cached(name, factory):
+    """Process-wide singleton: `factory()` runs once, on the first call for `name`.
+
+    Concurrent first calls block until it finishes instead of building
+    their own copy. A factory that raises is retried on the next call.
+    """
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+    with _lock:
+        if name not in _instances:
+            _instances[name] = factory()
+        return _instances[name]
+
+
+def loaded():
+    """Names of the clients built so far (for the cold-start benchmark)."""
+    return sorted(_instances)
+
+
+class Lazy:
+    """Stand-in for a module-level client that builds it on first attribute access.
+
+    Lets `db = lazy_firestore()` keep `db.collection(...)` call sites
+    unchanged while import stays free of network and credential lookups.
+    """
+
+    def __init__(self, name, get):
+        self._name = name
+        self._get = get
+
+    def resolve(self):
+        return self._get()
+
+    def __getattr__(self, attr):
+        return getattr(self._get(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._name in _instances else "not loaded"
+        return f"<Lazy {self._name} ({state})>"
+
+
+class LazyModule:
+    """Stand-in for a module that imports it on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def lazy_import(name):
+    """Returns module `name` if already imported, else a LazyModule for it.
+
+    Unlike importlib's LazyLoader this leaves parent packages alone too, so
+    deferring `vertexai.generative_models` also defers `vertexai`.
+    """
+    return sys.modules.get(name) or LazyModule(name)
+
+
+# --- CLIENTS ---
+
+def firestore_client():
+    def build():
+        from google.cloud import firestore
+        return firestore.Client()
+    return cached("firestore", build)
+
+
+def storage_client():
+    def build():
+        from google.cloud import storage
+        return storage.Client()
+    return cached("storage", build)
+
+
+def _firebase_app():
+    def build():
+        import firebase_admin
+        try:
+            return firebase_admin.initialize_app()
+        except ValueError:
+            return firebase_admin.get_app()
+    return cached("firebase", build)
+
+
+def verify_id_token(id_token):
+    """firebase_admin.auth.verify_id_token, initializing the Firebase app on first use."""
+    from firebase_admin import auth
+    return auth.verify_id_token(id_token, app=_firebase_app())
+
+
+def _vertexai():
+    def build():
+        import vertexai
+        vertexai.init(project=PROJECT_ID, location=LOCATION)
+        return vertexai
+    return cached("vertexai", build)
+
+
+def gemini_model(model_name):
+    def build():
+        _vertexai()
+        from vertexai.generative_models import GenerativeModel, HarmCategory, HarmBlockThreshold
+        safety_settings = {
+            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+        }
+        return GenerativeModel(model_name, safety_settings=safety_settings)
+    return cached(f"gemini:{model_name}", build)
+
+
+def lazy_firestore():
+    return Lazy("firestore", firestore_client)
+
+
+def lazy_storage():
+    return Lazy("storage", storage_client)
+
+
+def lazy_gemini(model_name):
+    return Lazy(f"gemini:{model_name}", lambda: gemini_model(model_name))
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+
+def fingerprint(*parts):
+    """Stable sha256 over JSON-serializable parts, used as a cache key."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTLCache:
+    """Thread-safe in-process LRU with a per-entry time to live."""
+
+    def __init__(self, max_size=1024, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.time() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FirestoreStore:
+    """Persistent tier: one document per key in a Firestore collection.
+
+    Values are stored JSON-encoded so nested lists survive Firestore's
+    no-arrays-in-arrays rule. `expires_at` is a Timestamp, so a Firestore
+    TTL policy on that field deletes expired documents; reads also skip
+    them, since TTL deletion can lag by a day or more. Every collection
+    used as a store needs the policy (see configure_firestore_ttl.sh).
+    """
+
+    def __init__(self, db, collection):
+        self.db = db
+        self.name = collection
+
+    @property
+    def collection(self):
+        # Looked up per call so a lazily created client is built on first use, not at import
+        return self.db.collection(self.name)
+
+    def get(self, key):
+        try:
+            snapshot = self.collection.document(key).get()
+        except Exception as e:
+            print(f"--- DEBUG (ERROR): Cache read failed: {e}")
+            return None
+        if not snapshot.exists:
+            return None
+        data = snapshot.to_dict()
+        expires_at = data.get("expires_at")
+        # Entries written before expires_at became a Timestamp count as expired
+        if not isinstance(expires_at, datetime) or expires_at < datetime.now(timezone.utc):
+            return None
+        return json.loads(data["value"])
+
+    def set(self, key, value, ttl):
+        try:
+            self.collection.document(key).set({
+                "value": json.dumps(value),
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl),
+            })
+        except Exception as e:
+            print(f"--- DEBUG (ERROR): Cache write failed: {e}")
+
+
+class SQLiteStore:
+    """Persistent tier backed by a local SQLite file (stand-in for Firestore)."""
+
+    def __init__(self, path, table="cache"):
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key=?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl),
+            )
+            self._conn.commit()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+class TieredCache:
+    """In-process TTL LRU in front of an optional persistent store.
+
+    `get_or_compute()` is single-flight: concurrent misses on the same key
+    wait for the first caller's computation instead of repeating it.
+    """
+
+    def __init__(self, name, memory=None, store=None, ttl=7 * 24 * 3600):
+        self.name = name
+        self.memory = memory or TTLCache(ttl=ttl)
+        self.store = store
+        self.ttl = ttl
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+        if self.store is not None:
+            value = self.store.get(key)
+            if value is not None:
+                self.store_hits += 1
+                self.memory.set(key, value)
+                return value
+        return None
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl or self.ttl
+        self.memory.set(key, value, ttl)
+        if self.store is not None:
+            self.store.set(key, value, ttl)
+
+    def get_or_compute(self, key, compute, ttl=None, should_cache=bool):
+        """Returns the cached value for `key`, or computes and caches it.
+
+        Results for which `should_cache(value)` is false (e.g. an empty result
+        after a failed Gemini call) are returned but not stored.
+        """
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            self.coalesced += 1
+            return flight.value
+
+        try:
+            value = self.get(key)
+            if value is None:
+                self.misses += 1
+                value = compute()
+                if should_cache(value):
+                    self.set(key, value, ttl)
+            flight.value = value
+            return value
+        finally:
+            flight.done.set()
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        lookups = self.memory_hits + self.store_hits + self.coalesced + self.misses
+        hits = lookups - self.misses
+        return {
+            "cache": self.name,
+            "memory_hits": self.memory_hits,
+            "store_hits": self.store_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "size": len(self.memory),
+        }
+
+
+def make_store(kind, db=None, name="cache", sqlite_path=None):
+    """Builds the persistent tier selected by configuration ("firestore", "sqlite" or "none")."""
+    if kind == "firestore" and db is not None:
+        return FirestoreStore(db, name)
+    if kind == "sqlite":
+        return SQLiteStore(sqlite_path or f"/tmp/{name}.sqlite", table=name)
+    return None
@@ -1,46 +1,82 @@
 import functions_framework
-import firebase_admin
-from firebase_admin import auth
-from google.cloud import firestore
-import google.cloud.firestore
-import vertexai
-from vertexai.generative_models import GenerativeModel, Part, HarmCategory, HarmBlockThreshold
 import json
 import os
+import time
+
+import runtime
+from catalog import load_catalog
+from fused import STRUCTURED_STEPS, generate_fused
+from cache import TTLCache, TieredCache, fingerprint, make_store
+from roadmaps import attach_roadmaps, roadmap_key
+from skills import fold
 
 # --- INITIALIZATION ---
-PROJECT_ID = "rock-idiom-475618-q4"
-LOCATION = "asia-south1"
+PROJECT_ID = runtime.PROJECT_ID
+LOCATION = runtime.LOCATION
 GEMINI_MODEL = "gemini-2.5-flash"
+# "local" ranks careers with the compiled catalog only; "gemini" also asks Gemini to re-rank
+RECOMMENDATION_MODE = os.environ.get("RECOMMENDATION_MODE", "local")
+# Number of locally shortlisted careers sent to Gemini in "gemini" mode
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", "8"))
+# "multi": recommendations then one call per roadmap; "fused": one structured call for everything.
+# Can be overridden per request with ?pipeline=fused|multi to compare the two.
+PIPELINE_MODE = os.environ.get("PIPELINE_MODE", "multi")
+# Persistent roadmap cache tier: "firestore", "sqlite" (local stand-in) or "none"
+ROADMAP_CACHE_STORE = os.environ.get("ROADMAP_CACHE_STORE", "firestore")
+ROADMAP_CACHE_TTL = int(os.environ.get("ROADMAP_CACHE_TTL", str(7 * 24 * 3600)))
+# Whole quiz results (recommendations + roadmaps) memoized per canonical skill set
+RESULT_CACHE_STORE = os.environ.get("RESULT_CACHE_STORE", "firestore")
+RESULT_CACHE_TTL = int(os.environ.get("RESULT_CACHE_TTL", str(24 * 3600)))
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "256"))
+# Where get_dynamic_quiz keeps quiz sessions (same setting as there)
+QUIZ_SESSION_STORE = os.environ.get("QUIZ_SESSION_STORE", "firestore")
 
-try:
-    firebase_admin.initialize_app()
-except ValueError:
-    pass
+# Clients, the Gemini model and heavy SDK modules are created on first use (see runtime.py)
+firestore = runtime.lazy_import("google.cloud.firestore")
+db = runtime.lazy_firestore()
+gemini_model = runtime.lazy_gemini(GEMINI_MODEL)
 
+# Career catalog, compiled on the first request (see _load_catalog)
 CAREERS_CATALOG = {}
-try:
-    with open('careers.json', 'r') as f:
-        careers_list = json.load(f)
-        # Create a simple {CareerName: [skills]} dictionary for the prompt
-        CAREERS_CATALOG = {career['displayName']: career['skills'] for career in careers_list}
-    print(f"--- DEBUG: Successfully loaded {len(CAREERS_CATALOG)} careers from catalog.")
-except Exception as e:
-    print(f"--- DEBUG (CRITICAL ERROR): Failed to load careers.json: {e}")
-# --- END NEW ---
-
-vertexai.init(project=PROJECT_ID, location=LOCATION)
-db = firestore.Client()
-
-safety_settings = {
-    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-}
-gemini_model = GenerativeModel(GEMINI_MODEL, safety_settings=safety_settings)
+CAREER_MATCHER = None
+CATALOG_VERSION = None
+
+# Roadmaps shared by every user with the same (career, skill gaps), and by every
+# handler in the process when they are served together (see onboarding_service)
+ROADMAP_CACHE = runtime.cached("roadmap_cache", lambda: TieredCache(
+    "roadmap_cache",
+    memory=TTLCache(max_size=512, ttl=ROADMAP_CACHE_TTL),
+    store=make_store(ROADMAP_CACHE_STORE, db, "roadmap_cache"),
+    ttl=ROADMAP_CACHE_TTL,
+))
+
+RESULT_CACHE = TieredCache(
+    "quiz_result_cache",
+    memory=TTLCache(max_size=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL),
+    store=make_store(RESULT_CACHE_STORE, db, "quiz_result_cache"),
+    ttl=RESULT_CACHE_TTL,
+)
+
+# Finished get_dynamic_quiz sessions, so the client can send a session id instead of the skills
+QUIZ_SESSIONS = make_store(QUIZ_SESSION_STORE, db, "quiz_sessions")
 
 # --- SHARED HELPER FUNCTIONS (Copied) ---
+
+def _load_catalog():
+    """Fills the catalog globals from careers.json on first use; CORS preflights never load it."""
+    global CAREERS_CATALOG, CAREER_MATCHER, CATALOG_VERSION
+    if CAREER_MATCHER is not None:
+        return
+    try:
+        catalog = load_catalog()
+        CAREERS_CATALOG = catalog.careers
+        # Compiled career x skill matrix for local matching
+        CAREER_MATCHER = catalog.matcher
+        # Any edit to careers.json invalidates memoized results
+        CATALOG_VERSION = catalog.version
+        print(f"--- DEBUG: Successfully loaded {len(CAREERS_CATALOG)} careers from catalog.")
+    except Exception as e:
+        print(f"--- DEBUG (CRITICAL ERROR): Failed to load careers.json: {e}")
     
 def _call_gemini(prompt, file_part=None):
     """Helper to call Gemini, with safety checks."""
@@ -54,6 +90,9 @@ def _call_gemini(prompt, file_part=None):
         if not response.text:
             print(f"--- DEBUG (ERROR): Gemini response was blocked or empty. Feedback: {response.prompt_feedback}")
             return None
+
+        usage = response.usage_metadata
+        print(f"--- DEBUG: Gemini tokens: {usage.prompt_token_count} prompt, {usage.candidates_token_count} output")
         
         clean_response = response.text.strip().replace("`", "").replace("json", "")
         return clean_response
@@ -61,17 +100,47 @@ def _call_gemini(prompt, file_part=None):
         print(f"--- DEBUG (ERROR): Error calling Gemini: {e}")
         return None
 
+def _canonical_skills(skills_list):
+    """Maps skill names onto canonical catalog spellings and drops duplicates."""
+    if CAREER_MATCHER is None:
+        return skills_list
+    return CAREER_MATCHER.skill_index.canonicalize(skills_list)
+
 def _get_recommendations(skills_list):
-    """Generates recommendations and gaps from a list of skills using a fixed catalog."""
+    """Ranks catalog careers against a list of skills and computes exact skill gaps."""
     print(f"--- DEBUG: Getting recommendations for skills: {skills_list}")
 
     # If the catalog failed to load, return an error
-    if not CAREERS_CATALOG:
+    if not CAREERS_CATALOG or CAREER_MATCHER is None:
         print("--- DEBUG (CRITICAL ERROR): Career catalog is empty. Aborting analysis.")
         return None
 
-    # Convert the catalog to a JSON string to pass to the prompt
-    catalog_json = json.dumps(CAREERS_CATALOG, indent=2)
+    top_n = max(RERANK_CANDIDATES, 3) if RECOMMENDATION_MODE == "gemini" else 3
+    matches = CAREER_MATCHER.match(skills_list, top_n=top_n)
+    if not matches:
+        # An explicit "no match" rather than arbitrary careers at score 0
+        print("--- DEBUG: No catalog career shares a skill with the user.")
+        return {"recommendations": []}
+
+    if RECOMMENDATION_MODE == "gemini":
+        reranked = _get_gemini_recommendations(skills_list, matches)
+        if reranked and reranked.get("recommendations"):
+            return reranked
+        print("--- DEBUG: Gemini re-rank failed, falling back to local ranking.")
+
+    return {"recommendations": [
+        {"career": match["career"], "skill_gaps": match["skill_gaps"]} for match in matches[:3]
+    ]}
+
+def _get_gemini_recommendations(skills_list, candidates):
+    """Optional Gemini re-rank over a local shortlist of candidate careers."""
+    # Only the shortlisted careers go into the prompt, in compact form, so the
+    # prompt size stays flat as careers.json grows.
+    shortlist = {match["career"]: CAREERS_CATALOG[match["career"]] for match in candidates}
+    catalog_json = json.dumps(shortlist, separators=(",", ":"))
+    full_tokens = len(json.dumps(CAREERS_CATALOG, indent=2)) // 4
+    print(f"--- DEBUG: Catalog prompt ~{full_tokens} tokens in full, ~{len(catalog_json) // 4} tokens "
+          f"for {len(shortlist)}/{len(CAREERS_CATALOG)} shortlisted careers.")
 
     prompt = f"""
     You are an expert career and HR analyst. You MUST follow these instructions.
@@ -79,7 +148,7 @@ def _get_recommendations(skills_list):
     A user has this list of skills:
     {json.dumps(skills_list)}
 
-    Here is your complete "Career Catalog". You MUST use this catalog exclusively. Do not invent new careers or skills.
+    Here is your "Career Catalog", shortlisted to the careers closest to the user's skills and ordered by skill coverage. You MUST use this catalog exclusively. Do not invent new careers or skills.
     The catalog is a JSON object where the key is the "Career Name" and the value is the "List of Required Skills".
 
     --- CATALOG START ---
@@ -136,6 +205,68 @@ def _get_roadmap(career_name, skill_gaps):
         print(f"--- DEBUG (ERROR): Failed to parse roadmap JSON: {e}")
         return []
 
+def _get_cached_roadmap(career_name, skill_gaps):
+    """Serves a roadmap from the two-tier cache, generating it once on a miss."""
+    key = roadmap_key(career_name, _canonical_skills(skill_gaps or []), "steps")
+    return ROADMAP_CACHE.get_or_compute(key, lambda: _get_roadmap(career_name, skill_gaps))
+
+def _get_fused_recommendations(skills_list):
+    """One structured Gemini call for recommendations, skill gaps and roadmaps."""
+    if CAREER_MATCHER is None:
+        return None
+    candidates = CAREER_MATCHER.match(skills_list, top_n=max(RERANK_CANDIDATES, 3), max_gaps=10)
+    if not candidates:
+        print("--- DEBUG: No catalog career shares a skill with the user.")
+        return []
+    recommendations = generate_fused(gemini_model, skills_list, candidates, CAREERS_CATALOG, STRUCTURED_STEPS)
+    if recommendations is None:
+        return None
+    return [rec.to_dict() for rec in recommendations]
+
+def _build_recommendations(skills_list, pipeline=PIPELINE_MODE):
+    """Runs recommendations + roadmaps for a canonical skill list.
+
+    The "fused" pipeline falls back to the multi-call one if its single call fails.
+    """
+    started = time.monotonic()
+    if pipeline == "fused":
+        recommendations = _get_fused_recommendations(skills_list)
+        if recommendations is not None:
+            print(f"--- DEBUG: fused pipeline took {time.monotonic() - started:.2f}s")
+            return recommendations
+        print("--- DEBUG: fused pipeline failed, falling back to multi-call")
+
+    analysis_data = _get_recommendations(skills_list)
+    if not analysis_data:
+        return None
+    recommendations = analysis_data.get("recommendations", [])
+    # Roadmaps are generated concurrently, a timed-out one comes back empty
+    attach_roadmaps(_get_cached_roadmap, recommendations)
+    print(f"--- DEBUG: Roadmap cache: {ROADMAP_CACHE.stats()}")
+    print(f"--- DEBUG: multi pipeline took {time.monotonic() - started:.2f}s")
+    return recommendations
+
+def _get_quiz_results(skills_list, pipeline=PIPELINE_MODE):
+    """Memoizes _build_recommendations by skill-set fingerprint and catalog version."""
+    # Folded, so skills the catalog doesn't know ("teamwork", "Teamwork") share an entry
+    key = fingerprint("quiz-results", CATALOG_VERSION, RECOMMENDATION_MODE, pipeline,
+                      sorted({fold(skill) for skill in skills_list}))
+    recommendations = RESULT_CACHE.get_or_compute(
+        key,
+        lambda: _build_recommendations(skills_list, pipeline),
+        # Results with a missing roadmap are served once but not remembered
+        should_cache=lambda recs: bool(recs) and all(rec.get("roadmap") for rec in recs),
+    )
+    print(f"--- DEBUG: Result cache: {RESULT_CACHE.stats()}")
+    return recommendations
+
+def _get_session_skills(session_id, user_id):
+    """final_skills of the caller's finished quiz session, or None."""
+    session = QUIZ_SESSIONS.get(session_id) if QUIZ_SESSIONS is not None else None
+    if not session or session.get("user_id") != user_id:
+        return None
+    return session.get("final_skills")
+
 # --- MAIN FUNCTION ---
 @functions_framework.http
 def handle_quiz_results(request):
@@ -155,7 +286,7 @@ def handle_quiz_results(request):
     try:
         auth_header = request.headers.get('Authorization')
         id_token = auth_header.split('Bearer ')[1]
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = runtime.verify_id_token(id_token)
         user_id = decoded_token['uid']
     except Exception as e:
         return f"Authentication error: {e}", 403, headers
@@ -165,32 +296,34 @@ def handle_quiz_results(request):
         data = request.get_json()
         # --- THIS IS THE FIX ---
         skills_list = data.get('final_skills') 
+        # A finished get_dynamic_quiz session can stand in for the skills
+        if not skills_list and data.get('session_id'):
+            skills_list = _get_session_skills(data['session_id'], user_id)
         
         if not skills_list:
-            return "Bad Request: Missing 'final_skills'", 400, headers
+            return "Bad Request: Missing 'final_skills' or a finished 'session_id'", 400, headers
         # --- END FIX ---
             
     except Exception as e:
         return f"Bad Request: Invalid JSON: {e}", 400, headers
 
     try:
+        _load_catalog()
+
         # 3. STEP 1: Skills are provided.
+        skills_list = _canonical_skills(skills_list)
         print(f"--- DEBUG: Skills provided from quiz: {skills_list}")
 
-        # 4. STEP 2: Get Recommendations
-        analysis_data = _get_recommendations(skills_list)
-        if not analysis_data:
+        # 4-5. STEP 2 + 3: Get Recommendations and Roadmaps (memoized per skill set)
+        pipeline = request.args.get("pipeline", PIPELINE_MODE)
+        recommendations = _get_quiz_results(skills_list, pipeline)
+        if recommendations is None:
             return "Analysis failed: Could not get recommendations.", 500, headers
 
-        # 5. STEP 3: Get Roadmaps (in a loop)
-        for rec in analysis_data.get("recommendations", []):
-            roadmap = _get_roadmap(rec.get("career"), rec.get("skill_gaps"))
-            rec["roadmap"] = roadmap
-
         # 6. STEP 4: Save EVERYTHING to Firestore
         final_data_to_save = {
             "skills": skills_list,
-            "recommendations": analysis_data.get("recommendations"),
+            "recommendations": recommendations,
             "last_updated_from": "quiz",
             "last_updated": firestore.SERVER_TIMESTAMP
         }
@@ -0,0 +1,187 @@
+import re
+
+# Common spellings that folding alone cannot map onto a catalog skill.
+# Keys are free-form; values must match a catalog skill exactly.
+ALIASES = {
+    "JS": "JavaScript",
+    "ES6": "JavaScript",
+    "ReactJS": "React",
+    "React.js": "React",
+    "Node": "Node.js",
+    "Express": "Express.js",
+    "Next": "Next.js",
+    "TS": "TypeScript",
+    "Tailwind": "Tailwind CSS",
+    "Golang": "Go",
+    "Python3": "Python",
+    "Postgres": "PostgreSQL",
+    "Mongo": "MongoDB",
+    "REST": "REST APIs",
+    "REST API": "REST APIs",
+    "RESTful API": "RESTful APIs",
+    "K8s": "Kubernetes",
+    "Google Cloud": "GCP",
+    "Google Cloud Platform": "GCP",
+    "Amazon Web Services": "AWS",
+    "Microsoft Azure": "Azure",
+    "ML": "Machine Learning",
+    "Sklearn": "Scikit-learn",
+    "Tensorflow 2": "TensorFlow",
+    "Torch": "PyTorch",
+    "HuggingFace": "Hugging Face",
+    "LLM": "LLMs",
+    "Large Language Models": "LLMs",
+    "RAG": "Retrieval-Augmented Generation (RAG)",
+    "Object Oriented Programming": "OOP",
+    "Object-Oriented Programming": "OOP",
+    "DSA": "Data Structures",
+    "Continuous Integration": "CI/CD",
+    "GitHub Actions": "CI/CD",
+    "ETL": "ETL/ELT",
+    "Apache Spark": "Spark",
+    "Apache Kafka": "Kafka",
+    "Apache Airflow": "Airflow",
+    "Power-BI": "Power BI",
+    "MS Excel": "Excel",
+    "Data Viz": "Data Visualization",
+    "Convolutional Neural Networks": "CNNs",
+    "CNN": "CNNs",
+    "Unreal": "Unreal Engine",
+    "UX": "UX Design",
+    "User Experience": "UX Design",
+    "Pen Testing": "Penetration Testing",
+    "Pentesting": "Penetration Testing",
+    "Solidity Smart Contracts": "Smart Contracts",
+}
+
+_FOLD_RE = re.compile(r"[^a-z0-9+#]")
+_END = "$"
+_MEMO_SIZE = 10000
+
+
+def fold(skill):
+    """Case/punctuation folding: "React.js", "react js" and "ReactJS" all fold to "reactjs"."""
+    return _FOLD_RE.sub("", str(skill).casefold())
+
+
+def _max_distance(length):
+    # Short names (Go, R, C, SQL) must match exactly; longer ones tolerate one typo.
+    # Two edits already turn real skills into others (Mentoring -> Monitoring).
+    return 0 if length <= 3 else 1
+
+
+class SkillIndex:
+    """Maps free-form skill names onto canonical catalog skills.
+
+    Built once per process from the catalog plus ALIASES. Lookups fold the
+    input and walk a character trie, so an exact or alias hit costs O(length);
+    otherwise a bounded Levenshtein search over the same trie finds the closest
+    catalog skill within a small edit distance. Inputs that are part of a
+    longer catalog name ("Modeling" in "3D Modeling") are never fuzzy-matched,
+    nor is a skill to a name it contains or is contained in ("SwiftUI", "Swift").
+    """
+
+    def __init__(self, catalog_skills, aliases=ALIASES):
+        self._trie = {}
+        self._memo = {}
+        self.skills = []
+        for skill in catalog_skills:
+            if self._insert(fold(skill), skill):
+                self.skills.append(skill)
+        known = set(self.skills)
+        for alias, skill in aliases.items():
+            if skill in known:
+                self._insert(fold(alias), skill)
+        self._keys = [fold(skill) for skill in self.skills]
+
+    def _insert(self, key, skill):
+        if not key:
+            return False
+        node = self._trie
+        for ch in key:
+            node = node.setdefault(ch, {})
+        if _END in node:
+            return False
+        node[_END] = skill
+        return True
+
+    def _exact(self, key):
+        node = self._trie
+        for ch in key:
+            node = node.get(ch)
+            if node is None:
+                return None
+        return node.get(_END)
+
+    def _fuzzy(self, key, max_dist):
+        best = [max_dist + 1, None]
+        first_row = list(range(len(key) + 1))
+
+        def walk(node, ch, prev_row):
+            row = [prev_row[0] + 1]
+            for i in range(1, len(key) + 1):
+                row.append(min(row[i - 1] + 1, prev_row[i] + 1, prev_row[i - 1] + (key[i - 1] != ch)))
+            if _END in node and row[-1] < best[0]:
+                best[0], best[1] = row[-1], node[_END]
+            if min(row) < best[0]:
+                for next_ch, child in node.items():
+                    if next_ch != _END:
+                        walk(child, next_ch, row)
+
+        for ch, child in self._trie.items():
+            if ch != _END:
+                walk(child, ch, first_row)
+        return best[1]
+
+    def _partial(self, key):
+        """True if `key` is part of a longer catalog name, i.e. a generic word rather than a typo."""
+        return any(key in name for name in self._keys)
+
+    def _lookup(self, key):
+        """Returns (catalog skill or None, fuzzy), memoized per folded key."""
+        if key not in self._memo:
+            found, fuzzy = self._exact(key), False
+            if found is None:
+                max_dist = _max_distance(len(key))
+                if max_dist and not self._partial(key):
+                    found = self._fuzzy(key, max_dist)
+                    if found is not None and fold(found) in key:
+                        found = None  # a different, more specific skill, not a typo
+                    fuzzy = found is not None
+            if len(self._memo) >= _MEMO_SIZE:
+                self._memo.clear()
+            self._memo[key] = (found, fuzzy)
+        return self._memo[key]
+
+    def exact(self, skill):
+        """Returns the catalog skill for an exact or alias match only (no typo tolerance)."""
+        key = fold(skill)
+        return self._exact(key) if key else None
+
+    def canonical(self, skill):
+        """Returns the catalog skill for `skill`, or None if nothing is close enough."""
+        key = fold(skill)
+        return self._lookup(key)[0] if key else None
+
+    def canonicalize(self, skills_list, keep_unknown=True):
+        """Maps a skill list onto catalog names, dropping duplicates.
+
+        Skills with no catalog match are kept as given (deduplicated by their
+        folded form) unless `keep_unknown` is False. A typo-tolerant (fuzzy)
+        match only counts for matching: the user's spelling is kept.
+        """
+        result, seen = [], set()
+        for skill in skills_list:
+            if not isinstance(skill, str):
+                continue
+            key = fold(skill)
+            match, fuzzy = self._lookup(key) if key else (None, False)
+            if match is None and not keep_unknown:
+                continue
+            name = skill.strip() if match is None or fuzzy else match
+            # Deduplicated by catalog skill, so "Pythn" and "Python" count once
+            key = fold(match or name)
+            if key and key not in seen:
+                seen.add(key)
+                result.append(name)
+        return result
@@ -0,0 +1,164 @@
+import json
+import time
+from dataclasses import asdict, dataclass, field
+
+from runtime import lazy_import
+
+# Loaded on the first fused call, not at import
+generative_models = lazy_import("vertexai.generative_models")
+
+# Roadmap step formats: handle_resume returns plain strings, the other
+# functions return structured step objects.
+TEXT_STEPS = "text"
+STRUCTURED_STEPS = "steps"
+
+_STEP_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "step": {"type": "integer"},
+        "title": {"type": "string"},
+        "skills_covered": {"type": "array", "items": {"type": "string"}},
+        "description": {"type": "string"},
+        "resources": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["step", "title", "skills_covered", "description", "resources"],
+}
+
+
+def response_schema(step_format):
+    step = {"type": "string"} if step_format == TEXT_STEPS else _STEP_SCHEMA
+    return {
+        "type": "object",
+        "properties": {
+            "recommendations": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "career": {"type": "string"},
+                        "skill_gaps": {"type": "array", "items": {"type": "string"}},
+                        "roadmap": {"type": "array", "items": step},
+                    },
+                    "required": ["career", "skill_gaps", "roadmap"],
+                },
+            },
+        },
+        "required": ["recommendations"],
+    }
+
+
+@dataclass
+class RoadmapStep:
+    step: int
+    title: str
+    skills_covered: list[str] = field(default_factory=list)
+    description: str = ""
+    resources: list[str] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, data, index):
+        if not isinstance(data, dict) or not isinstance(data.get("title"), str):
+            raise ValueError(f"invalid roadmap step: {data!r}")
+        return cls(
+            step=int(data.get("step", index + 1)),
+            title=data["title"],
+            skills_covered=[s for s in data.get("skills_covered", []) if isinstance(s, str)],
+            description=str(data.get("description", "")),
+            resources=[r for r in data.get("resources", []) if isinstance(r, str)],
+        )
+
+
+@dataclass
+class Recommendation:
+    career: str
+    skill_gaps: list[str]
+    roadmap: list  # list[str] or list[RoadmapStep], depending on the step format
+
+    def to_dict(self):
+        return {
+            "career": self.career,
+            "skill_gaps": self.skill_gaps,
+            "roadmap": [asdict(s) if isinstance(s, RoadmapStep) else s for s in self.roadmap],
+        }
+
+
+def parse_recommendations(data, catalog, step_format, limit=3):
+    """Validates a fused response into Recommendation objects.
+
+    Careers must exist in `catalog` ({name: skills}); skill gaps are limited
+    to that career's catalog skills. Raises ValueError if nothing usable is left.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("recommendations"), list):
+        raise ValueError("response has no 'recommendations' list")
+
+    results, seen = [], set()
+    for item in data["recommendations"]:
+        if not isinstance(item, dict):
+            continue
+        career = item.get("career")
+        if career not in catalog or career in seen:
+            continue
+        required = set(catalog[career])
+        gaps = [g for g in item.get("skill_gaps", []) if g in required]
+        steps = item.get("roadmap", [])
+        if step_format == TEXT_STEPS:
+            roadmap = [s for s in steps if isinstance(s, str)]
+        else:
+            roadmap = [RoadmapStep.parse(s, i) for i, s in enumerate(steps)]
+        seen.add(career)
+        results.append(Recommendation(career, gaps, roadmap))
+        if len(results) == limit:
+            break
+
+    if not results:
+        raise ValueError("no recommendation matched the catalog")
+    return results
+
+
+def build_prompt(skills_list, candidates, step_format):
+    shortlist = [
+        {"career": c["career"], "missing_skills": c["skill_gaps"], "matched_skills": c["matched_skills"]}
+        for c in candidates
+    ]
+    if step_format == TEXT_STEPS:
+        step_hint = 'each roadmap step is a string like "Step 1: Learn X using Y (free/paid)"'
+    else:
+        step_hint = "each roadmap step has step, title, skills_covered, description and resources"
+    return f"""
+    You are an expert career coach and HR analyst.
+
+    A user has this list of skills:
+    {json.dumps(skills_list)}
+
+    These candidate careers were shortlisted from our catalog, best skill coverage first,
+    with the exact catalog skills the user is missing:
+    {json.dumps(shortlist, separators=(",", ":"))}
+
+    Your task, in a single answer:
+    1. Pick the 3 best-fit careers from the candidates. Use their names exactly.
+    2. For each, list up to 5 of its missing_skills as "skill_gaps", most important first.
+    3. For each, write a step-by-step learning roadmap covering those skill gaps; {step_hint}.
+    """
+
+
+def generate_fused(model, skills_list, candidates, catalog, step_format):
+    """Single Gemini call for recommendations, gaps and roadmaps.
+
+    Returns a list of Recommendation, or None if the call or validation fails.
+    """
+    start = time.monotonic()
+    try:
+        response = model.generate_content(
+            build_prompt(skills_list, candidates, step_format),
+            generation_config=generative_models.GenerationConfig(
+                response_mime_type="application/json",
+                response_schema=response_schema(step_format),
+            ),
+        )
+        usage = response.usage_metadata
+        print(f"--- DEBUG: Fused call took {time.monotonic() - start:.2f}s, "
+              f"{usage.prompt_token_count} prompt / {usage.candidates_token_count} output tokens")
+        return parse_recommendations(json.loads(response.text), catalog, step_format)
+    except Exception as e:
+        print(f"--- DEBUG (ERROR): Fused generation failed: {e}")
+        return None
@@ -0,0 +1,232 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from runtime import cached, lazy_import
+
+firestore = lazy_import("google.cloud.firestore")
+
+# "pubsub" once RESUME_JOB_TOPIC and its push subscription exist, "local" for
+# the SQLite stand-in shared by both functions on one machine, "none" (the
+# default) to analyze resumes on demand only
+JOB_QUEUE = os.environ.get("JOB_QUEUE", "none")
+RESUME_JOB_TOPIC = os.environ.get("RESUME_JOB_TOPIC", "resume-analysis-jobs")
+JOB_QUEUE_PATH = os.environ.get("JOB_QUEUE_PATH", "/tmp/resume_jobs.sqlite")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = float(os.environ.get("JOB_RETRY_DELAY", "5"))
+# A claimed local job that is not acked within this many seconds is handed out again
+JOB_LEASE = float(os.environ.get("JOB_LEASE", "300"))
+
+# Job status documents; clients poll or subscribe to resume_jobs/{job_id}
+JOB_COLLECTION = "resume_jobs"
+FINAL_STATES = ("done", "failed")
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler when retrying cannot help (e.g. an unreadable resume)."""
+
+
+class PubSubQueue:
+    """Production queue: one Pub/Sub message per job.
+
+    Delivery, retries and concurrency are handled by the push subscription
+    and the worker function's max instances.
+    """
+
+    def __init__(self, project_id, topic=RESUME_JOB_TOPIC):
+        self.topic_path = f"projects/{project_id}/topics/{topic}"
+
+    @property
+    def publisher(self):
+        # Created on the first publish; the gRPC stack is slow to import
+        def build():
+            from google.cloud import pubsub_v1
+            return pubsub_v1.PublisherClient()
+        return cached("pubsub", build)
+
+    def publish(self, job):
+        self.publisher.publish(self.topic_path, json.dumps(job).encode("utf-8")).result(timeout=30)
+
+
+class SQLiteQueue:
+    """Local stand-in for Pub/Sub: a job table in a SQLite file.
+
+    Several processes can share the file; claim() leases a job for
+    JOB_LEASE seconds, so a job whose worker died is delivered again.
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, body TEXT NOT NULL, "
+            "available_at REAL NOT NULL, deliveries INTEGER NOT NULL DEFAULT 0)"
+        )
+
+    def publish(self, job):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, body, available_at) VALUES (?, ?, ?)",
+                (job["id"], json.dumps(job), time.time()),
+            )
+
+    def claim(self):
+        """Leases the oldest available job; returns (job, deliveries) or None."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, body, deliveries FROM jobs WHERE available_at <= ? ORDER BY available_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET available_at = ?, deliveries = deliveries + 1 WHERE id = ?",
+                        (now + JOB_LEASE, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return json.loads(row[1]), row[2] + 1
+
+    def ack(self, job_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def nack(self, job_id, delay):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET available_at = ? WHERE id = ?", (time.time() + delay, job_id))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+
+def make_queue(kind=JOB_QUEUE, project_id=None):
+    """Builds the queue selected by configuration ("pubsub", "local" or "none")."""
+    if kind == "pubsub":
+        return PubSubQueue(project_id)
+    if kind == "local":
+        return SQLiteQueue()
+    return None
+
+
+def enqueue_job(db, queue, user_id, payload):
+    """Creates the job's status document, then publishes the job. Returns the job id.
+
+    The document comes first so a worker never sees a job without one. If
+    publishing fails it is marked failed, so no job is left "queued" forever,
+    and the error is re-raised.
+    """
+    job = {"id": uuid.uuid4().hex, "user_id": user_id, "payload": payload}
+    ref = db.collection(JOB_COLLECTION).document(job["id"])
+    ref.set({
+        "user_id": user_id,
+        "status": "queued",
+        "attempts": 0,
+        "created_at": firestore.SERVER_TIMESTAMP,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    })
+    try:
+        queue.publish(job)
+    except Exception as e:
+        ref.set({"status": "failed", "error": f"Could not queue job: {e}", "updated_at": firestore.SERVER_TIMESTAMP},
+                merge=True)
+        raise
+    return job["id"]
+
+
+def run_job(db, job, handler, max_attempts=JOB_MAX_ATTEMPTS):
+    """Runs one delivery of `job` and records the outcome in its status document.
+
+    `handler(job)` returns a small JSON-serializable result or raises.
+    Returns True when the job needs no further delivery (done, failed for
+    good, or already finished by an earlier delivery) and False when it
+    should be retried.
+    """
+    ref = db.collection(JOB_COLLECTION).document(job["id"])
+    snapshot = ref.get()
+    status = (snapshot.to_dict() or {}) if snapshot.exists else {}
+    if status.get("status") in FINAL_STATES:
+        return True  # Duplicate delivery
+
+    attempts = status.get("attempts", 0) + 1
+    ref.set({"status": "running", "attempts": attempts, "updated_at": firestore.SERVER_TIMESTAMP}, merge=True)
+    try:
+        result = handler(job)
+    except Exception as e:
+        final = attempts >= max_attempts or isinstance(e, PermanentJobError)
+        ref.set({
+            "status": "failed" if final else "retrying",
+            "error": str(e),
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+        print(f"--- DEBUG (ERROR): Job {job['id']} attempt {attempts}/{max_attempts} failed: {e}")
+        return final
+
+    ref.set({
+        "status": "done",
+        "result": result,
+        "error": firestore.DELETE_FIELD,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }, merge=True)
+    return True
+
+
+class WorkerPool:
+    """Background threads that drain a SQLiteQueue with bounded concurrency.
+
+    `process(job)` returns True to ack the job and False to have it
+    redelivered after an exponential backoff.
+    """
+
+    def __init__(self, queue, process, workers=JOB_WORKERS, retry_delay=JOB_RETRY_DELAY, poll_interval=1.0):
+        self.queue = queue
+        self.process = process
+        self.workers = workers
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.queue.claim()
+            except Exception as e:
+                print(f"--- DEBUG (ERROR): Job queue claim failed: {e}")
+                claimed = None
+            if claimed is None:
+                self._stop.wait(self.poll_interval)
+                continue
+
+            job, deliveries = claimed
+            try:
+                finished = self.process(job)
+            except Exception as e:
+                print(f"--- DEBUG (ERROR): Job {job.get('id')} crashed: {e}")
+                finished = False
+            if finished:
+                self.queue.ack(job["id"])
+            else:
+                self.queue.nack(job["id"], self.retry_delay * 2 ** (deliveries - 1))
@@ -1,67 +1,107 @@
 import functions_framework
-import firebase_admin
-from firebase_admin import auth
-from google.cloud import firestore, storage
-import vertexai
-from vertexai.generative_models import GenerativeModel, Part, HarmCategory, HarmBlockThreshold
+import base64
 import json
+import os
+import time
 import logging
 from flask import Flask
 
+import runtime
+from catalog import load_catalog
+from fused import TEXT_STEPS, generate_fused
+from jobs import JOB_COLLECTION, JOB_QUEUE, PermanentJobError, WorkerPool, make_queue, run_job
+from cache import TTLCache, TieredCache, fingerprint, make_store
+from preprocess import prepare_resume
+from roadmaps import iter_roadmaps, roadmap_key
+from streaming import ndjson_response, wants_stream
+
 # --- INITIALIZATION ---
-PROJECT_ID = "rock-idiom-475618-q4"
-LOCATION = "asia-south1"
+PROJECT_ID = runtime.PROJECT_ID
+LOCATION = runtime.LOCATION
 GEMINI_MODEL = "gemini-2.5-flash"
+# "local" ranks careers with the compiled catalog only; "gemini" also asks Gemini to re-rank
+RECOMMENDATION_MODE = os.environ.get("RECOMMENDATION_MODE", "local")
+# Number of locally shortlisted careers sent to Gemini in "gemini" mode
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", "8"))
+# "multi": recommendations then one call per roadmap; "fused": one structured call for everything.
+# Can be overridden per request with ?pipeline=fused|multi to compare the two.
+PIPELINE_MODE = os.environ.get("PIPELINE_MODE", "multi")
+# Persistent roadmap cache tier: "firestore", "sqlite" (local stand-in) or "none"
+ROADMAP_CACHE_STORE = os.environ.get("ROADMAP_CACHE_STORE", "firestore")
+ROADMAP_CACHE_TTL = int(os.environ.get("ROADMAP_CACHE_TTL", str(7 * 24 * 3600)))
+# Persistent tier for text extracted from resumes (same options as the roadmap cache).
+# The text is personal data, so by default it stays in this process's memory; a
+# "firestore" store needs the TTL policy from configure_firestore_ttl.sh
+RESUME_TEXT_CACHE_STORE = os.environ.get("RESUME_TEXT_CACHE_STORE", "none")
+RESUME_TEXT_CACHE_TTL = int(os.environ.get("RESUME_TEXT_CACHE_TTL", str(24 * 3600)))
 RESUME_BUCKET_NAME = "your-project-id-resumes"  # UPDATE IF NEEDED
 
-# Initialize Firebase (idempotent)
-try:
-    firebase_admin.initialize_app()
-except ValueError:
-    pass
+# Clients, the Gemini model and heavy SDK modules are created on first use (see runtime.py)
+firestore = runtime.lazy_import("google.cloud.firestore")
+generative_models = runtime.lazy_import("vertexai.generative_models")
+db = runtime.lazy_firestore()
+storage_client = runtime.lazy_storage()
+gemini_model = runtime.lazy_gemini(GEMINI_MODEL)
 
-# --- NEW: Load Career Catalog ---
+# --- Career Catalog (compiled on first use, see _load_catalog) ---
 CAREERS_CATALOG = {}
-try:
-    with open('careers.json', 'r') as f:
-        careers_list = json.load(f)
-        # Create a simple {CareerName: [skills]} dictionary for the prompt
-        CAREERS_CATALOG = {career['displayName']: career['skills'] for career in careers_list}
-    print(f"--- DEBUG: Successfully loaded {len(CAREERS_CATALOG)} careers from catalog.")
-except Exception as e:
-    print(f"--- DEBUG (CRITICAL ERROR): Failed to load careers.json: {e}")
-# --- END NEW ---
-
-# Initialize Vertex AI
-vertexai.init(project=PROJECT_ID, location=LOCATION)
-
-# Clients
-db = firestore.Client()
-storage_client = storage.Client()
-
-# Safety settings (allow all for internal use)
-safety_settings = {
-    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-}
-
-gemini_model = GenerativeModel(GEMINI_MODEL, safety_settings=safety_settings)
+CAREER_MATCHER = None
+CATALOG_VERSION = None
+
+# Roadmaps shared by every user with the same (career, skill gaps), and by every
+# handler in the process when they are served together (see onboarding_service)
+ROADMAP_CACHE = runtime.cached("roadmap_cache", lambda: TieredCache(
+    "roadmap_cache",
+    memory=TTLCache(max_size=512, ttl=ROADMAP_CACHE_TTL),
+    store=make_store(ROADMAP_CACHE_STORE, db, "roadmap_cache"),
+    ttl=ROADMAP_CACHE_TTL,
+))
+
+# Text extracted from text-based PDFs, keyed by file content
+RESUME_TEXT_CACHE = TieredCache(
+    "resume_text_cache",
+    memory=TTLCache(max_size=256, ttl=RESUME_TEXT_CACHE_TTL),
+    store=make_store(RESUME_TEXT_CACHE_STORE, db, "resume_text_cache"),
+    ttl=RESUME_TEXT_CACHE_TTL,
+)
+
+# --- HELPER: Load Career Catalog ---
+def _load_catalog():
+    """Fills the catalog globals from careers.json; a no-op once loaded.
+
+    Called by the request and job paths rather than at import, so CORS
+    preflights and job polling never pay for parsing and compiling it.
+    """
+    global CAREERS_CATALOG, CAREER_MATCHER, CATALOG_VERSION
+    if CAREER_MATCHER is not None:
+        return
+    try:
+        catalog = load_catalog()
+        CAREERS_CATALOG = catalog.careers
+        # Compiled career x skill matrix for local matching
+        CAREER_MATCHER = catalog.matcher
+        # Stored resume analyses are only reused against the same catalog
+        CATALOG_VERSION = catalog.version
+        print(f"--- DEBUG: Successfully loaded {len(CAREERS_CATALOG)} careers from catalog.")
+    except Exception as e:
+        print(f"--- DEBUG (CRITICAL ERROR): Failed to load careers.json: {e}")
 
 # --- HELPER: Call Gemini ---
-def _call_gemini(prompt: str, file_part: Part = None) -> str | None:
+def _call_gemini(prompt: str, resume_parts: list | None = None) -> str | None:
     try:
         logging.info("Calling Gemini...")
         content = [prompt]
-        if file_part:
-            content.append(file_part)
+        if resume_parts:
+            content.extend(resume_parts)
         
         response = gemini_model.generate_content(content)
         
         if not response.text:
             logging.warning(f"Gemini blocked response: {response.prompt_feedback}")
             return None
+
+        usage = response.usage_metadata
+        logging.info(f"Gemini tokens: {usage.prompt_token_count} prompt, {usage.candidates_token_count} output")
             
         # Clean response
         text = response.text.strip()
@@ -71,18 +111,49 @@ def _call_gemini(prompt: str, file_part: Part = None) -> str | None:
         logging.error(f"Gemini call failed: {e}")
         return None
 
+# --- HELPER: Canonicalize Skills ---
+def _canonical_skills(skills_list):
+    """Maps skill names onto canonical catalog spellings and drops duplicates."""
+    if CAREER_MATCHER is None:
+        return skills_list
+    return CAREER_MATCHER.skill_index.canonicalize(skills_list)
+
 # --- HELPER: Get Career Recommendations ---
 def _get_recommendations(skills_list):
-    """Generates recommendations and gaps from a list of skills using a fixed catalog."""
+    """Ranks catalog careers against a list of skills and computes exact skill gaps."""
     print(f"--- DEBUG: Getting recommendations for skills: {skills_list}")
 
     # If the catalog failed to load, return an error
-    if not CAREERS_CATALOG:
+    if not CAREERS_CATALOG or CAREER_MATCHER is None:
         print("--- DEBUG (CRITICAL ERROR): Career catalog is empty. Aborting analysis.")
         return None
 
-    # Convert the catalog to a JSON string to pass to the prompt
-    catalog_json = json.dumps(CAREERS_CATALOG, indent=2)
+    top_n = max(RERANK_CANDIDATES, 3) if RECOMMENDATION_MODE == "gemini" else 3
+    matches = CAREER_MATCHER.match(skills_list, top_n=top_n)
+    if not matches:
+        # An explicit "no match" rather than arbitrary careers at score 0
+        print("--- DEBUG: No catalog career shares a skill with the user.")
+        return {"recommendations": []}
+
+    if RECOMMENDATION_MODE == "gemini":
+        reranked = _get_gemini_recommendations(skills_list, matches)
+        if reranked and reranked.get("recommendations"):
+            return reranked
+        print("--- DEBUG: Gemini re-rank failed, falling back to local ranking.")
+
+    return {"recommendations": [
+        {"career": match["career"], "skill_gaps": match["skill_gaps"]} for match in matches[:3]
+    ]}
+
+def _get_gemini_recommendations(skills_list, candidates):
+    """Optional Gemini re-rank over a local shortlist of candidate careers."""
+    # Only the shortlisted careers go into the prompt, in compact form, so the
+    # prompt size stays flat as careers.json grows.
+    shortlist = {match["career"]: CAREERS_CATALOG[match["career"]] for match in candidates}
+    catalog_json = json.dumps(shortlist, separators=(",", ":"))
+    full_tokens = len(json.dumps(CAREERS_CATALOG, indent=2)) // 4
+    print(f"--- DEBUG: Catalog prompt ~{full_tokens} tokens in full, ~{len(catalog_json) // 4} tokens "
+          f"for {len(shortlist)}/{len(CAREERS_CATALOG)} shortlisted careers.")
 
     prompt = f"""
     You are an expert career and HR analyst. You MUST follow these instructions.
@@ -90,7 +161,7 @@ def _get_recommendations(skills_list):
     A user has this list of skills:
     {json.dumps(skills_list)}
 
-    Here is your complete "Career Catalog". You MUST use this catalog exclusively. Do not invent new careers or skills.
+    Here is your "Career Catalog", shortlisted to the careers closest to the user's skills and ordered by skill coverage. You MUST use this catalog exclusively. Do not invent new careers or skills.
     The catalog is a JSON object where the key is the "Career Name" and the value is the "List of Required Skills".
 
     --- CATALOG START ---
@@ -142,6 +213,271 @@ Return ONLY a JSON array of steps:
         logging.error(f"Failed to parse roadmap: {result}")
         return []
 
+# --- HELPER: Cached Learning Roadmap ---
+def _get_cached_roadmap(career_name, skill_gaps):
+    """Serves a roadmap from the two-tier cache, generating it once on a miss."""
+    key = roadmap_key(career_name, _canonical_skills(skill_gaps or []), "text")
+    return ROADMAP_CACHE.get_or_compute(key, lambda: _get_roadmap(career_name, skill_gaps))
+
+# --- HELPER: Recommendations + Roadmaps ---
+def _get_fused_recommendations(skills_list):
+    """One structured Gemini call for recommendations, skill gaps and roadmaps."""
+    if CAREER_MATCHER is None:
+        return None
+    candidates = CAREER_MATCHER.match(skills_list, top_n=max(RERANK_CANDIDATES, 3), max_gaps=10)
+    if not candidates:
+        print("--- DEBUG: No catalog career shares a skill with the user.")
+        return []
+    recommendations = generate_fused(gemini_model, skills_list, candidates, CAREERS_CATALOG, TEXT_STEPS)
+    if recommendations is None:
+        return None
+    return [rec.to_dict() for rec in recommendations]
+
+def _iter_pipeline(skills_list, pipeline=PIPELINE_MODE):
+    """Runs recommendations + roadmaps, yielding each stage as soon as it is ready.
+
+    Yields ("recommendations", recs) once (recs is None on failure), then
+    ("roadmap", rec) per career. The "fused" pipeline falls back to the
+    multi-call one if its single call fails.
+    """
+    started = time.monotonic()
+    if pipeline == "fused":
+        recommendations = _get_fused_recommendations(skills_list)
+        if recommendations is not None:
+            yield "recommendations", recommendations
+            for rec in recommendations:
+                yield "roadmap", rec
+            logging.info(f"fused pipeline took {time.monotonic() - started:.2f}s")
+            return
+        logging.info("fused pipeline failed, falling back to multi-call")
+
+    analysis_data = _get_recommendations(skills_list)
+    if not analysis_data:
+        yield "recommendations", None
+        return
+    recommendations = analysis_data.get("recommendations", [])
+    yield "recommendations", recommendations
+    # Roadmaps are generated concurrently, a timed-out one comes back empty
+    for rec in iter_roadmaps(_get_cached_roadmap, recommendations):
+        yield "roadmap", rec
+    logging.info(f"Roadmap cache: {ROADMAP_CACHE.stats()}")
+    logging.info(f"multi pipeline took {time.monotonic() - started:.2f}s")
+
+def _build_recommendations(skills_list, pipeline=PIPELINE_MODE):
+    """Runs the whole pipeline and returns the recommendations with roadmaps."""
+    recommendations = None
+    for stage, value in _iter_pipeline(skills_list, pipeline):
+        if stage == "recommendations":
+            recommendations = value
+    return recommendations
+
+def _save_results(user_id, skills_list, recommendations, resume_fingerprint=None):
+    save_data = {
+        "skills": skills_list,
+        "recommendations": recommendations,
+        "last_updated_from": "resume",
+        "last_updated": firestore.SERVER_TIMESTAMP
+    }
+    # Remember complete analyses so an unchanged resume is not analyzed again
+    if resume_fingerprint and all(rec.get("roadmap") for rec in recommendations):
+        save_data["resume_analysis"] = {
+            "fingerprint": resume_fingerprint,
+            "skills": skills_list,
+            "recommendations": recommendations,
+        }
+    db.collection("users").document(user_id).set(save_data, merge=True)
+
+def _replay_results(skills_list, recommendations):
+    """Same NDJSON events as _stream_results, for an already stored analysis."""
+    yield {"stage": "skills", "skills": skills_list}
+    yield {"stage": "recommendations", "recommendations": [
+        {"career": rec.get("career"), "skill_gaps": rec.get("skill_gaps", [])} for rec in recommendations
+    ]}
+    for rec in recommendations:
+        yield {"stage": "roadmap", "career": rec.get("career"), "roadmap": rec.get("roadmap", [])}
+    yield {"stage": "done", "skills": skills_list, "recommendations": recommendations}
+
+# --- HELPER: Resume Fingerprints ---
+def _resume_fingerprint(manifest):
+    """Identifies the analyzed resume by its manifest entry (no download needed)."""
+    return {
+        "path": manifest["blob_name"],
+        "generation": manifest.get("generation"),
+        "md5": manifest.get("md5"),
+        "catalog": CATALOG_VERSION,
+    }
+
+def _get_stored_analysis(user_data, resume_fingerprint):
+    """Returns the stored resume analysis if it was made from the same file and catalog."""
+    analysis = user_data.get("resume_analysis")
+    if not analysis:
+        return None
+    stored = analysis.get("fingerprint") or {}
+    if stored.get("path") != resume_fingerprint["path"] or stored.get("catalog") != resume_fingerprint["catalog"]:
+        return None
+    # md5 identifies the content; composite objects have none, so fall back to the generation
+    if resume_fingerprint["md5"]:
+        same = stored.get("md5") == resume_fingerprint["md5"]
+    else:
+        same = stored.get("generation") == resume_fingerprint["generation"]
+    return analysis if same else None
+
+# --- HELPER: Resolve Resume ---
+def _find_resume_by_listing(bucket, user_id):
+    """Legacy lookup for uploads made before the resume manifest existed."""
+    prefix = f"{user_id}/"
+    for blob in storage_client.list_blobs(bucket, prefix=prefix):
+        if blob.name == prefix:
+            continue
+        if blob.name.lower().endswith(('.pdf', '.png', '.jpg', '.jpeg')) or 'image/' in (blob.content_type or ''):
+            return blob  # First valid resume only
+    return None
+
+def _resolve_resume(bucket, user_id, user_data):
+    """Returns the active resume's manifest entry, from the user document when possible."""
+    manifest = user_data.get("resume")
+    if manifest and manifest.get("blob_name"):
+        return manifest
+
+    blob = _find_resume_by_listing(bucket, user_id)
+    if blob is None:
+        return None
+    manifest = {
+        "path": f"gs://{RESUME_BUCKET_NAME}/{blob.name}",
+        "blob_name": blob.name,
+        "size": blob.size,
+        "content_type": blob.content_type,
+        "md5": blob.md5_hash,
+        "generation": blob.generation,
+    }
+    # Backfill so the next call is a single point read
+    db.collection("users").document(user_id).set({"resume": manifest}, merge=True)
+    return manifest
+
+# --- HELPER: Prepare Resume ---
+def _load_resume(bucket, manifest):
+    """Returns the resume as Gemini content: extracted text when possible, else compact files.
+
+    Extracted text is cached per file content, so re-analyzing the same
+    resume needs neither the download nor the extraction.
+    """
+    key = fingerprint("resume_text", manifest["blob_name"], manifest.get("md5") or manifest.get("generation"))
+    text = RESUME_TEXT_CACHE.get(key)
+    if text is not None:
+        logging.info(f"Resume text cache hit for {manifest['blob_name']}")
+        return [f"--- RESUME TEXT ---\n{text}"]
+
+    # Pinned to the manifest's generation
+    resume_blob = bucket.blob(manifest["blob_name"], generation=manifest.get("generation"))
+    resume_bytes = resume_blob.download_as_bytes()
+    mime_type = manifest.get("content_type") or "application/pdf"
+    prepared = prepare_resume(resume_bytes, mime_type)
+    logging.info(f"Resume payload {prepared.report()}")
+
+    if prepared.kind == "text":
+        RESUME_TEXT_CACHE.set(key, prepared.text)
+        return [f"--- RESUME TEXT ---\n{prepared.text}"]
+    return [generative_models.Part.from_data(data=data, mime_type=part_mime) for data, part_mime in prepared.files]
+
+# --- HELPER: Extract Skills ---
+class ResumeAnalysisError(Exception):
+    """A resume analysis step failed; `status` is the HTTP status to report."""
+
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+def _extract_skills(bucket, manifest):
+    resume_parts = _load_resume(bucket, manifest)
+    skill_prompt = """
+You are a resume parser. Extract ALL technical and soft skills from the resume.
+Return ONLY valid JSON:
+{"skills": ["Python", "Machine Learning", "Teamwork", ...]}
+"""
+    skills_json = _call_gemini(skill_prompt, resume_parts)
+    if not skills_json:
+        raise ResumeAnalysisError("Failed to extract skills.")
+
+    try:
+        skills_data = json.loads(skills_json)
+        skills_list = skills_data.get("skills", [])
+    except json.JSONDecodeError:
+        raise ResumeAnalysisError("Invalid skills JSON from Gemini.")
+
+    if not skills_list:
+        raise ResumeAnalysisError("No skills detected in resume.", 400)
+
+    return _canonical_skills(skills_list)
+
+# --- HELPER: Background Analysis Jobs ---
+def _run_resume_job(job):
+    """Analyzes the resume a job was queued for and saves the results like handle_resume does."""
+    user_id = job["user_id"]
+    _load_catalog()
+    bucket = storage_client.bucket(RESUME_BUCKET_NAME)
+    user_doc = db.collection("users").document(user_id).get()
+    user_data = (user_doc.to_dict() or {}) if user_doc.exists else {}
+
+    manifest = job.get("payload", {}).get("resume") or _resolve_resume(bucket, user_id, user_data)
+    if not manifest:
+        raise PermanentJobError(f"No resume found for user {user_id}.")
+    current = user_data.get("resume") or {}
+    if current.get("generation") and current.get("generation") != manifest.get("generation"):
+        # A newer upload has its own job; do not overwrite its results with this one's
+        logging.info(f"Skipping superseded resume job {job['id']} for {user_id}")
+        return {"superseded": True}
+
+    resume_fingerprint = _resume_fingerprint(manifest)
+    stored = _get_stored_analysis(user_data, resume_fingerprint)
+    if stored:
+        skills_list, recommendations = stored["skills"], stored["recommendations"]
+        _save_results(user_id, skills_list, recommendations)
+    else:
+        try:
+            skills_list = _extract_skills(bucket, manifest)
+        except ResumeAnalysisError as e:
+            if e.status < 500:
+                raise PermanentJobError(str(e))
+            raise
+        recommendations = _build_recommendations(skills_list)
+        if recommendations is None:
+            raise ResumeAnalysisError("Failed to generate career recommendations.")
+        _save_results(user_id, skills_list, recommendations, resume_fingerprint)
+
+    return {"skills": len(skills_list), "careers": [rec.get("career") for rec in recommendations]}
+
+def _get_job_status(user_id, job_id):
+    snapshot = db.collection(JOB_COLLECTION).document(job_id).get()
+    if not snapshot.exists:
+        return None
+    status = snapshot.to_dict() or {}
+    if status.get("user_id") != user_id:
+        return None
+    return {"job_id": job_id, **status}
+
+def _stream_results(user_id, skills_list, pipeline=PIPELINE_MODE, resume_fingerprint=None):
+    """NDJSON events: skills, recommendations, one per roadmap, then done (after the Firestore write)."""
+    yield {"stage": "skills", "skills": skills_list}
+    try:
+        recommendations = None
+        for stage, value in _iter_pipeline(skills_list, pipeline):
+            if stage == "recommendations":
+                if value is None:
+                    yield {"stage": "error", "message": "Failed to generate career recommendations."}
+                    return
+                recommendations = value
+                yield {"stage": "recommendations", "recommendations": [
+                    {"career": rec.get("career"), "skill_gaps": rec.get("skill_gaps", [])} for rec in value
+                ]}
+            else:
+                yield {"stage": "roadmap", "career": value.get("career"), "roadmap": value.get("roadmap", [])}
+
+        _save_results(user_id, skills_list, recommendations, resume_fingerprint)
+        yield {"stage": "done", "skills": skills_list, "recommendations": recommendations}
+    except Exception as e:
+        logging.exception("Streaming pipeline failed")
+        yield {"stage": "error", "message": str(e)}
+
 # --- MAIN FUNCTION ---
 @functions_framework.http
 def handle_resume(request):
@@ -163,82 +499,93 @@ def handle_resume(request):
         if not auth_header or not auth_header.startswith('Bearer '):
             return ("Missing or invalid Authorization", 403, headers)
         id_token = auth_header.split('Bearer ')[1]
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = runtime.verify_id_token(id_token)
         user_id = decoded_token['uid']
     except Exception as e:
         logging.error(f"Auth failed: {e}")
         return (f"Authentication failed: {e}", 403, headers)
 
-    try:
-        # 2. Auto-fetch resume from GCS
-        bucket = storage_client.bucket(RESUME_BUCKET_NAME)
-        prefix = f"{user_id}/"
-        blobs = list(storage_client.list_blobs(bucket, prefix=prefix))
-
-        resume_blob = None
-        for blob in blobs:
-            if blob.name == prefix:
-                continue
-            if blob.name.lower().endswith(('.pdf', '.png', '.jpg', '.jpeg')) or 'image/' in blob.content_type:
-                resume_blob = blob
-                break  # First valid resume only
-
-        if not resume_blob:
-            return (f"No resume found for user {user_id}. Upload one first.", 404, headers)
+    # 1b. Poll a queued analysis job (?job=<id>); clients can also subscribe to resume_jobs/{id}
+    job_id = request.args.get("job")
+    if job_id:
+        status = _get_job_status(user_id, job_id)
+        if status is None:
+            return (f"Job {job_id} not found.", 404, headers)
+        return (json.dumps(status, indent=2, default=str), 200, headers)
 
-        logging.info(f"Found resume: {resume_blob.name}")
+    try:
+        _load_catalog()
 
-        # 3. Download & prepare for Gemini
-        resume_bytes = resume_blob.download_as_bytes()
-        mime_type = resume_blob.content_type or "application/pdf"
-        resume_part = Part.from_data(data=resume_bytes, mime_type=mime_type)
+        # 2. Resolve the active resume from the user's manifest (one point read)
+        bucket = storage_client.bucket(RESUME_BUCKET_NAME)
+        user_doc = db.collection("users").document(user_id).get()
+        user_data = (user_doc.to_dict() or {}) if user_doc.exists else {}
 
-        # 4. Extract Skills
-        skill_prompt = """
-You are a resume parser. Extract ALL technical and soft skills from the resume.
-Return ONLY valid JSON:
-{"skills": ["Python", "Machine Learning", "Teamwork", ...]}
-"""
-        skills_json = _call_gemini(skill_prompt, resume_part)
-        if not skills_json:
-            return ("Failed to extract skills.", 500, headers)
+        manifest = _resolve_resume(bucket, user_id, user_data)
+        if not manifest:
+            return (f"No resume found for user {user_id}. Upload one first.", 404, headers)
 
+        logging.info(f"Found resume: {manifest['blob_name']}")
+
+        # 2b. Reuse the stored analysis if this exact file was analyzed before (?force=1 recomputes)
+        resume_fingerprint = _resume_fingerprint(manifest)
+        force = request.args.get("force", "").lower() in ("1", "true")
+        stored = None if force else _get_stored_analysis(user_data, resume_fingerprint)
+        if stored:
+            logging.info(f"Resume unchanged since last analysis, returning stored results for {user_id}")
+            skills_list, recommendations = stored["skills"], stored["recommendations"]
+            _save_results(user_id, skills_list, recommendations)
+            if wants_stream(request):
+                return ndjson_response(_replay_results(skills_list, recommendations), headers)
+            response_data = {
+                "skills": skills_list,
+                "recommendations": recommendations
+            }
+            return (json.dumps(response_data, indent=2), 200, headers)
+
+        # 3-4. Download, preprocess and extract skills
         try:
-            skills_data = json.loads(skills_json)
-            skills_list = skills_data.get("skills", [])
-        except json.JSONDecodeError:
-            return ("Invalid skills JSON from Gemini.", 500, headers)
-
-        if not skills_list:
-            return ("No skills detected in resume.", 400, headers)
+            skills_list = _extract_skills(bucket, manifest)
+        except ResumeAnalysisError as e:
+            return (str(e), e.status, headers)
 
         # 5. Get Recommendations + Roadmaps
-        recommendations = _get_recommendations(skills_list)
-        if not recommendations or "recommendations" not in recommendations:
-            return ("Failed to generate career recommendations.", 500, headers)
+        pipeline = request.args.get("pipeline", PIPELINE_MODE)
+        if wants_stream(request):
+            # Skills go out now; recommendations and roadmaps follow as they finish
+            return ndjson_response(_stream_results(user_id, skills_list, pipeline, resume_fingerprint), headers)
 
-        for rec in recommendations["recommendations"]:
-            career = rec.get("career")
-            gaps = rec.get("skill_gaps", [])
-            roadmap = _get_roadmap(career, gaps)
-            rec["roadmap"] = roadmap
+        recommendations = _build_recommendations(skills_list, pipeline)
+        if recommendations is None:
+            return ("Failed to generate career recommendations.", 500, headers)
 
         # 6. Save to Firestore
-        save_data = {
-            "skills": skills_list,
-            "recommendations": recommendations["recommendations"],
-            "last_updated_from": "resume",
-            "last_updated": firestore.SERVER_TIMESTAMP
-        }
-        db.collection("users").document(user_id).set(save_data, merge=True)
+        _save_results(user_id, skills_list, recommendations, resume_fingerprint)
 
         # 7. Return clean response
         response_data = {
             "skills": skills_list,
-            "recommendations": recommendations["recommendations"]
+            "recommendations": recommendations
         }
         return (json.dumps(response_data, indent=2), 200, headers)
 
     except Exception as e:
         logging.exception("Resume pipeline failed")
-        return (f"Internal error: {str(e)}", 500, headers)
\ No newline at end of file
+        return (f"Internal error: {str(e)}", 500, headers)
+
+# --- JOB WORKERS ---
+@functions_framework.cloud_event
+def process_resume_job(cloud_event):
+    """Pub/Sub-triggered worker for jobs queued by upload_resume.
+
+    Raising makes Pub/Sub redeliver the message; concurrency is bounded by
+    this function's max instances.
+    """
+    job = json.loads(base64.b64decode(cloud_event.data["message"]["data"]))
+    if not run_job(db, job, _run_resume_job):
+        raise RuntimeError(f"Resume job {job['id']} failed, will be retried")
+
+# Local stand-in: drain the SQLite job queue with a small in-process worker pool
+JOB_WORKER_POOL = None
+if JOB_QUEUE == "local":
+    JOB_WORKER_POOL = WorkerPool(make_queue("local"), lambda job: run_job(db, job, _run_resume_job)).start()
@@ -0,0 +1,130 @@
+import io
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+
+from runtime import lazy_import
+
+# Imaging and PDF libraries load on the first resume, not at import
+Image = lazy_import("PIL.Image")
+ImageOps = lazy_import("PIL.ImageOps")
+pypdf = lazy_import("pypdf")
+
+# Pages beyond this are not sent to Gemini (resumes rarely need more)
+RESUME_MAX_PAGES = int(os.environ.get("RESUME_MAX_PAGES", "4"))
+# Longest image edge in pixels after downscaling
+RESUME_MAX_EDGE = int(os.environ.get("RESUME_MAX_EDGE", "1600"))
+RESUME_JPEG_QUALITY = int(os.environ.get("RESUME_JPEG_QUALITY", "80"))
+# A PDF with less extractable text per page than this is treated as scanned
+RESUME_MIN_PAGE_CHARS = int(os.environ.get("RESUME_MIN_PAGE_CHARS", "200"))
+# Upper bound on the extracted text put into the prompt
+RESUME_MAX_CHARS = int(os.environ.get("RESUME_MAX_CHARS", "30000"))
+
+PDF_MIME = "application/pdf"
+JPEG_MIME = "image/jpeg"
+
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+_SPACES_RE = re.compile(r"[ \t\u00a0]+")
+
+
+@dataclass
+class PreparedResume:
+    """What is sent to Gemini for a resume: extracted text, or compact file parts.
+
+    `kind` is "text" (text-based PDF), "images" (downscaled photos or scanned
+    pages), "pdf" (page-capped PDF) or "raw" (original bytes, when nothing
+    smaller could be produced).
+    """
+    kind: str
+    original_bytes: int
+    text: str = ""
+    files: list = field(default_factory=list)  # [(bytes, mime_type)]
+
+    @property
+    def payload_bytes(self):
+        if self.kind == "text":
+            return len(self.text.encode("utf-8"))
+        return sum(len(data) for data, _ in self.files)
+
+    def report(self):
+        saved = 1 - self.payload_bytes / self.original_bytes if self.original_bytes else 0.0
+        return (f"{self.kind}: {self.original_bytes} -> {self.payload_bytes} bytes "
+                f"({saved:.0%} smaller)")
+
+
+def _compact_text(text):
+    text = _SPACES_RE.sub(" ", text)
+    text = _BLANK_LINES_RE.sub("\n\n", text)
+    return text.strip()[:RESUME_MAX_CHARS]
+
+
+def downscale_image(data, mime_type, max_edge=RESUME_MAX_EDGE, quality=RESUME_JPEG_QUALITY):
+    """Re-encodes an image as a JPEG whose longest edge is at most `max_edge`.
+
+    Returns (bytes, mime_type); the original image if re-encoding would not
+    make it smaller.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)  # phone photos carry their rotation in EXIF
+        img.thumbnail((max_edge, max_edge))
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=quality, optimize=True)
+    compact = out.getvalue()
+    if len(compact) < len(data):
+        return compact, JPEG_MIME
+    return data, mime_type
+
+
+def _page_images(pages):
+    """Embedded images of scanned pages (typically one full-page scan each)."""
+    images = []
+    for page in pages:
+        for image in page.images:
+            images.append(downscale_image(image.data, Image.MIME.get(image.image.format, JPEG_MIME)))
+    return images
+
+
+def _capped_pdf(pages):
+    writer = pypdf.PdfWriter()
+    for page in pages:
+        writer.add_page(page)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def _prepare_pdf(data):
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    pages = reader.pages[:RESUME_MAX_PAGES]
+
+    text = "\n\n".join(page.extract_text() or "" for page in pages)
+    if len(text.strip()) >= RESUME_MIN_PAGE_CHARS * len(pages):
+        return PreparedResume("text", len(data), text=_compact_text(text))
+
+    # Scanned PDF: send the downscaled page scans, or at least fewer pages
+    images = _page_images(pages)
+    if images and sum(len(image) for image, _ in images) < len(data):
+        return PreparedResume("images", len(data), files=images)
+    if len(reader.pages) > RESUME_MAX_PAGES:
+        return PreparedResume("pdf", len(data), files=[(_capped_pdf(pages), PDF_MIME)])
+    return PreparedResume("raw", len(data), files=[(data, PDF_MIME)])
+
+
+def prepare_resume(data, mime_type):
+    """Turns an uploaded resume into the smallest payload Gemini can still read.
+
+    Text-based PDFs become plain text, images and scanned pages are
+    downscaled and recompressed, and long PDFs are capped at
+    RESUME_MAX_PAGES. Anything that cannot be processed is sent unchanged.
+    """
+    try:
+        if mime_type == PDF_MIME or data[:5] == b"%PDF-":
+            return _prepare_pdf(data)
+        if mime_type.startswith("image/"):
+            return PreparedResume("images", len(data), files=[downscale_image(data, mime_type)])
+    except Exception as e:
+        logging.warning(f"Resume preprocessing failed, sending the original file: {e}")
+    return PreparedResume("raw", len(data), files=[(data, mime_type)])
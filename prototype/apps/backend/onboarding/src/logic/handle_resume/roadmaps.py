@@ -0,0 +1,62 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+
+from cache import fingerprint
+
+# About 3 roadmaps per request: size for the requests served at once (the
+# unified service sets it from its thread count, see gunicorn.conf.py)
+ROADMAP_WORKERS = int(os.environ.get("ROADMAP_WORKERS", "6"))
+ROADMAP_TIMEOUT = float(os.environ.get("ROADMAP_TIMEOUT", "45"))
+
+# Process-wide pool: a timed-out call keeps its thread until Gemini returns,
+# but the request that gave up on it does not wait for it.
+_executor = ThreadPoolExecutor(max_workers=ROADMAP_WORKERS, thread_name_prefix="roadmap")
+
+
+def roadmap_key(career_name, skill_gaps, variant):
+    """Cache key for a roadmap: career plus the sorted, canonicalized gap set.
+
+    `variant` separates prompts that produce differently shaped roadmaps.
+    """
+    gaps = sorted({gap for gap in skill_gaps if isinstance(gap, str)})
+    return fingerprint("roadmap", variant, career_name, gaps)
+
+
+def iter_roadmaps(get_roadmap, recommendations, timeout=ROADMAP_TIMEOUT):
+    """Generates roadmaps for all recommendations concurrently.
+
+    Sets rec["roadmap"] on each recommendation and yields the recommendations
+    in completion order. Calls that fail or are still running after `timeout`
+    seconds get an empty roadmap, so the others are never held back.
+    """
+    deadline = time.monotonic() + timeout
+    futures = {
+        _executor.submit(get_roadmap, rec.get("career"), rec.get("skill_gaps", [])): rec
+        for rec in recommendations
+    }
+    pending = set(futures)
+    try:
+        for future in as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+            pending.discard(future)
+            rec = futures[future]
+            try:
+                rec["roadmap"] = future.result()
+            except Exception as e:
+                print(f"--- DEBUG (ERROR): Roadmap for {rec.get('career')} failed: {e}")
+                rec["roadmap"] = []
+            yield rec
+    except TimeoutError:
+        for future in pending:
+            future.cancel()
+            rec = futures[future]
+            print(f"--- DEBUG (ERROR): Roadmap for {rec.get('career')} timed out after {timeout}s")
+            rec["roadmap"] = []
+            yield rec
+
+
+def attach_roadmaps(get_roadmap, recommendations, timeout=ROADMAP_TIMEOUT):
+    """Fills rec["roadmap"] for every recommendation; bounded by the slowest call."""
+    for _ in iter_roadmaps(get_roadmap, recommendations, timeout):
+        pass
+    return recommendations
@@ -0,0 +1,25 @@
+import json
+
+from flask import Response
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def wants_stream(request):
+    """Streaming is opted into with ?stream=1 or an `Accept: application/x-ndjson` header."""
+    if request.args.get("stream", "").lower() in ("1", "true", "ndjson"):
+        return True
+    return NDJSON_MIMETYPE in request.headers.get("Accept", "")
+
+
+def ndjson_response(events, headers):
+    """Streams an iterable of JSON-serializable events, one per line, as they are produced."""
+    def generate():
+        for event in events:
+            yield json.dumps(event) + "\n"
+
+    stream_headers = dict(headers)
+    # Keep proxies from buffering the stream until it ends
+    stream_headers["Cache-Control"] = "no-cache"
+    stream_headers["X-Accel-Buffering"] = "no"
+    return Response(generate(), status=200, mimetype=NDJSON_MIMETYPE, headers=stream_headers)
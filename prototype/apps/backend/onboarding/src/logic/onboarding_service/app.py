@@ -0,0 +1,145 @@
+"""All six onboarding functions behind one WSGI app.
+
+Each function is mounted at /<function name>, the same path it has on
+Cloud Functions, so clients only swap the base URL. The functions' main.py
+files are imported unchanged (their functions_framework entry points keep
+working on their own). In one process they share the modules they have
+copies of, and with them runtime.py's clients and Gemini models, the
+roadmap cache and the compiled career catalog. The app refuses to start
+if those copies have drifted apart.
+
+/process_resume_job only accepts Pub/Sub pushes carrying an OIDC token
+for PUBSUB_PUSH_AUDIENCE signed as PUBSUB_PUSH_SERVICE_ACCOUNT (set both
+on the push subscription); without them the route is not served.
+
+Serve with gunicorn (see gunicorn.conf.py for concurrency settings):
+
+    gunicorn -c gunicorn.conf.py app:app
+"""
+import importlib.util
+import os
+import sys
+from types import SimpleNamespace
+
+from flask import Flask, request
+
+from shared_files import drifted
+
+LOGIC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Function name -> entry points served from its main.py
+HTTP_FUNCTIONS = [
+    "upload_resume", "handle_resume", "handle_github",
+    "get_dynamic_quiz", "handle_quiz_results", "select_career",
+]
+# Pub/Sub push endpoint for the resume jobs upload_resume queues
+EVENT_FUNCTIONS = {"process_resume_job": "handle_resume"}
+
+# Compile the catalog before gunicorn forks, so workers share one copy
+ONBOARDING_WARM_CATALOG = os.environ.get("ONBOARDING_WARM_CATALOG", "1").lower() in ("1", "true")
+# The push subscription's OIDC audience and service account
+PUBSUB_PUSH_AUDIENCE = os.environ.get("PUBSUB_PUSH_AUDIENCE")
+PUBSUB_PUSH_SERVICE_ACCOUNT = os.environ.get("PUBSUB_PUSH_SERVICE_ACCOUNT")
+
+
+def _check_shared_files():
+    """Raises if a file copied into several function directories differs between them.
+
+    Only one copy of each shared module is imported, so a drifted copy
+    would silently change the behaviour of the other functions.
+    """
+    mismatched = drifted(LOGIC_DIR, HTTP_FUNCTIONS)
+    if mismatched:
+        raise RuntimeError(f"Shared files differ between functions: {'; '.join(mismatched)}")
+
+
+def _load_main(function_name):
+    """Imports <function_name>/main.py under its own module name.
+
+    Shared helper modules (cache, catalog, runtime, ...) are identical in
+    every function directory (see _check_shared_files), so whichever copy
+    is found first serves all.
+    """
+    function_dir = os.path.join(LOGIC_DIR, function_name)
+    if function_dir not in sys.path:
+        sys.path.append(function_dir)
+    spec = importlib.util.spec_from_file_location(f"{function_name}_main", os.path.join(function_dir, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _http_view(handler):
+    def view():
+        return handler(request)
+    return view
+
+
+def _verify_push_token(auth_header):
+    """Checks a Pub/Sub push request's OIDC token; returns an error (message, status) or None."""
+    from google.auth.transport import requests as google_requests
+    from google.oauth2 import id_token
+
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return "Unauthorized: missing push token", 401
+    try:
+        # The Request (and Google's signing certs it fetches) is reused across calls
+        transport = sys.modules["runtime"].cached("google_auth_request", google_requests.Request)
+        claims = id_token.verify_oauth2_token(auth_header[len("Bearer "):], transport, audience=PUBSUB_PUSH_AUDIENCE)
+    except Exception as e:
+        return f"Unauthorized: invalid push token: {e}", 401
+    if claims.get("email") != PUBSUB_PUSH_SERVICE_ACCOUNT or not claims.get("email_verified"):
+        return "Forbidden: push token is not from the push service account", 403
+    return None
+
+
+def _event_view(handler):
+    def view():
+        error = _verify_push_token(request.headers.get("Authorization"))
+        if error:
+            return error
+        # A Pub/Sub push body is {"message": {"data": ...}, "subscription": ...},
+        # the same shape as the CloudEvent data functions_framework passes in
+        envelope = request.get_json(silent=True)
+        if not envelope or "data" not in envelope.get("message", {}):
+            return "Bad Request: expected a Pub/Sub push message", 400
+        # Raising returns a 500, and Pub/Sub redelivers like it does for the function
+        handler(SimpleNamespace(data=envelope))
+        return "", 204
+    return view
+
+
+def create_app():
+    app = Flask(__name__)
+    _check_shared_files()
+    mains = {name: _load_main(name) for name in HTTP_FUNCTIONS}
+
+    for name, module in mains.items():
+        app.add_url_rule(f"/{name}", name, _http_view(getattr(module, name)),
+                         methods=["GET", "POST", "OPTIONS"])
+    if PUBSUB_PUSH_AUDIENCE and PUBSUB_PUSH_SERVICE_ACCOUNT:
+        for name, function_name in EVENT_FUNCTIONS.items():
+            app.add_url_rule(f"/{name}", name, _event_view(getattr(mains[function_name], name)), methods=["POST"])
+    else:
+        print("--- DEBUG: PUBSUB_PUSH_AUDIENCE/PUBSUB_PUSH_SERVICE_ACCOUNT not set, not serving "
+              f"{', '.join(EVENT_FUNCTIONS)}.")
+
+    @app.route("/healthz")
+    def healthz():
+        runtime = sys.modules["runtime"]
+        return {"status": "ok", "functions": HTTP_FUNCTIONS, "loaded": runtime.loaded()}
+
+    if ONBOARDING_WARM_CATALOG:
+        from catalog import load_catalog
+        catalog = load_catalog()
+        print(f"--- DEBUG: Compiled {len(catalog.careers)} careers before serving.")
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    # Development server; use gunicorn for anything concurrent
+    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", "8080")), threaded=True)
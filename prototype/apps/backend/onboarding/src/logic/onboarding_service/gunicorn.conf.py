@@ -0,0 +1,25 @@
+# gunicorn settings for the unified onboarding service (app.py).
+# Processes x threads is the number of requests served at once; most of a
+# request is spent waiting on Gemini, Firestore or GitHub, so threads are cheap.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get("ONBOARDING_WORKERS", os.environ.get("WEB_CONCURRENCY", "2")))
+threads = int(os.environ.get("ONBOARDING_THREADS", "8"))
+worker_class = "gthread"
+# Each request generates about 3 roadmaps on roadmaps.py's process-wide pool, and
+# a roadmap's timeout runs from submission: with fewer pool threads than that,
+# queued roadmaps time out under load and come back empty
+os.environ.setdefault("ROADMAP_WORKERS", str(threads * 3))
+# Gemini calls (and streamed roadmaps) can take minutes
+timeout = int(os.environ.get("ONBOARDING_TIMEOUT", "540"))
+graceful_timeout = 30
+keepalive = 75
+
+# Import the app (and compile the catalog) once, before forking. Clients are
+# created lazily after the fork, so none are shared between workers. Turn it
+# off for the local SQLite stand-ins (sqlite cache stores, JOB_QUEUE=local),
+# whose connections and worker threads must be opened in each worker.
+preload_app = os.environ.get("ONBOARDING_PRELOAD", "1").lower() in ("1", "true")
+
+accesslog = "-"
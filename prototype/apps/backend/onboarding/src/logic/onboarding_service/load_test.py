@@ -0,0 +1,197 @@
+"""Load test comparing the split Cloud Functions with the unified service.
+
+Both deployments serve each function at <base URL>/<function name>, so the
+same request mix is sent to each and the latencies are compared:
+
+    python load_test.py \\
+        --split https://asia-south1-<project>.cloudfunctions.net \\
+        --unified https://onboarding-service-<hash>.a.run.app \\
+        --token "$FIREBASE_ID_TOKEN" --concurrency 16 --requests 600
+
+Without --token only CORS preflights are sent. With it, the quiz, quiz
+results and career selection endpoints are exercised for that user;
+--github-user adds handle_github, and --resume adds handle_resume (the user
+must have an analyzed resume, so the stored analysis is served). "first"
+is each route's first response, the closest this gets to a cold start:
+deploy or scale to zero right before the run to measure those.
+
+A recommendation that comes back without a roadmap (its generation timed
+out or failed) counts as an error, and the run exits non-zero if any did.
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROUTES = [
+    "upload_resume", "handle_resume", "handle_github",
+    "get_dynamic_quiz", "handle_quiz_results", "select_career",
+]
+
+# Routes whose JSON response carries recommendations with roadmaps
+ROADMAP_ROUTES = ("handle_resume", "handle_github", "handle_quiz_results")
+
+_local = threading.local()
+
+
+def scenarios(args):
+    """The request mix as (route, method, json body) tuples."""
+    mix = [(route, "OPTIONS", None) for route in ROUTES]
+    if args.token:
+        mix += [
+            ("get_dynamic_quiz", "POST", {"conversation_history": []}),
+            ("get_dynamic_quiz", "POST", {"conversation_history": [
+                {"question": "What area are you most interested in?", "answer": "Web Development"},
+            ]}),
+            ("handle_quiz_results", "POST", {"final_skills": ["Python", "SQL", "React", "Docker"]}),
+            ("select_career", "POST", {"career_title": args.career}),
+        ]
+        if args.github_user:
+            mix.append(("handle_github", "POST", {"githubUsername": args.github_user}))
+        if args.resume:
+            mix.append(("handle_resume", "POST", None))
+    return mix
+
+
+def _session():
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def empty_roadmaps(route, response):
+    """Recommendations in a roadmap route's response that have no roadmap."""
+    if route not in ROADMAP_ROUTES or response.status_code != 200:
+        return 0
+    try:
+        recommendations = response.json().get("recommendations") or []
+    except ValueError:
+        return 0
+    return sum(1 for rec in recommendations if not rec.get("roadmap"))
+
+
+def send(base_url, token, scenario):
+    route, method, body = scenario
+    headers = {"Origin": "http://localhost", "Access-Control-Request-Method": "POST"} if method == "OPTIONS" else {}
+    if token and method != "OPTIONS":
+        headers["Authorization"] = f"Bearer {token}"
+    start = time.perf_counter()
+    try:
+        response = _session().request(method, f"{base_url.rstrip('/')}/{route}", json=body, headers=headers, timeout=600)
+        status = response.status_code
+        empty = empty_roadmaps(route, response)
+    except requests.RequestException:
+        status, empty = None, 0
+    return route, method, status, time.perf_counter() - start, empty
+
+
+def run(base_url, args):
+    mix = scenarios(args)
+    jobs = [mix[i % len(mix)] for i in range(max(args.requests, len(mix)))]
+    results = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def worker(scenario):
+        result = send(base_url, args.token, scenario)
+        with lock:
+            results.append(result)
+
+    # One pass over the mix first, so every route's first request is a lone cold one
+    for scenario in mix:
+        worker(scenario)
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(worker, jobs[len(mix):]))
+    return results, time.perf_counter() - start
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(results, elapsed):
+    rows = {}
+    for route, method, status, latency, empty in results:
+        row = rows.setdefault(f"{method} {route}", {"latencies": [], "errors": 0, "empty_roadmaps": 0})
+        row["latencies"].append(latency)
+        row["empty_roadmaps"] += empty
+        if status is None or status >= 400 or empty:
+            row["errors"] += 1
+    summary = {}
+    for key, row in rows.items():
+        latencies = row["latencies"]
+        summary[key] = {
+            "count": len(latencies),
+            "first": latencies[0],
+            "p50": statistics.median(latencies),
+            "p95": percentile(latencies, 0.95),
+            "max": max(latencies),
+            "errors": row["errors"],
+            "empty_roadmaps": row["empty_roadmaps"],
+        }
+    summary["all"] = {
+        "count": len(results),
+        "throughput": len(results) / elapsed,
+        "p50": statistics.median(r[3] for r in results),
+        "p95": percentile([r[3] for r in results], 0.95),
+        "errors": sum(row["errors"] for row in rows.values()),
+        "empty_roadmaps": sum(row["empty_roadmaps"] for row in rows.values()),
+    }
+    return summary
+
+
+def report(name, summary):
+    print(f"\n== {name}")
+    print(f"{'request':<32}{'count':>7}{'first':>9}{'p50':>9}{'p95':>9}{'max':>9}{'errors':>8}")
+    for key, row in summary.items():
+        if key == "all":
+            continue
+        print(f"{key:<32}{row['count']:>7}{row['first'] * 1000:>7.0f}ms{row['p50'] * 1000:>7.0f}ms"
+              f"{row['p95'] * 1000:>7.0f}ms{row['max'] * 1000:>7.0f}ms{row['errors']:>8}")
+    total = summary["all"]
+    print(f"{total['count']} requests, {total['throughput']:.1f} req/s, p50 {total['p50'] * 1000:.0f}ms, "
+          f"p95 {total['p95'] * 1000:.0f}ms, {total['errors']} errors, {total['empty_roadmaps']} empty roadmaps")
+
+
+def compare(split, unified):
+    print("\n== unified vs split")
+    print(f"{'request':<32}{'first':>10}{'p50':>10}{'p95':>10}")
+    for key in split:
+        if key == "all" or key not in unified:
+            continue
+        cells = [f"{unified[key][m] / split[key][m]:>9.2f}x" for m in ("first", "p50", "p95")]
+        print(f"{key:<32}{''.join(cells)}")
+    print(f"throughput: {unified['all']['throughput'] / split['all']['throughput']:.2f}x "
+          f"({unified['all']['throughput']:.1f} vs {split['all']['throughput']:.1f} req/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the split and unified onboarding deployments under load.")
+    parser.add_argument("--split", metavar="URL", help="Cloud Functions base URL (functions at URL/<name>)")
+    parser.add_argument("--unified", metavar="URL", help="unified service base URL")
+    parser.add_argument("--token", help="Firebase ID token for authenticated requests")
+    parser.add_argument("--github-user", help="GitHub username for handle_github requests")
+    parser.add_argument("--resume", action="store_true", help="include handle_resume (user must have a resume)")
+    parser.add_argument("--career", default="Backend Developer", help="career_title sent to select_career")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight (default: 16)")
+    parser.add_argument("--requests", type=int, default=300, help="requests per deployment (default: 300)")
+    args = parser.parse_args()
+    if not (args.split or args.unified):
+        parser.error("give --split and/or --unified")
+
+    summaries = {}
+    for name, url in (("split", args.split), ("unified", args.unified)):
+        if url:
+            summaries[name] = summarize(*run(url, args))
+            report(name, summaries[name])
+    if len(summaries) == 2:
+        compare(summaries["split"], summaries["unified"])
+    empty = {name: summary["all"]["empty_roadmaps"] for name, summary in summaries.items()}
+    if any(empty.values()):
+        print(f"Recommendations without a roadmap: {', '.join(f'{name} {n}' for name, n in empty.items() if n)}")
+        sys.exit(1)
@@ -0,0 +1,38 @@
+"""Drift check for the helper modules copied into several function directories.
+
+Each Cloud Function deploys only its own directory, so shared modules
+(runtime, cache, catalog, ...) are kept as identical copies. app.py
+imports one copy for every function, and tests/test_shared_files.py keeps
+split deploys honest too.
+"""
+import hashlib
+import os
+
+# Per-function files that are not shared between function directories
+OWN_FILES = {"main.py", "requirements.txt"}
+
+
+def copies(logic_dir, function_names):
+    """{filename: {function name: sha256}} for every non-own file in the function directories."""
+    digests = {}
+    for function_name in function_names:
+        function_dir = os.path.join(logic_dir, function_name)
+        for filename in sorted(os.listdir(function_dir)):
+            path = os.path.join(function_dir, filename)
+            if filename in OWN_FILES or not os.path.isfile(path):
+                continue
+            with open(path, "rb") as f:
+                digests.setdefault(filename, {})[function_name] = hashlib.sha256(f.read()).hexdigest()
+    return digests
+
+
+def drifted(logic_dir, function_names):
+    """Shared files whose copies differ, as "name (dirs vs dirs)" descriptions."""
+    result = []
+    for filename, by_function in sorted(copies(logic_dir, function_names).items()):
+        versions = {}
+        for function_name, digest in by_function.items():
+            versions.setdefault(digest, []).append(function_name)
+        if len(versions) > 1:
+            result.append(f"{filename} ({' vs '.join(', '.join(names) for names in versions.values())})")
+    return result
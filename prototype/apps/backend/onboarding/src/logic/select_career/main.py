@@ -1,17 +1,13 @@
 import functions_framework
-import firebase_admin
-from firebase_admin import auth
-from google.cloud import firestore
 import json
 import logging
 
-# --- INITIALIZATION ---
-try:
-    firebase_admin.initialize_app()
-except ValueError:
-    pass  # Already initialized
+import runtime
 
-db = firestore.Client()
+# --- INITIALIZATION ---
+# Clients and heavy SDK modules are created on first use (see runtime.py)
+firestore = runtime.lazy_import("google.cloud.firestore")
+db = runtime.lazy_firestore()
 
 # --- MAIN FUNCTION WITH CORS ---
 @functions_framework.http
@@ -38,7 +34,7 @@ def select_career(request):
             return ("Missing or invalid Authorization header", 403, headers)
 
         id_token = auth_header.split('Bearer ')[1]
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = runtime.verify_id_token(id_token)
         user_id = decoded_token['uid']
     except Exception as e:
         logging.error(f"Auth failed: {e}")
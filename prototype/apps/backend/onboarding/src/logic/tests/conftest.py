@@ -0,0 +1,13 @@
+import sys
+from pathlib import Path
+
+LOGIC_DIR = Path(__file__).resolve().parent.parent
+
+# The functions import their sibling modules by name; the shared ones are
+# identical in every function directory, so one copy of each serves the tests
+for function_dir in ("handle_resume", "handle_github", "get_dynamic_quiz"):
+    sys.path.insert(0, str(LOGIC_DIR / function_dir))
+# Scripts that sit beside the functions (cold_start_benchmark)
+sys.path.insert(0, str(LOGIC_DIR))
+# The unified service's helpers (shared_files)
+sys.path.insert(0, str(LOGIC_DIR / "onboarding_service"))
@@ -0,0 +1,125 @@
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import cache
+from cache import FirestoreStore, SQLiteStore, TieredCache, TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class FakeDb:
+    """In-memory stand-in for the collection().document() surface FirestoreStore uses."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def collection(self, name):
+        return SimpleNamespace(document=lambda key: FakeDocument(self.docs, (name, key)))
+
+
+class FakeDocument:
+    def __init__(self, docs, path):
+        self.docs = docs
+        self.path = path
+
+    def get(self):
+        data = self.docs.get(self.path)
+        return SimpleNamespace(exists=data is not None, to_dict=lambda: dict(data))
+
+    def set(self, data):
+        self.docs[self.path] = data
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    memory = TTLCache(ttl=10)
+    memory.set("a", 1)
+    memory.set("b", 2, ttl=60)
+
+    clock.now += 30
+    assert memory.get("a") is None
+    assert memory.get("b") == 2
+    assert len(memory) == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    memory = TTLCache(max_size=2)
+    memory.set("a", 1)
+    memory.set("b", 2)
+    memory.get("a")  # "b" is now the oldest
+    memory.set("c", 3)
+
+    assert memory.get("b") is None
+    assert (memory.get("a"), memory.get("c")) == (1, 3)
+
+
+def test_store_hits_are_promoted_to_memory(tmp_path):
+    store = SQLiteStore(str(tmp_path / "cache.sqlite"), table="roadmap_cache")
+    store.set("k", {"steps": [["a", "b"]]}, 60)
+    tiered = TieredCache("roadmap_cache", store=store)
+
+    assert tiered.get("k") == {"steps": [["a", "b"]]}
+    assert tiered.get("k") == {"steps": [["a", "b"]]}
+    assert (tiered.store_hits, tiered.memory_hits) == (1, 1)
+
+
+def test_unwanted_results_are_returned_but_not_cached():
+    tiered = TieredCache("results")
+    assert tiered.get_or_compute("k", lambda: [], should_cache=bool) == []
+    assert tiered.get_or_compute("k", lambda: ["career"], should_cache=bool) == ["career"]
+    assert tiered.get_or_compute("k", lambda: ["other"]) == ["career"]
+    assert tiered.stats()["misses"] == 2
+
+
+def test_concurrent_misses_compute_once():
+    tiered = TieredCache("roadmaps")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "roadmap"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(tiered.get_or_compute("k", compute)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(tiered.get_or_compute("k", compute)))
+                 for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.1)  # let the followers queue up behind the leader's flight
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert results == ["roadmap"] * 5
+    assert len(calls) == 1
+    stats = tiered.stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] + stats["memory_hits"] == 4
+
+
+def test_firestore_store_writes_a_timestamp_and_skips_expired_entries():
+    db = FakeDb()
+    store = FirestoreStore(db, "roadmap_cache")
+    store.set("fresh", [["nested"]], 60)
+    store.set("stale", "old", -1)
+    db.docs[("roadmap_cache", "legacy")] = {"value": "1", "expires_at": time.time() + 3600}
+
+    assert isinstance(db.docs[("roadmap_cache", "fresh")]["expires_at"], datetime)
+    assert store.get("fresh") == [["nested"]]
+    assert store.get("stale") is None
+    assert store.get("legacy") is None  # float expiry from before the TTL policy
+    assert store.get("missing") is None
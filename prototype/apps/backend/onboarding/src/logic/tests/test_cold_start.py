@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("requests")
+
+from cold_start_benchmark import FUNCTIONS, probe
+
+LOGIC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Empty stand-ins for the SDKs: a preflight must not import any of them, and
+# if one does, it shows up in the probe's sys.modules instead of failing
+SDK_STUBS = {
+    "functions_framework/__init__.py": "def http(f):\n    return f\n\n\ndef cloud_event(f):\n    return f\n",
+    "google/cloud/firestore/__init__.py": "",
+    "google/cloud/storage/__init__.py": "",
+    "google/cloud/pubsub_v1/__init__.py": "",
+    "firebase_admin/__init__.py": "",
+    "firebase_admin/auth.py": "",
+    "vertexai/__init__.py": "",
+    "vertexai/generative_models.py": "",
+    "numpy/__init__.py": "",
+    "PIL/__init__.py": "",
+    "PIL/Image.py": "",
+    "pypdf/__init__.py": "",
+}
+
+
+@pytest.fixture(scope="module")
+def sdk_stubs(tmp_path_factory):
+    root = tmp_path_factory.mktemp("sdk_stubs")
+    for path, source in SDK_STUBS.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text(source)
+    return str(root)
+
+
+@pytest.mark.parametrize("function_name", FUNCTIONS)
+def test_preflight_loads_no_sdk(function_name, sdk_stubs, monkeypatch):
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(filter(None, [sdk_stubs, os.environ.get("PYTHONPATH")])))
+    result = probe(os.path.join(LOGIC_DIR, function_name), function_name)
+
+    assert result["status"] == 204
+    assert result["heavy"] == []
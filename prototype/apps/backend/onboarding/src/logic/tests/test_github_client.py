@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip("requests")
+
+from cache import TieredCache, TTLCache
+from github_client import GitHubClient
+from github_quota import GitHubRateLimited
+
+RESET_IN = 3600
+
+
+class FakeGitHub(BaseHTTPRequestHandler):
+    """Serves /users/<name>/repos in pages of `per_page`, with ETags and a per-token quota."""
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        token = self.headers.get("Authorization", "").removeprefix("token ")
+        with server.lock:
+            server.seen.append((url.path, query.get("page", ["1"])[0], token, self.headers.get("If-None-Match")))
+
+        if token in server.throttled:
+            return self._send(403, {"message": "API rate limit exceeded"}, remaining=0)
+        if url.path != "/users/octo/repos":
+            return self._send(404, {"message": "Not Found"})
+
+        page = int(query.get("page", ["1"])[0])
+        per_page = int(query.get("per_page", ["30"])[0])
+        last = -(-server.repo_count // per_page)
+        etag = f'"repos-{page}-{server.version}"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, None, etag=etag)
+        start = (page - 1) * per_page
+        repos = [{"name": f"repo{i}"} for i in range(start, min(start + per_page, server.repo_count))]
+        base = f"http://{self.headers['Host']}{url.path}"
+        link = f'<{base}?per_page={per_page}&page={last}>; rel="last"' if page < last else None
+        self._send(200, repos, etag=etag, link=link)
+
+    def _send(self, status, body, etag=None, link=None, remaining=4999):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("X-RateLimit-Limit", "5000")
+        self.send_header("X-RateLimit-Remaining", str(remaining))
+        self.send_header("X-RateLimit-Reset", str(self.server.reset_at))
+        if etag:
+            self.send_header("ETag", etag)
+        if link:
+            self.send_header("Link", link)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def github():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGitHub)
+    server.lock = threading.Lock()
+    server.seen = []
+    server.throttled = set()
+    server.repo_count = 250
+    server.version = 1
+    server.reset_at = int(time.time()) + RESET_IN
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(server, tokens=("tok-a",)):
+    cache = TieredCache("github_test", memory=TTLCache(max_size=64, ttl=60), ttl=60)
+    return GitHubClient(list(tokens), base_url=f"http://127.0.0.1:{server.server_port}", cache=cache, workers=4)
+
+
+def test_not_modified_reuses_cached_body(github):
+    client = make_client(github)
+    params = {"per_page": 100, "page": 3}
+    first, _ = client.get("/users/octo/repos", params)
+    again, _ = client.get("/users/octo/repos", params)
+
+    assert again == first and len(first) == 50
+    assert [entry[3] for entry in github.seen] == [None, '"repos-3-1"']
+    assert client.requests == 2 and client.not_modified == 1
+    # GitHub does not count a 304 against the quota
+    assert client.pool.metrics()["tokens"][0]["used"] == 1
+
+
+def test_changed_resource_replaces_cached_body(github):
+    client = make_client(github)
+    client.get("/users/octo/repos", {"per_page": 100, "page": 3})
+    github.repo_count = 260
+    github.version = 2
+    data, _ = client.get("/users/octo/repos", {"per_page": 100, "page": 3})
+
+    assert len(data) == 60 and client.not_modified == 0
+
+
+def test_repos_follow_link_header_pagination(github):
+    client = make_client(github)
+    repos = client.get_repos("octo", max_repos=1000)
+
+    assert [repo["name"] for repo in repos] == [f"repo{i}" for i in range(250)]
+    assert sorted(entry[1] for entry in github.seen) == ["1", "2", "3"]
+
+    # max_repos caps the pages fetched, not just the repos returned
+    github.seen.clear()
+    assert len(client.get_repos("octo", max_repos=150)) == 150
+    assert sorted(entry[1] for entry in github.seen) == ["1", "2"]
+
+
+def test_throttled_token_is_paused_and_request_moves_on(github):
+    github.throttled.add("tok-a")
+    client = make_client(github, tokens=("tok-a", "tok-b"))
+    data, _ = client.get("/users/octo/repos", {"per_page": 100, "page": 1})
+
+    assert len(data) == 100
+    assert [entry[2] for entry in github.seen] == ["tok-a", "tok-b"]
+    metrics = client.pool.metrics()
+    assert metrics["throttled"] == 1
+    assert [token["paused"] for token in metrics["tokens"]] == [True, False]
+
+    # Later requests skip the paused token until its reset
+    client.get("/users/octo/repos", {"per_page": 100, "page": 2})
+    assert github.seen[-1][2] == "tok-b"
+
+
+def test_exhausted_pool_fails_fast_with_retry_after(github):
+    github.throttled.add("tok-a")
+    client = make_client(github)
+
+    start = time.time()
+    with pytest.raises(GitHubRateLimited) as excinfo:
+        client.get("/users/octo/repos", {"per_page": 100, "page": 1}, wait=0.5)
+    assert time.time() - start < 5
+    assert excinfo.value.retry_after > RESET_IN - 60
+    assert len(github.seen) == 1
@@ -0,0 +1,161 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import jobs
+from jobs import PermanentJobError, SQLiteQueue, WorkerPool, run_job
+
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self.exists else None
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+
+    def get(self):
+        return FakeSnapshot(self.db.docs.get(self.path))
+
+    def set(self, data, merge=False):
+        doc = dict(self.db.docs.get(self.path, {})) if merge else {}
+        for key, value in data.items():
+            if value is jobs.firestore.DELETE_FIELD:
+                doc.pop(key, None)
+            else:
+                doc[key] = value
+        self.db.docs[self.path] = doc
+
+
+class FakeDb:
+    """In-memory stand-in for the collection().document() surface jobs.py uses."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def collection(self, name):
+        return SimpleNamespace(document=lambda doc_id: FakeDocument(self, (name, doc_id)))
+
+    def status(self, job_id):
+        return self.docs[(jobs.JOB_COLLECTION, job_id)]
+
+
+@pytest.fixture(autouse=True)
+def fake_firestore(monkeypatch):
+    monkeypatch.setattr(jobs, "firestore", SimpleNamespace(SERVER_TIMESTAMP="<now>", DELETE_FIELD=object()))
+
+
+@pytest.fixture
+def db():
+    return FakeDb()
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteQueue(str(tmp_path / "jobs.sqlite"))
+
+
+def test_run_job_records_success(db, queue):
+    job_id = jobs.enqueue_job(db, queue, "user-1", {"file": "cv.pdf"})
+    assert db.status(job_id)["status"] == "queued"
+
+    job, deliveries = queue.claim()
+    assert job["id"] == job_id and deliveries == 1
+    assert run_job(db, job, lambda job: {"skills": 3}) is True
+
+    status = db.status(job_id)
+    assert status["status"] == "done" and status["attempts"] == 1
+    assert status["result"] == {"skills": 3}
+    assert "error" not in status
+    # A redelivery of a finished job is acked without running the handler again
+    assert run_job(db, job, lambda job: pytest.fail("handler ran twice")) is True
+
+
+def test_run_job_retries_until_max_attempts(db, queue):
+    job_id = jobs.enqueue_job(db, queue, "user-1", {})
+
+    def flaky(job):
+        raise RuntimeError("Gemini timed out")
+
+    job, _ = queue.claim()
+    assert run_job(db, job, flaky, max_attempts=2) is False
+    assert db.status(job_id)["status"] == "retrying"
+    assert run_job(db, job, flaky, max_attempts=2) is True
+    status = db.status(job_id)
+    assert status["status"] == "failed" and status["attempts"] == 2
+    assert status["error"] == "Gemini timed out"
+
+
+def test_permanent_error_fails_without_retry(db, queue):
+    job_id = jobs.enqueue_job(db, queue, "user-1", {})
+
+    def unreadable(job):
+        raise PermanentJobError("not a PDF")
+
+    job, _ = queue.claim()
+    assert run_job(db, job, unreadable, max_attempts=3) is True
+    status = db.status(job_id)
+    assert status["status"] == "failed" and status["attempts"] == 1
+
+
+def test_queue_leases_and_redelivers(queue):
+    queue.publish({"id": "a", "payload": {}})
+    job, deliveries = queue.claim()
+    assert (job["id"], deliveries) == ("a", 1)
+    assert queue.claim() is None  # Leased to the first claimer
+
+    queue.nack("a", 0)
+    job, deliveries = queue.claim()
+    assert (job["id"], deliveries) == ("a", 2)
+    queue.ack("a")
+    assert len(queue) == 0
+
+
+def test_worker_pool_retries_then_finishes(db, queue):
+    job_ids = [jobs.enqueue_job(db, queue, f"user-{i}", {"n": i}) for i in range(3)]
+    calls = {}
+    lock = threading.Lock()
+
+    def handler(job):
+        with lock:
+            calls[job["id"]] = calls.get(job["id"], 0) + 1
+            attempt = calls[job["id"]]
+        if job["payload"]["n"] == 0 and attempt == 1:
+            raise RuntimeError("transient")
+        return {"n": job["payload"]["n"]}
+
+    pool = WorkerPool(queue, lambda job: run_job(db, job, handler, max_attempts=3),
+                      workers=2, retry_delay=0.01, poll_interval=0.01).start()
+    try:
+        deadline = time.time() + 5
+        while len(queue) and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        pool.stop(timeout=1)
+
+    assert len(queue) == 0
+    assert [db.status(job_id)["status"] for job_id in job_ids] == ["done"] * 3
+    assert db.status(job_ids[0])["attempts"] == 2
+    assert sorted(calls.values()) == [1, 1, 2]
+
+
+def test_failed_publish_marks_the_job_failed(db):
+    class BrokenQueue:
+        def publish(self, job):
+            raise RuntimeError("topic not found")
+
+    with pytest.raises(RuntimeError):
+        jobs.enqueue_job(db, BrokenQueue(), "user-1", {})
+
+    [(_, job_id)] = db.docs
+    status = db.status(job_id)
+    assert status["status"] == "failed"
+    assert "topic not found" in status["error"]
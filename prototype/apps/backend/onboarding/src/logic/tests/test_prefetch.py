@@ -0,0 +1,74 @@
+import time
+
+from prefetch import Prefetcher
+from quiz_tree import QuizStepCache
+
+QUESTION = {"next_question": {"text": "What area?", "options": ["Web", "Data", "Ops"]}}
+
+
+def path(answer):
+    return [{"question": "What area?", "answer": answer}]
+
+
+def make_prefetcher(cache, **kwargs):
+    calls = []
+
+    def generate(history, usage):
+        calls.append(history[-1]["answer"])
+        usage["tokens"] = 100
+        return {"final_skills": [history[-1]["answer"]]}
+
+    return Prefetcher(cache, generate, bool, **kwargs), calls
+
+
+def drain(prefetcher):
+    prefetcher._executor.shutdown(wait=True)
+
+
+def test_used_prefetches_are_hits_and_the_rest_wasted():
+    cache = QuizStepCache("v1")
+    prefetcher, calls = make_prefetcher(cache, window=0.05)
+    prefetcher.schedule([], QUESTION)
+    drain(prefetcher)
+
+    assert sorted(calls) == ["Data", "Ops", "Web"]
+    step, source = cache.get_or_generate(path("Data"), lambda: None)
+    assert (step, source) == ({"final_skills": ["Data"]}, "memory")
+    prefetcher.record_use(path("Data"))
+
+    time.sleep(0.1)
+    stats = prefetcher.stats()
+    assert (stats["issued"], stats["hits"], stats["wasted"], stats["pending"]) == (3, 1, 2, 0)
+    assert stats["hit_rate"] == round(1 / 3, 4)
+    assert (stats["tokens"], stats["wasted_tokens"]) == (300, 200)
+
+
+def test_cached_paths_are_not_counted_or_charged():
+    cache = QuizStepCache("v1")
+    cache.put(path("Web"), {"final_skills": ["HTML"]})
+    prefetcher, calls = make_prefetcher(cache, budget=1)
+    prefetcher.schedule([], {"next_question": {"text": "What area?", "options": ["Web"]}})
+    deadline = time.time() + 5
+    while prefetcher.stats()["pending"] and time.time() < deadline:
+        time.sleep(0.01)
+
+    stats = prefetcher.stats()
+    assert (stats["issued"], stats["pending"], stats["over_budget"]) == (0, 0, 0)
+
+    # The cached path gave its budget slot back
+    prefetcher.schedule([], {"next_question": {"text": "What area?", "options": ["Data", "Ops"]}})
+    drain(prefetcher)
+    assert calls == ["Data"]
+    stats = prefetcher.stats()
+    assert (stats["issued"], stats["over_budget"]) == (1, 1)
+
+
+def test_a_path_is_prefetched_once_while_pending():
+    cache = QuizStepCache("v1")
+    prefetcher, calls = make_prefetcher(cache)
+    prefetcher.schedule([], QUESTION)
+    prefetcher.schedule([], QUESTION)
+    drain(prefetcher)
+
+    assert sorted(calls) == ["Data", "Ops", "Web"]
+    assert prefetcher.stats()["issued"] == 3
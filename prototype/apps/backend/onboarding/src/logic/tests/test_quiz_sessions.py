@@ -0,0 +1,136 @@
+import importlib.util
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from quiz_sessions import QuizSessions
+
+LOGIC_DIR = Path(__file__).resolve().parent.parent
+FIRST = {"text": "What area?", "options": ["Web", "Data"]}
+
+
+class DictStore:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ttl):
+        self.data[key] = value
+
+
+def sessions_with_store():
+    sessions = QuizSessions("none")
+    sessions.cache.store = DictStore()
+    return sessions
+
+
+def test_answers_extend_history_and_transcript():
+    sessions = QuizSessions("none")
+    session_id, session = sessions.create("user-1", FIRST)
+    session = sessions.answer(session, "Data")
+
+    assert session["turn"] == 1 and session["pending"] is None
+    assert session["history"] == [{"question": "What area?", "answer": "Data"}]
+    assert session["transcript"] == "Q1: What area?\nA1: Data\n"
+
+
+def test_load_checks_the_owner():
+    sessions = QuizSessions("none")
+    session_id, _ = sessions.create("user-1", FIRST)
+
+    assert sessions.load(session_id, "user-1", 0)["turn"] == 0
+    assert sessions.load(session_id, "user-2", 0) is None
+    assert sessions.load("unknown", "user-1", 0) is None
+
+
+def test_a_stale_memory_copy_is_refreshed_from_the_store():
+    # Another instance handled turn 1 and saved it to the shared store
+    sessions = sessions_with_store()
+    session_id, session = sessions.create("user-1", FIRST)
+    sessions.cache.store.set(session_id, {**sessions.answer(session, "Web"), "pending": FIRST}, 60)
+
+    assert sessions.load(session_id, "user-1", 1)["turn"] == 1
+
+
+def test_a_stale_turn_keeps_the_current_session():
+    sessions = sessions_with_store()
+    session_id, _ = sessions.create("user-1", FIRST)
+
+    # The caller's turn is ahead of every copy; the handler turns this into a 409
+    assert sessions.load(session_id, "user-1", 5)["turn"] == 0
+
+
+@pytest.fixture
+def quiz_main(monkeypatch):
+    """get_dynamic_quiz's main.py with memory-only stores and a scripted Gemini."""
+    for name, value in (("QUIZ_SESSION_STORE", "none"), ("QUIZ_CACHE_STORE", "none"),
+                        ("QUIZ_PREFETCH", "0"), ("QUIZ_TREE_MODE", "live")):
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv("QUIZ_RESULTS_URL", raising=False)
+    monkeypatch.setitem(sys.modules, "functions_framework", SimpleNamespace(http=lambda f: f))
+    spec = importlib.util.spec_from_file_location("get_dynamic_quiz_main", LOGIC_DIR / "get_dynamic_quiz" / "main.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    def generate(history, usage=None, transcript=None):
+        if len(history) < 2:
+            return {"next_question": {"text": f"Question {len(history) + 1}?", "options": ["A", "B"]}}
+        return {"final_skills": ["Python", "SQL"]}
+
+    monkeypatch.setattr(module, "_generate_next_step", generate)
+    yield module
+    module.RESULTS_EXECUTOR.shutdown(wait=True)
+
+
+def send(module, data):
+    body, status, _ = module._handle_session("user-1", data, "Bearer token", {})
+    return body, status
+
+
+def test_session_turns(quiz_main):
+    body, status = send(quiz_main, {"session": True})
+    session_id = body["session_id"]
+    assert (status, body["turn"]) == (200, 0)
+
+    body, status = send(quiz_main, {"session_id": session_id, "answer": "Web", "turn": 0})
+    assert (status, body["turn"]) == (200, 1)
+    assert body["next_question"]["text"] == "Question 2?"
+
+    # A retried turn-0 answer must not be applied to question 2
+    body, status = send(quiz_main, {"session_id": session_id, "answer": "Web", "turn": 0})
+    assert status == 409 and "turn 1" in body
+
+    body, status = send(quiz_main, {"session_id": session_id, "answer": "A"})
+    assert status == 400
+
+    body, status = send(quiz_main, {"session_id": session_id, "answer": "A", "turn": 1})
+    assert (status, body["final_skills"], body["results"]) == (200, ["Python", "SQL"], None)
+
+    body, status = send(quiz_main, {"session_id": session_id, "answer": "B", "turn": 2})
+    assert status == 409 and "finished" in body
+
+    body, status = send(quiz_main, {"session_id": "unknown", "answer": "A", "turn": 0})
+    assert status == 404
+
+
+def test_finished_session_is_forwarded_in_the_background(quiz_main, monkeypatch):
+    posts = []
+    monkeypatch.setattr(quiz_main, "QUIZ_RESULTS_URL", "http://results.test/handle_quiz_results")
+    monkeypatch.setattr(quiz_main, "requests", SimpleNamespace(
+        post=lambda url, **kwargs: posts.append((url, kwargs)) or SimpleNamespace(raise_for_status=lambda: None),
+    ))
+
+    session_id = send(quiz_main, {"session": True})[0]["session_id"]
+    send(quiz_main, {"session_id": session_id, "answer": "Web", "turn": 0})
+    body, status = send(quiz_main, {"session_id": session_id, "answer": "A", "turn": 1})
+    quiz_main.RESULTS_EXECUTOR.shutdown(wait=True)
+
+    assert (status, body["results"]) == (200, "pending")
+    [(url, kwargs)] = posts
+    assert url == "http://results.test/handle_quiz_results"
+    assert kwargs["json"] == {"session_id": session_id}
+    assert kwargs["headers"] == {"Authorization": "Bearer token"}
@@ -0,0 +1,99 @@
+import threading
+import time
+
+from quiz_tree import QuizStepCache, QuizTrie, path_key
+
+
+class DictStore:
+    """Persistent-tier stand-in with the FirestoreStore get/set surface."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ttl):
+        self.data[key] = value
+
+
+def turn(question, answer):
+    return {"question": question, "answer": answer}
+
+
+def test_equivalent_turns_share_a_path():
+    trie = QuizTrie()
+    trie.put([turn("What area?", "Web Development")], {"next_question": {"text": "Frontend or backend?"}})
+
+    assert trie.get([turn("  what AREA? ", "web   development")]) == {"next_question": {"text": "Frontend or backend?"}}
+    assert trie.get([turn("What area?", "Data")]) is None
+
+
+def test_trie_resets_past_its_node_budget():
+    trie = QuizTrie(max_nodes=3)
+    trie.put([turn("q", "a"), turn("q2", "b")], {"step": 1})
+    trie.put([turn("q", "c")], {"step": 2})
+
+    assert trie.get([turn("q", "c")]) == {"step": 2}
+    assert trie.get([turn("q", "a"), turn("q2", "b")]) is None
+
+
+def test_tiers_are_tried_in_order_and_counted():
+    store = DictStore()
+    history = [turn("What area?", "Data")]
+    store.set(path_key(history, "v1"), {"final_skills": ["SQL"]}, 60)
+    frozen = QuizTrie(max_nodes=0)
+    frozen.put([turn("What area?", "Web")], {"final_skills": ["HTML"]})
+    cache = QuizStepCache("v1", store=store, frozen=frozen)
+    generate = lambda: {"final_skills": ["Go"]}
+
+    assert cache.get_or_generate([turn("What area?", "Web")], generate) == ({"final_skills": ["HTML"]}, "frozen")
+    assert cache.get_or_generate(history, generate) == ({"final_skills": ["SQL"]}, "store")
+    assert cache.get_or_generate(history, generate) == ({"final_skills": ["SQL"]}, "memory")
+    assert cache.get_or_generate([turn("What area?", "Ops")], generate) == ({"final_skills": ["Go"]}, "generated")
+    stats = cache.stats()
+    assert (stats["frozen"], stats["store"], stats["memory"], stats["generated"]) == (1, 1, 1, 1)
+    assert stats["hit_rate"] == 0.75
+
+
+def test_store_entries_are_scoped_to_the_prompt_version():
+    store = DictStore()
+    history = [turn("What area?", "Data")]
+    QuizStepCache("v1", store=store).get_or_generate(history, lambda: {"final_skills": ["SQL"]})
+
+    step, source = QuizStepCache("v2", store=store).get_or_generate(history, lambda: {"final_skills": ["Spark"]})
+    assert (step, source) == ({"final_skills": ["Spark"]}, "generated")
+
+
+def test_invalid_steps_are_not_cached():
+    cache = QuizStepCache("v1", store=DictStore())
+    history = [turn("What area?", "Data")]
+    cache.get_or_generate(history, lambda: None, is_valid=lambda step: step is not None)
+
+    assert cache.lookup(history) == (None, None)
+    assert cache.store.data == {}
+
+
+def test_concurrent_requests_for_a_path_generate_once():
+    cache = QuizStepCache("v1")
+    history = [turn("What area?", "Data")]
+    release = threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        release.wait(5)
+        return {"final_skills": ["SQL"]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_generate(history, generate)[0]))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [{"final_skills": ["SQL"]}] * 4
+    assert len(calls) == 1
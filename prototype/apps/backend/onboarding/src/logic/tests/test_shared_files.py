@@ -0,0 +1,15 @@
+from pathlib import Path
+
+from cold_start_benchmark import FUNCTIONS
+from shared_files import copies, drifted
+
+LOGIC_DIR = str(Path(__file__).resolve().parent.parent)
+
+
+def test_shared_modules_are_identical_in_every_function():
+    assert drifted(LOGIC_DIR, FUNCTIONS) == []
+
+
+def test_every_function_has_the_runtime_module():
+    shared = copies(LOGIC_DIR, FUNCTIONS)
+    assert sorted(shared["runtime.py"]) == sorted(FUNCTIONS)
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from catalog import CAREERS_PATH, CareerMatcher
+from skills import SkillIndex
+
+
+@pytest.fixture(scope="module")
+def careers():
+    with open(CAREERS_PATH) as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def index(careers):
+    return SkillIndex(skill for career in careers for skill in career["skills"])
+
+
+@pytest.mark.parametrize("skill, canonical", [
+    ("Python", "Python"),
+    ("react js", "React"),
+    ("JS", "JavaScript"),
+    ("k8s", "Kubernetes"),
+    ("Go", "Go"),
+    # One typo in a longer name is tolerated
+    ("Pythn", "Python"),
+    ("Javascrpt", "JavaScript"),
+    ("Kubernetis", "Kubernetes"),
+])
+def test_known_skills_and_typos_are_matched(index, skill, canonical):
+    assert index.canonical(skill) == canonical
+
+
+@pytest.mark.parametrize("skill, wrong", [
+    ("Testing", "TestNG"),
+    ("Mentoring", "Monitoring"),
+    ("Modeling", "3D Modeling"),
+    ("Pipelines", "ML Pipelines"),
+    ("SwiftUI", "Swift"),
+    ("Ga", "Go"),
+])
+def test_real_skills_are_not_rewritten_into_others(index, skill, wrong):
+    assert wrong in index.skills
+    assert index.canonical(skill) is None
+
+
+def test_canonicalize_keeps_typed_spelling_and_dedupes(index):
+    assert index.canonicalize(["Pythn", "Python", "JS", "javascript", "Mentoring", "mentoring"]) == [
+        "Pythn", "JavaScript", "Mentoring",
+    ]
+    assert index.canonicalize(["Pythn", "Mentoring"], keep_unknown=False) == ["Pythn"]
+
+
+def test_matcher_ranks_by_coverage_then_overlap():
+    pytest.importorskip("numpy")
+    matcher = CareerMatcher([
+        {"displayName": "Data Engineer", "skills": ["Python", "SQL", "Spark", "Airflow"]},
+        {"displayName": "Backend Developer", "skills": ["Python", "SQL", "Docker"]},
+        {"displayName": "Frontend Developer", "skills": ["JavaScript", "React", "CSS", "HTML", "TypeScript", "Figma"]},
+        {"displayName": "Designer", "skills": ["Figma", "UX Design"]},
+        {"displayName": "Empty", "skills": []},
+    ])
+
+    results = matcher.match(["python", "Postgres", "SQL", "JS", "Figma"], top_n=5)
+
+    # Data Engineer and Designer both cover half their skills; Data Engineer shares more
+    assert [r["career"] for r in results] == ["Backend Developer", "Data Engineer", "Designer", "Frontend Developer"]
+    assert results[0]["score"] == pytest.approx(2 / 3, abs=1e-4)
+    assert results[0]["matched_skills"] == ["Python", "SQL"]
+    assert results[0]["skill_gaps"] == ["Docker"]
+    assert results[1]["skill_gaps"] == ["Spark", "Airflow"]
+    assert matcher.match(["Python"], top_n=1)[0]["career"] == "Backend Developer"
+    assert matcher.match(["Communication", "Teamwork"]) == []
+
+
+def test_matcher_on_shipped_catalog(careers):
+    pytest.importorskip("numpy")
+    matcher = CareerMatcher(careers)
+
+    results = matcher.match(["Java", "Python", "C++", "Data Structures", "Algorithms", "Git", "SQL", "OOP"])
+
+    assert results[0]["career"] == "Software Engineer"
+    assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
@@ -1,19 +1,33 @@
 import functions_framework
-import firebase_admin
-from firebase_admin import auth
-from google.cloud import storage
 import logging
 
+import runtime
+from jobs import JOB_COLLECTION, JOB_QUEUE, enqueue_job, make_queue
+
 # --- INITIALIZATION ---
-PROJECT_ID = "rock-idiom-475618-q4"
+PROJECT_ID = runtime.PROJECT_ID
 RESUME_BUCKET_NAME = "your-project-id-resumes"  # UPDATE IF NEEDED
 
-try:
-    firebase_admin.initialize_app()
-except ValueError:
-    pass  # Already initialized
+# Clients and heavy SDK modules are created on first use (see runtime.py)
+firestore = runtime.lazy_import("google.cloud.firestore")
+storage_client = runtime.lazy_storage()
+db = runtime.lazy_firestore()
+# Resume analysis runs in the background (handle_resume's job worker)
+job_queue = make_queue(JOB_QUEUE, PROJECT_ID)
+
+RESUME_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg')
 
-storage_client = storage.Client()
+def _manifest_entry(blob):
+    """Metadata handle_resume needs to resolve and fingerprint the resume without listing."""
+    return {
+        "path": f"gs://{RESUME_BUCKET_NAME}/{blob.name}",
+        "blob_name": blob.name,
+        "size": blob.size,
+        "content_type": blob.content_type,
+        "md5": blob.md5_hash,
+        "generation": blob.generation,
+        "uploaded_at": firestore.SERVER_TIMESTAMP,
+    }
 
 # --- MAIN FUNCTION WITH CORS ---
 @functions_framework.http
@@ -40,7 +54,7 @@ def upload_resume(request):
             return ("Missing or invalid Authorization header", 403, headers)
         
         id_token = auth_header.split('Bearer ')[1]
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = runtime.verify_id_token(id_token)
         user_id = decoded_token['uid']
     except Exception as e:
         logging.error(f"Auth failed: {e}")
@@ -71,13 +85,38 @@ def upload_resume(request):
 
         logging.info("Upload successful.")
 
-        # 4. Return Success
+        # 4. Record the upload in the user's resume manifest
+        entry = _manifest_entry(blob)
+        user_ref = db.collection("users").document(user_id)
+        user_ref.collection("resume_uploads").add(entry)
+        content_type = blob.content_type or ''
+        is_resume = filename.lower().endswith(RESUME_EXTENSIONS) or content_type.startswith('image/') or content_type == 'application/pdf'
+        if is_resume:
+            # The latest resume-like upload becomes the one handle_resume analyzes
+            user_ref.set({"resume": entry}, merge=True)
+
+        # 5. Queue the analysis so the client does not wait on Gemini
+        job_id = None
+        if is_resume and job_queue is not None:
+            try:
+                payload = {"resume": {k: v for k, v in entry.items() if k != "uploaded_at"}}
+                job_id = enqueue_job(db, job_queue, user_id, payload)
+                user_ref.set({"resume_job": job_id}, merge=True)
+                logging.info(f"Queued resume analysis job {job_id}")
+            except Exception:
+                # The upload itself succeeded; handle_resume can still analyze on demand
+                logging.exception("Failed to queue resume analysis")
+
+        # 6. Return Success
         response = {
             "status": "success",
             "message": "Resume uploaded successfully.",
             "path": f"gs://{RESUME_BUCKET_NAME}/{blob_name}",
             "filename": filename
         }
+        if job_id:
+            response["job_id"] = job_id
+            response["job_status"] = f"{JOB_COLLECTION}/{job_id}"
         return (response, 200, headers)
 
     except Exception as e:
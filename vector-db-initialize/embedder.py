@@ -0,0 +1,173 @@
+import threading
+import time
+
+from google.api_core.exceptions import InvalidArgument, ResourceExhausted, ServiceUnavailable
+from vertexai.language_models import TextEmbeddingInput
+
+# ================= LIMITS =================
+# text-embedding-004 accepts at most 250 inputs and ~20k tokens per request.
+MAX_BATCH_SIZE = 250
+MAX_BATCH_TOKENS = 20000
+CHARS_PER_TOKEN = 4  # rough estimate, good enough for packing
+# Share of MAX_BATCH_TOKENS batches are packed to, since the estimate can run low
+BATCH_TOKEN_MARGIN = 0.8
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN + 1)
+
+
+# ================= RATE LIMITER =================
+class TokenBucket:
+    """Adaptive token bucket.
+
+    Refills at `rate` requests/second. The rate grows additively after each
+    successful call and is halved whenever the API reports a quota error, so
+    throughput follows whatever quota the project actually has.
+    """
+
+    def __init__(self, rate=5.0, capacity=5, min_rate=0.2, max_rate=50.0, increase=0.5):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, n=1):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return
+                wait = (n - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+
+
+# ================= EMBEDDER =================
+class BatchingEmbedder:
+    """Packs many texts into each get_embeddings() call under the model limits.
+
+    With a `cache`, texts already embedded under the same model, task type and
+    dimensions are served from it and never sent to the API. `model` may be
+    None to replay purely from the cache (offline runs); misses then fail.
+    """
+
+    def __init__(self, model, task_type="RETRIEVAL_DOCUMENT", limiter=None,
+                 max_batch_size=MAX_BATCH_SIZE, max_batch_tokens=int(MAX_BATCH_TOKENS * BATCH_TOKEN_MARGIN),
+                 max_retries=6, model_name=None, dimensions=None, cache=None):
+        self.model = model
+        self.task_type = task_type
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.cache = cache
+        self.limiter = limiter or TokenBucket()
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_retries = max_retries
+        self.chunks = 0
+        self.requests = 0
+        self.seconds = 0.0
+
+    @property
+    def chunks_per_sec(self):
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    def batches(self, texts):
+        """Yields lists of indexes into `texts`, each fitting in one request."""
+        batch, tokens = [], 0
+        for i, text in enumerate(texts):
+            cost = estimate_tokens(text)
+            if batch and (len(batch) >= self.max_batch_size or tokens + cost > self.max_batch_tokens):
+                yield batch
+                batch, tokens = [], 0
+            batch.append(i)
+            tokens += cost
+        if batch:
+            yield batch
+
+    def _embed_batch(self, texts):
+        if self.model is None:
+            raise RuntimeError("no embedding model configured (offline cache replay)")
+        inputs = [TextEmbeddingInput(text=t, task_type=self.task_type) for t in texts]
+        kwargs = {"output_dimensionality": self.dimensions} if self.dimensions else {}
+        for attempt in range(self.max_retries):
+            self.limiter.acquire()
+            try:
+                response = self.model.get_embeddings(inputs, **kwargs)
+                self.limiter.on_success()
+                self.requests += 1
+                return [r.values for r in response]
+            except (ResourceExhausted, ServiceUnavailable) as e:
+                self.limiter.on_throttle()
+                print(f"  ⏳ Throttled ({e.__class__.__name__}), rate now {self.limiter.rate:.2f} req/s")
+        raise RuntimeError(f"Embedding batch failed after {self.max_retries} attempts")
+
+    def _embed_split(self, texts):
+        """Like _embed_batch, but halves a batch the API rejects as too large."""
+        try:
+            return self._embed_batch(texts)
+        except InvalidArgument as e:
+            if len(texts) == 1:
+                raise
+            print(f"  ↯ Batch of {len(texts)} rejected ({e}), splitting")
+            half = len(texts) // 2
+            return self._embed_split(texts[:half]) + self._embed_split(texts[half:])
+
+    def embed(self, texts, on_batch=None):
+        """Returns one vector per text, or None where the batch failed.
+
+        `on_batch(indexes, vectors)` is called as soon as each batch is
+        embedded, so downstream stages can start before the whole run ends.
+        """
+        results = [None] * len(texts)
+        pending = list(range(len(texts)))
+
+        if self.cache is not None:
+            keys = [self.cache.key(self.model_name, self.task_type, self.dimensions, t) for t in texts]
+            cached = self.cache.get_many(keys)
+            hits = [i for i in pending if keys[i] in cached]
+            for i in hits:
+                results[i] = cached[keys[i]]
+            pending = [i for i in pending if keys[i] not in cached]
+            if hits and on_batch:
+                on_batch(hits, [results[i] for i in hits])
+
+        start = time.monotonic()
+        for batch in self.batches([texts[i] for i in pending]):
+            batch = [pending[j] for j in batch]
+            try:
+                vectors = self._embed_split([texts[i] for i in batch])
+            except Exception as e:
+                print(f"  ✘ Failed to embed batch of {len(batch)}: {e}")
+                continue
+            for i, vector in zip(batch, vectors):
+                results[i] = vector
+            self.chunks += len(batch)
+            if self.cache is not None:
+                self.cache.put_many({keys[i]: v for i, v in zip(batch, vectors) if v})
+            if on_batch:
+                on_batch(batch, vectors)
+        self.seconds += time.monotonic() - start
+        return results
+
+    def report(self):
+        return (f"{self.chunks} chunks in {self.requests} requests, "
+                f"{self.seconds:.1f}s ({self.chunks_per_sec:.1f} chunks/sec)")
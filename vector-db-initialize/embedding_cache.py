@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+import time
+from array import array
+
+from manifest import content_hash
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding cache with size-based LRU eviction.
+
+    Entries are keyed by (model, task_type, dimensions, sha256 of the text) and
+    stored as float32 blobs. When the stored vectors exceed `max_bytes`, the
+    least recently used entries are evicted down to 90% of the limit.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                task_type TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, task_type, dimensions, text_hash)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(model, task_type, dimensions, text):
+        return (model, task_type, dimensions or 0, content_hash(text))
+
+    def get_many(self, keys):
+        """Returns {key: vector} for the keys present in the cache.
+
+        `keys` may repeat (duplicate chunks); hits and misses count every
+        requested key, but each distinct one is looked up once.
+        """
+        found = {}
+        now = time.time()
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                row = self._conn.execute(
+                    "SELECT vector FROM embeddings WHERE model=? AND task_type=? AND dimensions=? AND text_hash=?",
+                    key,
+                ).fetchone()
+                if row:
+                    vector = array("f")
+                    vector.frombytes(row[0])
+                    found[key] = vector.tolist()
+                    self._conn.execute(
+                        "UPDATE embeddings SET last_used=? WHERE model=? AND task_type=? AND dimensions=? AND text_hash=?",
+                        (now, *key),
+                    )
+            self._conn.commit()
+        hits = sum(1 for key in keys if key in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items):
+        """Stores {key: vector} and evicts old entries if over the size limit."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?, ?)",
+                [(*key, array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            self._conn.commit()
+            self._evict()
+
+    def size_bytes(self):
+        row = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        return row[0]
+
+    def _evict(self):
+        size = self.size_bytes()
+        if size <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used ASC"
+        ).fetchall()
+        doomed = []
+        for rowid, length in rows:
+            if size <= target:
+                break
+            doomed.append((rowid,))
+            size -= length
+        self._conn.executemany("DELETE FROM embeddings WHERE rowid=?", doomed)
+        self._conn.commit()
+        print(f"  🧹 Evicted {len(doomed)} cached embeddings")
+
+    def close(self):
+        self._conn.close()
+
+    def report(self):
+        return f"{self.hits} hits, {self.misses} misses, {self.size_bytes() / 1024:.0f} KiB on disk"
@@ -0,0 +1,129 @@
+import queue
+import threading
+import time
+
+# ================= LIMITS =================
+MAX_BATCH_WRITES = 500  # Firestore limit per batch/commit
+FLUSH_INTERVAL = 0.5  # seconds to wait for more writes before committing
+
+_STOP = object()
+
+
+class BulkWriter:
+    """Background stage that persists documents in Firestore write batches.
+
+    Writes are queued with set()/update()/delete() and committed from a worker thread
+    in batches of up to MAX_BATCH_WRITES, so callers never wait on Firestore.
+    If a batch commit fails, its writes are retried one document at a time.
+
+    Only client.batch() and client.collection(...).document(...) are used, so
+    the stage runs unchanged against the Firestore emulator
+    (FIRESTORE_EMULATOR_HOST) or an in-memory fake with the same shape.
+    """
+
+    def __init__(self, client, batch_size=MAX_BATCH_WRITES, max_retries=3,
+                 flush_interval=FLUSH_INTERVAL, backoff=0.5):
+        self.client = client
+        self.batch_size = min(batch_size, MAX_BATCH_WRITES)
+        self.max_retries = max_retries
+        self.flush_interval = flush_interval
+        self.backoff = backoff
+        self.written = 0
+        self.batches = 0
+        self.failed = []  # (collection, doc_id, error)
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="firestore-bulk-writer", daemon=True)
+            self._thread.start()
+
+    def set(self, collection, doc_id, data):
+        self._queue.put(("set", collection, doc_id, data))
+
+    def update(self, collection, doc_id, data):
+        """Changes only the given fields; the document must exist."""
+        self._queue.put(("update", collection, doc_id, data))
+
+    def delete(self, collection, doc_id):
+        self._queue.put(("delete", collection, doc_id, None))
+
+    def close(self):
+        """Flushes pending writes and stops the worker."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    # ---------- worker ----------
+    def _run(self):
+        while True:
+            op = self._queue.get()
+            if op is _STOP:
+                return
+            pending = [op]
+            stop = False
+            while len(pending) < self.batch_size:
+                try:
+                    op = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                if op is _STOP:
+                    stop = True
+                    break
+                pending.append(op)
+            self._commit(pending)
+            if stop:
+                return
+
+    def _ref(self, op):
+        return self.client.collection(op[1]).document(op[2])
+
+    def _write_one(self, op):
+        kind, _, _, data = op
+        if kind == "set":
+            self._ref(op).set(data)
+        elif kind == "update":
+            self._ref(op).update(data)
+        else:
+            self._ref(op).delete()
+
+    def _commit(self, ops):
+        try:
+            batch = self.client.batch()
+            for op in ops:
+                if op[0] == "set":
+                    batch.set(self._ref(op), op[3])
+                elif op[0] == "update":
+                    batch.update(self._ref(op), op[3])
+                else:
+                    batch.delete(self._ref(op))
+            batch.commit()
+            self.written += len(ops)
+            self.batches += 1
+            return
+        except Exception as e:
+            print(f"  ⚠️ Batch of {len(ops)} writes failed ({e}), retrying per document")
+
+        for op in ops:
+            for attempt in range(self.max_retries):
+                try:
+                    self._write_one(op)
+                    self.written += 1
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries - 1:
+                        self.failed.append((op[1], op[2], e))
+                    else:
+                        time.sleep(self.backoff * 2 ** attempt)
+
+    def report(self):
+        return f"{self.written} writes in {self.batches} batches, {len(self.failed)} failed"
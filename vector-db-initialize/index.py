@@ -1,16 +1,23 @@
-import os
-import time
+import argparse
 from pathlib import Path
 from google.cloud import aiplatform, firestore
-from google.api_core.exceptions import NotFound
-from vertexai.language_models import TextEmbeddingModel, TextEmbeddingInput
+from vertexai.language_models import TextEmbeddingModel
 import vertexai
 
+from embedder import BatchingEmbedder
+from embedding_cache import EmbeddingCache
+from firestore_writer import BulkWriter
+from local_index import LocalVectorIndex
+from manifest import COLLECTION, Manifest, content_hash
+
 # ================= CONFIG =================
 PROJECT_ID = "gen-ai-adhikkesh"
 REGION = "us-central1"
 INDEX_DISPLAY_NAME = "gen-ai"
 KB_DIR = Path(__file__).parent.parent / "prototype" / "knowledge_base"
+EMBEDDING_CACHE_PATH = Path(__file__).parent / "embedding_cache.sqlite"
+EMBEDDING_CACHE_MAX_BYTES = 256 * 1024 * 1024
+LOCAL_INDEX_PATH = Path(__file__).parent / "knowledge_index.npz"
 EMBEDDING_MODEL_NAME = "text-embedding-004"
 EMBEDDING_DIMENSIONS = 768
 CHUNK_SIZE = 1000  # characters
@@ -24,19 +31,26 @@ aiplatform.init(project=PROJECT_ID, location=REGION)
 vertexai.init(project=PROJECT_ID, location=REGION)
 firestore_client = firestore.Client()
 embedding_model = TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL_NAME)
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, max_bytes=EMBEDDING_CACHE_MAX_BYTES)
+embedder = BatchingEmbedder(
+    embedding_model,
+    task_type="RETRIEVAL_DOCUMENT",
+    model_name=EMBEDDING_MODEL_NAME,
+    dimensions=EMBEDDING_DIMENSIONS,
+    cache=embedding_cache,
+)
 
 # ================= INDEX HANDLING =================
-print("🚀 Loading or creating Vertex AI Matching Engine index...")
+def find_index():
+    all_indexes = aiplatform.MatchingEngineIndex.list()
+    matching_indexes = [idx for idx in all_indexes if idx.display_name == INDEX_DISPLAY_NAME]
+    return matching_indexes[0] if matching_indexes else None
 
-# 1. Find existing index
-all_indexes = aiplatform.MatchingEngineIndex.list()
-matching_indexes = [idx for idx in all_indexes if idx.display_name == INDEX_DISPLAY_NAME]
 
-if matching_indexes:
-    index = matching_indexes[0]
+def delete_index(index):
     print(f"Found existing index: {index.resource_name}. Checking for deployments...")
 
-    # 2. Find endpoints and undeploy using class method
+    # Find endpoints and undeploy using class method
     endpoints = aiplatform.MatchingEngineIndexEndpoint.list()
     for ep in endpoints:
         for dep in ep.deployed_indexes:
@@ -44,31 +58,46 @@ if matching_indexes:
                 print(f"Undeploying index from endpoint {ep.resource_name} ...")
                 ep.undeploy_index(deployed_index_id=dep.id)
 
-
-    # 3. Delete index
     print("Deleting existing index...")
     index.delete()
     print("✅ Index deleted successfully.")
 
-# 4. Create new streaming index
-print("Creating new index with STREAM_UPDATE enabled...")
-index = aiplatform.MatchingEngineIndex.create_tree_ah_index(
-    display_name=INDEX_DISPLAY_NAME,
-    dimensions=EMBEDDING_DIMENSIONS,
-    approximate_neighbors_count=150,
-    distance_measure_type="DOT_PRODUCT_DISTANCE",
-    index_update_method="STREAM_UPDATE",
-    leaf_node_embedding_count=500,
-    leaf_nodes_to_search_percent=7,
-)
-print(f"✅ Created new index: {index.resource_name}")
+
+def create_index():
+    print("Creating new index with STREAM_UPDATE enabled...")
+    index = aiplatform.MatchingEngineIndex.create_tree_ah_index(
+        display_name=INDEX_DISPLAY_NAME,
+        dimensions=EMBEDDING_DIMENSIONS,
+        approximate_neighbors_count=150,
+        distance_measure_type="DOT_PRODUCT_DISTANCE",
+        index_update_method="STREAM_UPDATE",
+        leaf_node_embedding_count=500,
+        leaf_nodes_to_search_percent=7,
+    )
+    print(f"✅ Created new index: {index.resource_name}")
+    return index
+
+
+def get_index(rebuild=False):
+    """Reuses the existing STREAM_UPDATE index unless a rebuild is requested."""
+    print("🚀 Loading or creating Vertex AI Matching Engine index...")
+    index = find_index()
+    if index and rebuild:
+        delete_index(index)
+        index = None
+    if index is None:
+        index = create_index()
+    else:
+        print(f"♻️ Syncing existing index: {index.resource_name}")
+    return index
 
 # ================= MAIN =================
-def upload_to_vector_db():
+def upload_to_vector_db(index, manifest):
     files = [f for f in KB_DIR.glob("*.md")]
     print(f"📂 Found {len(files)} markdown documents to index.")
 
-    datapoints = []
+    chunks = {}  # chunk_id -> (file, text)
+    unreadable = set()  # file ids that could not be read this run
 
     for f in files:
         try:
@@ -76,37 +105,55 @@ def upload_to_vector_db():
             file_id = f.stem
             print(f"• Processing {file_id}")
 
-            chunks = chunk_text(text)
-
-            for i, chunk in enumerate(chunks):
-                chunk_id = f"{file_id}_part{i+1}"
-
-                embedding_input = TextEmbeddingInput(
-                    text=chunk, task_type="RETRIEVAL_DOCUMENT"
-                )
-                response = embedding_model.get_embeddings([embedding_input])
-                embedding = response[0].values
-
-                if not embedding:
-                    print(f"  ✘ Skipped chunk {chunk_id}: failed to embed")
-                    continue
-
-                datapoints.append({
-                    "datapoint_id": chunk_id,
-                    "feature_vector": embedding
-                })
-
-                # Save text to Firestore
-                firestore_client.collection("knowledge_documents").document(chunk_id).set({
-                    "file": f.name,
-                    "text": chunk,
-                    "uploadedAt": firestore.SERVER_TIMESTAMP
-                })
-
-                time.sleep(0.3)
+            for i, chunk in enumerate(chunk_text(text)):
+                chunks[f"{file_id}_part{i+1}"] = (f, chunk)
 
         except Exception as e:
             print(f"🔥 Error processing {f.name}: {e}")
+            unreadable.add(f.stem)
+
+    hashes = {chunk_id: content_hash(chunk) for chunk_id, (_, chunk) in chunks.items()}
+    changed, removed = manifest.diff(hashes)
+    # A file that failed to read is not gone: keep its chunks until it can be read again
+    removed = [chunk_id for chunk_id in removed if chunk_id.rsplit("_part", 1)[0] not in unreadable]
+    print(f"🔍 {len(changed)} new/changed, {len(removed)} removed, "
+          f"{len(chunks) - len(changed)} unchanged chunks.")
+
+    datapoints = []
+    writer = BulkWriter(firestore_client)
+
+    def on_batch(batch, vectors):
+        # Persist chunk text while the next batch is being embedded
+        for i, embedding in zip(batch, vectors):
+            chunk_id = changed[i]
+            f, chunk = chunks[chunk_id]
+            if not embedding:
+                print(f"  ✘ Skipped chunk {chunk_id}: failed to embed")
+                continue
+
+            datapoints.append({
+                "datapoint_id": chunk_id,
+                "feature_vector": embedding
+            })
+            # No manifest entry yet: it is added once the datapoint is in the index
+            writer.set(COLLECTION, chunk_id, {
+                "file": f.name,
+                "text": chunk,
+                "uploadedAt": firestore.SERVER_TIMESTAMP
+            })
+
+    with writer:
+        if changed:
+            print(f"🧮 Embedding {len(changed)} chunks...")
+            embedder.embed([chunks[chunk_id][1] for chunk_id in changed], on_batch=on_batch)
+            print(f"✅ Embedded {embedder.report()}")
+            print(f"💾 Embedding cache: {embedding_cache.report()}")
+    print(f"📝 Firestore: {writer.report()}")
+    for collection, doc_id, e in writer.failed:
+        print(f"🔥 Error saving {collection}/{doc_id}: {e}")
+    # Chunks without their text in Firestore stay out of the index, so the next run retries them
+    failed_ids = {doc_id for collection, doc_id, _ in writer.failed if collection == COLLECTION}
+    datapoints = [dp for dp in datapoints if dp["datapoint_id"] not in failed_ids]
 
     # Upload to Matching Engine
     if datapoints:
@@ -116,5 +163,57 @@ def upload_to_vector_db():
     else:
         print("⚠️ No embeddings to upload.")
 
+    # Drop chunks whose source text is gone, from the index before their documents
+    if removed:
+        print(f"🗑️ Removing {len(removed)} stale datapoints...")
+        index.remove_datapoints(datapoint_ids=removed)
+        print("✅ Removal complete.")
+
+    # Record the new index state in the manifest; a write that fails here is redone next run
+    with BulkWriter(firestore_client) as manifest_writer:
+        for dp in datapoints:
+            manifest.chunks[dp["datapoint_id"]] = hashes[dp["datapoint_id"]]
+            manifest_writer.update(COLLECTION, dp["datapoint_id"], manifest.entry(dp["datapoint_id"]))
+        for chunk_id in removed:
+            manifest_writer.delete(COLLECTION, chunk_id)
+    print(f"📝 Manifest: {manifest_writer.report()}")
+
+    return chunks
+
+
+def export_local_index(chunks, path=LOCAL_INDEX_PATH, nlist=None):
+    """Writes every chunk embedding to an .npz usable by LocalVectorIndex.
+
+    Unchanged chunks come straight from the embedding cache, so this costs no
+    API calls after a sync.
+    """
+    chunk_ids = sorted(chunks)
+    texts = [chunks[chunk_id][1] for chunk_id in chunk_ids]
+    embeddings = embedder.embed(texts)
+    rows = [i for i, e in enumerate(embeddings) if e]
+    if not rows:
+        print("⚠️ No embeddings for the local index.")
+        return
+    local_index = LocalVectorIndex.build(
+        [chunk_ids[i] for i in rows],
+        [embeddings[i] for i in rows],
+        texts=[texts[i] for i in rows],
+        nlist=nlist,
+    )
+    local_index.save(path)
+    mode = "IVF" if local_index.centroids is not None else "flat"
+    print(f"📦 Wrote local {mode} index with {len(local_index)} vectors to {path}")
+
 if __name__ == "__main__":
-    upload_to_vector_db()
+    parser = argparse.ArgumentParser(description="Sync the knowledge base into the Matching Engine index.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="delete and recreate the index, then re-embed every chunk")
+    parser.add_argument("--nlist", type=int, default=None,
+                        help="IVF partitions for the local index (default: flat below 4096 vectors)")
+    args = parser.parse_args()
+
+    index = get_index(rebuild=args.rebuild)
+    # A rebuilt index has a new resource name, so every chunk counts as changed
+    manifest = Manifest.load(firestore_client, index.resource_name)
+    chunks = upload_to_vector_db(index, manifest)
+    export_local_index(chunks, nlist=args.nlist)
@@ -0,0 +1,116 @@
+import numpy as np
+
+# Below this many vectors a flat scan is faster than probing IVF lists.
+IVF_MIN_VECTORS = 4096
+
+
+class LocalVectorIndex:
+    """In-process dot-product index over the knowledge base embeddings.
+
+    Vectors live in one float32 matrix and `search()` scores them with a single
+    matrix-vector product. For larger corpora, `build(..., nlist=N)` partitions
+    the vectors with spherical k-means (IVF) and a query only scans the
+    `nprobe` closest partitions.
+
+    The file written by `save()` is a plain .npz, so it can be shipped next to
+    a service and loaded with `LocalVectorIndex.load()`. It is a build
+    artifact (gitignored); nothing loads it yet, since retrieval currently
+    happens in the TypeScript API (apps/api ai.service.ts) via Matching Engine.
+    """
+
+    def __init__(self, ids, vectors, texts=None, centroids=None, order=None, offsets=None, nprobe=4):
+        self.ids = np.asarray(ids, dtype=str)
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.texts = None if texts is None else np.asarray(texts, dtype=str)
+        self.centroids = centroids
+        self.order = order  # vector rows grouped by partition
+        self.offsets = offsets  # partition p is order[offsets[p]:offsets[p + 1]]
+        self.nprobe = nprobe
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids, vectors, texts=None, nlist=None, nprobe=4, iters=20, seed=0):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if nlist is None and len(vectors) >= IVF_MIN_VECTORS:
+            nlist = int(np.sqrt(len(vectors)))
+        if not nlist or nlist >= len(vectors):
+            return cls(ids, vectors, texts, nprobe=nprobe)
+
+        centroids, assignments = _spherical_kmeans(vectors, nlist, iters, seed)
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.searchsorted(assignments[order], np.arange(nlist + 1))
+        return cls(ids, vectors, texts, centroids, order, offsets, nprobe)
+
+    def _candidates(self, query, nprobe):
+        if self.centroids is None:
+            return None
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.order[self.offsets[p]:self.offsets[p + 1]] for p in probe])
+
+    def search(self, query_vector, k=5, nprobe=None):
+        """Returns the top-k chunks by dot product, best first.
+
+        Each hit is {"datapoint_id", "score"} plus "text" when texts were stored.
+        """
+        query = np.asarray(query_vector, dtype=np.float32)
+        rows = self._candidates(query, nprobe)
+        scores = self.vectors @ query if rows is None else self.vectors[rows] @ query
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        hits = []
+        for i in top:
+            row = i if rows is None else rows[i]
+            hit = {"datapoint_id": str(self.ids[row]), "score": float(scores[i])}
+            if self.texts is not None:
+                hit["text"] = str(self.texts[row])
+            hits.append(hit)
+        return hits
+
+    def save(self, path):
+        arrays = {"ids": self.ids, "vectors": self.vectors, "nprobe": np.int64(self.nprobe)}
+        if self.texts is not None:
+            arrays["texts"] = self.texts
+        if self.centroids is not None:
+            arrays.update(centroids=self.centroids, order=self.order, offsets=self.offsets)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["ids"],
+                data["vectors"],
+                texts=data["texts"] if "texts" in data else None,
+                centroids=data["centroids"] if "centroids" in data else None,
+                order=data["order"] if "order" in data else None,
+                offsets=data["offsets"] if "offsets" in data else None,
+                nprobe=int(data["nprobe"]),
+            )
+
+
+def _normalize(x):
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def _spherical_kmeans(vectors, k, iters, seed):
+    rng = np.random.default_rng(seed)
+    unit = _normalize(vectors)
+    centroids = unit[rng.choice(len(unit), k, replace=False)]
+    for _ in range(iters):
+        assignments = np.argmax(unit @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, unit)
+        empty = ~sums.any(axis=1)
+        sums[empty] = unit[rng.choice(len(unit), int(empty.sum()))]
+        centroids = _normalize(sums)
+    assignments = np.argmax(unit @ centroids.T, axis=1)
+    return centroids.astype(np.float32), assignments
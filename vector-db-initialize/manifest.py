@@ -0,0 +1,44 @@
+import hashlib
+
+# Chunk text documents; each also carries the manifest entry for its chunk
+COLLECTION = "knowledge_documents"
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """Per-chunk content hashes of what is currently in the index.
+
+    Kept on the chunks' own documents in Firestore ("hash" and "index"
+    fields, written once the chunk is in the index), so every machine that
+    runs the upload sees the same manifest. A hash only counts for the
+    index it was written against.
+    """
+
+    def __init__(self, index_name, chunks=None):
+        self.index_name = index_name
+        self.chunks = chunks or {}  # chunk_id -> sha256, or None if not indexed in this index
+
+    @classmethod
+    def load(cls, client, index_name, collection=COLLECTION):
+        chunks = {}
+        for doc in client.collection(collection).select(["hash", "index"]).stream():
+            data = doc.to_dict() or {}
+            chunks[doc.id] = data.get("hash") if data.get("index") == index_name else None
+        return cls(index_name, chunks)
+
+    def diff(self, hashes):
+        """Compares {chunk_id: hash} against the manifest.
+
+        Returns (changed, removed): ids that are new or whose content changed,
+        and ids in the manifest that no longer exist.
+        """
+        changed = [cid for cid, h in hashes.items() if self.chunks.get(cid) != h]
+        removed = [cid for cid in self.chunks if cid not in hashes]
+        return changed, removed
+
+    def entry(self, chunk_id):
+        """Fields recording that `chunk_id` is in the index with its current hash."""
+        return {"hash": self.chunks[chunk_id], "index": self.index_name}
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The scripts import their sibling modules by name
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,13 @@
+from embedding_cache import EmbeddingCache
+
+
+def test_hits_and_misses_count_every_requested_text(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite")
+    key = lambda text: cache.key("text-embedding-004", "RETRIEVAL_DOCUMENT", 768, text)
+    cache.put_many({key("cached"): [0.5, 0.25]})
+
+    found = cache.get_many([key("cached"), key("cached"), key("new"), key("new"), key("new")])
+
+    assert found == {key("cached"): [0.5, 0.25]}
+    assert (cache.hits, cache.misses) == (2, 3)
+    assert cache.report().startswith("2 hits, 3 misses")
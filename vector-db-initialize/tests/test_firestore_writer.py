@@ -0,0 +1,96 @@
+from firestore_writer import BulkWriter
+
+
+class FakeDocument:
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+
+    def set(self, data):
+        self.client.write(("set", self.path, data))
+
+    def delete(self):
+        self.client.write(("delete", self.path, None))
+
+
+class FakeCollection:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def document(self, doc_id):
+        return FakeDocument(self.client, (self.name, doc_id))
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.ops = []
+
+    def set(self, ref, data):
+        self.ops.append(("set", ref.path, data))
+
+    def delete(self, ref):
+        self.ops.append(("delete", ref.path, None))
+
+    def commit(self):
+        if self.client.fail_batches:
+            raise RuntimeError("batch rejected")
+        self.client.commits.append(len(self.ops))
+        for op in self.ops:
+            self.client.apply(op)
+
+
+class FakeFirestore:
+    """In-memory stand-in for the client.batch()/collection().document() surface BulkWriter uses."""
+
+    def __init__(self, fail_batches=False, failing_docs=()):
+        self.docs = {}
+        self.commits = []
+        self.fail_batches = fail_batches
+        self.failing_docs = set(failing_docs)
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def write(self, op):
+        if op[1] in self.failing_docs:
+            raise RuntimeError("document rejected")
+        self.apply(op)
+
+    def apply(self, op):
+        kind, path, data = op
+        if kind == "set":
+            self.docs[path] = data
+        else:
+            self.docs.pop(path, None)
+
+
+def test_writes_are_committed_in_batches():
+    client = FakeFirestore()
+    client.docs[("kb", "stale")] = {"text": "old"}
+    with BulkWriter(client, batch_size=4, flush_interval=0.05) as writer:
+        for i in range(9):
+            writer.set("kb", f"doc{i}", {"text": str(i)})
+        writer.delete("kb", "stale")
+
+    assert client.commits == [4, 4, 2]
+    assert writer.written == 10 and writer.batches == 3
+    assert writer.failed == []
+    assert client.docs[("kb", "doc8")] == {"text": "8"}
+    assert ("kb", "stale") not in client.docs
+
+
+def test_failed_batch_is_retried_per_document():
+    client = FakeFirestore(fail_batches=True, failing_docs={("kb", "bad")})
+    with BulkWriter(client, batch_size=10, flush_interval=0.05, max_retries=2, backoff=0) as writer:
+        writer.set("kb", "good", {"text": "ok"})
+        writer.set("kb", "bad", {"text": "nope"})
+
+    assert client.docs == {("kb", "good"): {"text": "ok"}}
+    assert writer.written == 1 and writer.batches == 0
+    assert [(collection, doc_id) for collection, doc_id, _ in writer.failed] == [("kb", "bad")]
+    assert "1 failed" in writer.report()
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from manifest import COLLECTION, Manifest, content_hash
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.fields = None
+
+    def select(self, fields):
+        self.fields = fields
+        return self
+
+    def stream(self):
+        for doc_id, data in self.docs.items():
+            yield SimpleNamespace(id=doc_id, to_dict=lambda data=data: {k: data[k] for k in self.fields if k in data})
+
+
+class FakeFirestore:
+    def __init__(self, docs):
+        self.collections = {COLLECTION: FakeCollection(docs)}
+
+    def collection(self, name):
+        return self.collections[name]
+
+
+def test_manifest_is_read_from_the_chunk_documents():
+    client = FakeFirestore({
+        "a_part1": {"text": "a", "hash": content_hash("a"), "index": "idx-1"},
+        "b_part1": {"text": "b", "hash": content_hash("b"), "index": "idx-1"},
+        "c_part1": {"text": "c"},  # written, but never made it into the index
+        "d_part1": {"text": "d", "hash": content_hash("d"), "index": "idx-0"},  # from a deleted index
+    })
+    manifest = Manifest.load(client, "idx-1")
+
+    hashes = {cid: content_hash(cid[0]) for cid in ("a_part1", "c_part1", "d_part1", "e_part1")}
+    changed, removed = manifest.diff(hashes)
+
+    assert sorted(changed) == ["c_part1", "d_part1", "e_part1"]
+    assert removed == ["b_part1"]
+    manifest.chunks["c_part1"] = hashes["c_part1"]
+    assert manifest.entry("c_part1") == {"hash": content_hash("c"), "index": "idx-1"}